@@ -9,47 +9,24 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 from pathlib import Path
+from iiag.aggregates import load_aggregates
+from iiag.data import load_composite_scores
+from iiag.hierarchy import load_tree
+from iiag.peers import load_peer_index
+from iiag.regions import assign_regions, iso3_codes
+from iiag.rolling import load_rolling
+from iiag.trends import INTERCEPT, SLOPE, fit_lines
 import warnings
 warnings.filterwarnings('ignore')
 
 # Load data
-data_path = Path('data/csv-files')
-composite_scores = pd.read_csv(data_path / '2024 IIAG_Composite Scores.csv', encoding='utf-8-sig')
-
-# Clean data
-composite_scores = composite_scores.replace('.', np.nan)
-for col in composite_scores.columns[3:]:
-    composite_scores[col] = pd.to_numeric(composite_scores[col], errors='coerce')
-
-# Define categories
-main_categories = [
-    'SECURITY & RULE OF LAW',
-    'PARTICIPATION, RIGHTS & INCLUSION',
-    'FOUNDATIONS FOR ECONOMIC OPPORTUNITY',
-    'HUMAN DEVELOPMENT'
-]
-
-# Regional groupings
-regional_groups = {
-    'North Africa': ['Algeria', 'Egypt', 'Libya', 'Morocco', 'Tunisia'],
-    'West Africa': ['Benin', 'Burkina Faso', 'Cape Verde', 'Côte d\'Ivoire', 'Gambia', 'Ghana', 'Guinea',
-                    'Guinea-Bissau', 'Liberia', 'Mali', 'Mauritania', 'Niger', 'Nigeria', 'Senegal',
-                    'Sierra Leone', 'Togo'],
-    'East Africa': ['Burundi', 'Comoros', 'Djibouti', 'Eritrea', 'Ethiopia', 'Kenya', 'Madagascar',
-                    'Mauritius', 'Rwanda', 'Seychelles', 'Somalia', 'South Sudan', 'Sudan', 'Tanzania', 'Uganda'],
-    'Central Africa': ['Cameroon', 'Central African Republic', 'Chad', 'Congo', 'DR Congo', 'Equatorial Guinea',
-                       'Gabon', 'São Tomé and Príncipe'],
-    'Southern Africa': ['Angola', 'Botswana', 'Eswatini', 'Lesotho', 'Malawi', 'Mozambique', 'Namibia',
-                        'South Africa', 'Zambia', 'Zimbabwe']
-}
-
-def get_region(country):
-    for region, countries in regional_groups.items():
-        if country in countries:
-            return region
-    return 'Other'
-
-composite_scores['Region'] = composite_scores['Country'].apply(get_region)
+composite_scores = load_composite_scores()
+
+# Categories from the IIAG indicator hierarchy
+main_categories = load_tree().category_names()
+
+# Regional groupings (looked up by Country_ISO in the country registry)
+composite_scores['Region'] = assign_regions(composite_scores)
 
 latest_year = composite_scores['Year'].max()
 latest_data = composite_scores[composite_scores['Year'] == latest_year].copy()
@@ -66,29 +43,19 @@ output_dir.mkdir(exist_ok=True)
 # ============================================================================
 print("  [1/8] Creating interactive Africa map...")
 
-# ISO3 codes mapping (simplified - would need complete mapping)
-iso3_map = {
-    'Algeria': 'DZA', 'Angola': 'AGO', 'Benin': 'BEN', 'Botswana': 'BWA', 'Burkina Faso': 'BFA',
-    'Burundi': 'BDI', 'Cameroon': 'CMR', 'Cape Verde': 'CPV', 'Central African Republic': 'CAF',
-    'Chad': 'TCD', 'Comoros': 'COM', 'Congo': 'COG', 'DR Congo': 'COD', "Côte d'Ivoire": 'CIV',
-    'Djibouti': 'DJI', 'Egypt': 'EGY', 'Equatorial Guinea': 'GNQ', 'Eritrea': 'ERI', 'Eswatini': 'SWZ',
-    'Ethiopia': 'ETH', 'Gabon': 'GAB', 'Gambia': 'GMB', 'Ghana': 'GHA', 'Guinea': 'GIN',
-    'Guinea-Bissau': 'GNB', 'Kenya': 'KEN', 'Lesotho': 'LSO', 'Liberia': 'LBR', 'Libya': 'LBY',
-    'Madagascar': 'MDG', 'Malawi': 'MWI', 'Mali': 'MLI', 'Mauritania': 'MRT', 'Mauritius': 'MUS',
-    'Morocco': 'MAR', 'Mozambique': 'MOZ', 'Namibia': 'NAM', 'Niger': 'NER', 'Nigeria': 'NGA',
-    'Rwanda': 'RWA', 'São Tomé and Príncipe': 'STP', 'Senegal': 'SEN', 'Seychelles': 'SYC',
-    'Sierra Leone': 'SLE', 'Somalia': 'SOM', 'South Africa': 'ZAF', 'South Sudan': 'SSD',
-    'Sudan': 'SDN', 'Tanzania': 'TZA', 'Togo': 'TGO', 'Tunisia': 'TUN', 'Uganda': 'UGA',
-    'Zambia': 'ZMB', 'Zimbabwe': 'ZWE', 'Cabo Verde': 'CPV'
-}
-
-latest_data['ISO3'] = latest_data['Country'].map(iso3_map)
+# ISO3 codes from the country registry
+latest_data['ISO3'] = iso3_codes(latest_data)
+
+# Three countries with the most similar composite score profile
+peer_index = load_peer_index()
+latest_data['Closest Peers'] = [', '.join(peer_index.peers(c, latest_year, k=3)['Country'])
+                                for c in latest_data['Country']]
 
 fig_map = px.choropleth(latest_data,
                         locations='ISO3',
                         color='OVERALL GOVERNANCE',
                         hover_name='Country',
-                        hover_data={'OVERALL GOVERNANCE': ':.1f', 'ISO3': False, 'Region': True},
+                        hover_data={'OVERALL GOVERNANCE': ':.1f', 'ISO3': False, 'Region': True, 'Closest Peers': True},
                         color_continuous_scale='RdYlGn',
                         range_color=[0, 100],
                         scope='africa',
@@ -110,16 +77,24 @@ print("  [2/8] Creating interactive time series...")
 top10_countries = latest_data.nlargest(10, 'OVERALL GOVERNANCE')['Country'].values
 
 fig_timeseries = go.Figure()
+rolling = load_rolling('composite')
 
 for country in top10_countries[:5]:  # Top 5
     country_data = composite_scores[composite_scores['Country'] == country]
+    # 3-year mean and volatility and 5-year slope of the window ending in each year
+    window_stats = pd.concat([rolling.country(country, 'OVERALL GOVERNANCE', window=3)[['mean', 'volatility']],
+                              rolling.country(country, 'OVERALL GOVERNANCE', window=5)['slope']], axis=1)
+    window_stats = window_stats.reindex(country_data['Year'])
     fig_timeseries.add_trace(go.Scatter(
         x=country_data['Year'],
         y=country_data['OVERALL GOVERNANCE'],
         mode='lines+markers',
         name=country,
         line=dict(width=3),
-        marker=dict(size=8)
+        marker=dict(size=8),
+        customdata=window_stats.to_numpy(),
+        hovertemplate=('%{y:.1f} (3-yr mean %{customdata[0]:.1f}, volatility %{customdata[1]:.2f}; '
+                       '5-yr slope %{customdata[2]:+.2f}/yr)')
     ))
 
 fig_timeseries.update_layout(
@@ -256,6 +231,8 @@ fig_scatter = make_subplots(
     vertical_spacing=0.12,
     horizontal_spacing=0.10
 )
+# Least-squares line of OVERALL GOVERNANCE on each category, all four at once
+category_fits = fit_lines(latest_data[main_categories].to_numpy().T, latest_data['OVERALL GOVERNANCE'].to_numpy())
 
 for idx, cat in enumerate(main_categories):
     row = idx // 2 + 1
@@ -279,14 +256,12 @@ for idx, cat in enumerate(main_categories):
     )
 
     # Add trendline
-    z = np.polyfit(plot_data[cat], plot_data['OVERALL GOVERNANCE'], 1)
-    p = np.poly1d(z)
     x_line = np.linspace(plot_data[cat].min(), plot_data[cat].max(), 100)
 
     fig_scatter.add_trace(
         go.Scatter(
             x=x_line,
-            y=p(x_line),
+            y=category_fits[idx, INTERCEPT] + category_fits[idx, SLOPE] * x_line,
             mode='lines',
             line=dict(color='red', dash='dash', width=2),
             showlegend=False
@@ -310,12 +285,12 @@ fig_scatter.write_html(output_dir / 'interactive_scatter.html')
 # ============================================================================
 print("  [7/8] Creating interactive regional comparison...")
 
-regional_data = latest_data[latest_data['Region'] != 'Other'].copy()
+regional_aggregates = load_aggregates('Region').frame('mean', latest_year, ['OVERALL GOVERNANCE'] + main_categories)
 
 fig_regional = go.Figure()
 
 for cat in ['OVERALL GOVERNANCE'] + main_categories:
-    regional_means = regional_data.groupby('Region')[cat].mean().sort_values(ascending=False)
+    regional_means = regional_aggregates[cat].sort_values(ascending=False)
 
     fig_regional.add_trace(go.Bar(
         name=cat,
@@ -344,10 +319,10 @@ print("  [8/8] Creating interactive box plot...")
 
 fig_box = go.Figure()
 
-regions_sorted = regional_data.groupby('Region')['OVERALL GOVERNANCE'].mean().sort_values(ascending=False).index
+regions_sorted = regional_aggregates['OVERALL GOVERNANCE'].sort_values(ascending=False).index
 
 for region in regions_sorted:
-    region_scores = regional_data[regional_data['Region'] == region]['OVERALL GOVERNANCE'].dropna()
+    region_scores = latest_data[latest_data['Region'] == region]['OVERALL GOVERNANCE'].dropna()
 
     fig_box.add_trace(go.Box(
         y=region_scores,
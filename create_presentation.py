@@ -7,41 +7,21 @@ from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
-import pandas as pd
-import numpy as np
 from pathlib import Path
+from iiag.aggregates import load_aggregates
+from iiag.changes import change_table
+from iiag.data import load_composite_scores
+from iiag.regions import assign_regions
+from iiag.uncertainty import simulate_ranks
 
 print("Creating PowerPoint Presentation...")
 print("=" * 60)
 
 # Load data for slide content
-data_path = Path('data/csv-files')
-composite_scores = pd.read_csv(data_path / '2024 IIAG_Composite Scores.csv', encoding='utf-8-sig')
-composite_scores = composite_scores.replace('.', np.nan)
-for col in composite_scores.columns[3:]:
-    composite_scores[col] = pd.to_numeric(composite_scores[col], errors='coerce')
-
-# Regional groupings
-regional_groups = {
-    'North Africa': ['Algeria', 'Egypt', 'Libya', 'Morocco', 'Tunisia'],
-    'West Africa': ['Benin', 'Burkina Faso', 'Cape Verde', 'Côte d\'Ivoire', 'Gambia', 'Ghana', 'Guinea',
-                    'Guinea-Bissau', 'Liberia', 'Mali', 'Mauritania', 'Niger', 'Nigeria', 'Senegal',
-                    'Sierra Leone', 'Togo'],
-    'East Africa': ['Burundi', 'Comoros', 'Djibouti', 'Eritrea', 'Ethiopia', 'Kenya', 'Madagascar',
-                    'Mauritius', 'Rwanda', 'Seychelles', 'Somalia', 'South Sudan', 'Sudan', 'Tanzania', 'Uganda'],
-    'Central Africa': ['Cameroon', 'Central African Republic', 'Chad', 'Congo', 'DR Congo', 'Equatorial Guinea',
-                       'Gabon', 'São Tomé and Príncipe'],
-    'Southern Africa': ['Angola', 'Botswana', 'Eswatini', 'Lesotho', 'Malawi', 'Mozambique', 'Namibia',
-                        'South Africa', 'Zambia', 'Zimbabwe']
-}
-
-def get_region(country):
-    for region, countries in regional_groups.items():
-        if country in countries:
-            return region
-    return 'Other'
-
-composite_scores['Region'] = composite_scores['Country'].apply(get_region)
+composite_scores = load_composite_scores()
+
+# Regional groupings (looked up by Country_ISO in the country registry)
+composite_scores['Region'] = assign_regions(composite_scores)
 latest_year = composite_scores['Year'].max()
 latest_data = composite_scores[composite_scores['Year'] == latest_year].copy()
 
@@ -276,10 +256,12 @@ print("  [7/20] Creating top 10 analysis slide...")
 slide = add_content_slide(prs, "Excellence in Governance: Top 10 Countries")
 
 top_10 = latest_data.nlargest(10, 'OVERALL GOVERNANCE')[['Country', 'OVERALL GOVERNANCE']]
+# Chance of a top-10 rank given the published standard errors
+p_top_10 = simulate_ranks(10000).summary(latest_year, k=10)['P(Top 10)']
 
 # Create table
 rows = 11
-cols = 2
+cols = 3
 left = Inches(2)
 top = Inches(1.8)
 width = Inches(6)
@@ -288,14 +270,16 @@ height = Inches(4.5)
 table = slide.shapes.add_table(rows, cols, left, top, width, height).table
 
 # Set column widths
-table.columns[0].width = Inches(4)
-table.columns[1].width = Inches(2)
+table.columns[0].width = Inches(3.4)
+table.columns[1].width = Inches(1.1)
+table.columns[2].width = Inches(1.5)
 
 # Header
 table.cell(0, 0).text = "Country"
 table.cell(0, 1).text = "Score"
+table.cell(0, 2).text = "P(Top 10)"
 
-for i in range(2):
+for i in range(3):
     cell = table.cell(0, i)
     cell.fill.solid()
     cell.fill.fore_color.rgb = PRIMARY_COLOR
@@ -307,8 +291,9 @@ for i in range(2):
 for i, (idx, row) in enumerate(top_10.iterrows(), 1):
     table.cell(i, 0).text = f"{i}. {row['Country']}"
     table.cell(i, 1).text = f"{row['OVERALL GOVERNANCE']:.1f}"
+    table.cell(i, 2).text = f"{p_top_10[row['Country']]:.0%}"
 
-    for j in range(2):
+    for j in range(3):
         cell = table.cell(i, j)
         cell.text_frame.paragraphs[0].font.size = Pt(16)
         if i % 2 == 0:
@@ -349,21 +334,7 @@ print("  [10/20] Creating improvement champions slide...")
 slide = add_content_slide(prs, "Remarkable Improvements: Top Gainers (2014-2023)")
 
 # Calculate changes
-def calculate_change(df, country, start_year, end_year):
-    start_score = df[(df['Country'] == country) & (df['Year'] == start_year)]['OVERALL GOVERNANCE'].values
-    end_score = df[(df['Country'] == country) & (df['Year'] == end_year)]['OVERALL GOVERNANCE'].values
-    if len(start_score) > 0 and len(end_score) > 0:
-        return end_score[0] - start_score[0]
-    return np.nan
-
-countries_list = composite_scores['Country'].unique()
-changes = []
-for country in countries_list:
-    change = calculate_change(composite_scores, country, 2014, 2023)
-    if not np.isnan(change):
-        changes.append({'Country': country, 'Change': change})
-
-changes_df = pd.DataFrame(changes).sort_values('Change', ascending=False)
+changes_df = change_table(composite_scores, 2014, 2023)
 top_improvers = changes_df.head(8)
 
 # Create table
@@ -463,8 +434,8 @@ add_image_slide(prs, "Regional Patterns: Geographic Governance Divide", "visuali
 print("  [15/20] Creating regional insights slide...")
 slide = add_content_slide(prs, "Regional Performance Analysis")
 
-regional_stats = latest_data.groupby('Region')['OVERALL GOVERNANCE'].agg(['mean', 'count']).round(1)
-regional_stats = regional_stats[regional_stats.index != 'Other'].sort_values('mean', ascending=False)
+regional_stats = load_aggregates('Region').series_frame('OVERALL GOVERNANCE', latest_year)[['mean', 'count']].round(1)
+regional_stats = regional_stats.sort_values('mean', ascending=False)
 
 bullets = [
     f"Southern Africa leads at {regional_stats.loc['Southern Africa', 'mean']} average",
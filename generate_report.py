@@ -8,7 +8,13 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib.backends.backend_pdf import PdfPages
-from pathlib import Path
+from iiag.aggregates import CONTINENT, load_aggregates
+from iiag.changes import change_table
+from iiag.correlation import load_correlations
+from iiag.data import load_composite_scores
+from iiag.hierarchy import load_tree
+from iiag.regions import REGIONS, assign_regions, countries_in_region
+from iiag.trends import INTERCEPT, SLOPE, fit_lines
 from datetime import datetime
 import warnings
 from math import pi
@@ -20,71 +26,31 @@ sns.set_palette("husl")
 
 # Load data
 print("Loading data...")
-data_path = Path('data/csv-files')
-composite_scores = pd.read_csv(data_path / '2024 IIAG_Composite Scores.csv', encoding='utf-8-sig')
-
-# Clean data
-composite_scores = composite_scores.replace('.', np.nan)
-for col in composite_scores.columns[3:]:
-    composite_scores[col] = pd.to_numeric(composite_scores[col], errors='coerce')
-
-# Define categories
-main_categories = [
-    'SECURITY & RULE OF LAW',
-    'PARTICIPATION, RIGHTS & INCLUSION',
-    'FOUNDATIONS FOR ECONOMIC OPPORTUNITY',
-    'HUMAN DEVELOPMENT'
-]
-
-subcategories = {
-    'SECURITY & RULE OF LAW': ['SECURITY & SAFETY', 'RULE OF LAW & JUSTICE', 'ACCOUNTABILITY & TRANSPARENCY', 'ANTI-CORRUPTION'],
-    'PARTICIPATION, RIGHTS & INCLUSION': ['PARTICIPATION', 'RIGHTS', 'INCLUSION & EQUALITY', "WOMEN'S EQUALITY"],
-    'FOUNDATIONS FOR ECONOMIC OPPORTUNITY': ['PUBLIC ADMINISTRATION', 'BUSINESS & LABOUR ENVIRONMENT', 'INFRASTRUCTURE', 'RURAL ECONOMY'],
-    'HUMAN DEVELOPMENT': ['HEALTH', 'EDUCATION', 'SOCIAL PROTECTION & WELFARE', 'SUSTAINABLE ENVIRONMENT']
-}
-
-# Regional groupings
-regional_groups = {
-    'North Africa': ['Algeria', 'Egypt', 'Libya', 'Morocco', 'Tunisia'],
-    'West Africa': ['Benin', 'Burkina Faso', 'Cape Verde', 'Côte d\'Ivoire', 'Gambia', 'Ghana', 'Guinea',
-                    'Guinea-Bissau', 'Liberia', 'Mali', 'Mauritania', 'Niger', 'Nigeria', 'Senegal',
-                    'Sierra Leone', 'Togo'],
-    'East Africa': ['Burundi', 'Comoros', 'Djibouti', 'Eritrea', 'Ethiopia', 'Kenya', 'Madagascar',
-                    'Mauritius', 'Rwanda', 'Seychelles', 'Somalia', 'South Sudan', 'Sudan', 'Tanzania', 'Uganda'],
-    'Central Africa': ['Cameroon', 'Central African Republic', 'Chad', 'Congo', 'DR Congo', 'Equatorial Guinea',
-                       'Gabon', 'São Tomé and Príncipe'],
-    'Southern Africa': ['Angola', 'Botswana', 'Eswatini', 'Lesotho', 'Malawi', 'Mozambique', 'Namibia',
-                        'South Africa', 'Zambia', 'Zimbabwe']
-}
-
-def get_region(country):
-    for region, countries in regional_groups.items():
-        if country in countries:
-            return region
-    return 'Other'
-
-composite_scores['Region'] = composite_scores['Country'].apply(get_region)
+composite_scores = load_composite_scores()
+
+# Categories and sub-categories from the IIAG indicator hierarchy
+hierarchy = load_tree()
+main_categories = hierarchy.category_names()
+subcategories = hierarchy.subcategory_names()
+
+# Regional groupings (looked up by Country_ISO in the country registry)
+composite_scores['Region'] = assign_regions(composite_scores)
 
 latest_year = composite_scores['Year'].max()
 earliest_year = composite_scores['Year'].min()
 latest_data = composite_scores[composite_scores['Year'] == latest_year].copy()
 
-# Calculate changes
-def calculate_change(df, country, start_year, end_year):
-    start_score = df[(df['Country'] == country) & (df['Year'] == start_year)]['OVERALL GOVERNANCE'].values
-    end_score = df[(df['Country'] == country) & (df['Year'] == end_year)]['OVERALL GOVERNANCE'].values
-    if len(start_score) > 0 and len(end_score) > 0:
-        return end_score[0] - start_score[0]
-    return np.nan
+# Regional and continental statistics, precomputed for every year and series
+aggregates = load_aggregates('Region')
+overall_stats = aggregates.series_frame('OVERALL GOVERNANCE', latest_year, continent=True)
+continental = overall_stats.loc[CONTINENT]
+regional_overall = overall_stats.drop(CONTINENT)
+category_means = aggregates.frame('mean', latest_year, main_categories, continent=True).loc[CONTINENT]
+category_stds = aggregates.frame('std', latest_year, main_categories, continent=True).loc[CONTINENT]
 
+# Calculate changes
 countries_list = composite_scores['Country'].unique()
-changes = []
-for country in countries_list:
-    change = calculate_change(composite_scores, country, earliest_year, latest_year)
-    if not np.isnan(change):
-        changes.append({'Country': country, 'Change': change})
-
-changes_df = pd.DataFrame(changes).sort_values('Change', ascending=False)
+changes_df = change_table(composite_scores, earliest_year, latest_year)
 
 # Create PDF Report
 print("Generating comprehensive report...")
@@ -142,10 +108,10 @@ from {earliest_year} to {latest_year}, based on the Ibrahim Index of African Gov
 KEY FINDINGS:
 
 1. OVERALL GOVERNANCE LANDSCAPE ({latest_year})
-   • Continental Mean Score: {latest_data['OVERALL GOVERNANCE'].mean():.1f}/100
-   • Median Score: {latest_data['OVERALL GOVERNANCE'].median():.1f}/100
-   • Score Range: {latest_data['OVERALL GOVERNANCE'].min():.1f} to {latest_data['OVERALL GOVERNANCE'].max():.1f}
-   • Standard Deviation: {latest_data['OVERALL GOVERNANCE'].std():.1f}
+   • Continental Mean Score: {continental['mean']:.1f}/100
+   • Median Score: {continental['median']:.1f}/100
+   • Score Range: {continental['min']:.1f} to {continental['max']:.1f}
+   • Standard Deviation: {continental['std']:.1f}
 
 2. TOP PERFORMERS ({latest_year})
    The top five countries demonstrate exceptional governance:
@@ -156,11 +122,11 @@ KEY FINDINGS:
    {chr(10).join(f"   • {row['Country']}: +{row['Change']:.1f} points" for _, row in changes_df.head(5).iterrows())}
 
 4. REGIONAL PATTERNS
-   {chr(10).join(f"   • {region}: {score:.1f}" for region, score in latest_data.groupby('Region')['OVERALL GOVERNANCE'].mean().sort_values(ascending=False).head(5).items() if region != 'Other')}
+   {chr(10).join(f"   • {region}: {score:.1f}" for region, score in regional_overall['mean'].sort_values(ascending=False).head(5).items())}
 
 5. CATEGORY PERFORMANCE
    Average scores across main governance categories:
-   {chr(10).join(f"   • {cat}: {latest_data[cat].mean():.1f}" for cat in main_categories)}
+   {chr(10).join(f"   • {cat}: {category_means[cat]:.1f}" for cat in main_categories)}
 
 METHODOLOGY:
 The IIAG assesses governance across four main categories: Security & Rule of Law, Participation,
@@ -180,18 +146,17 @@ comprises multiple subcategories, creating a comprehensive governance assessment
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
 
     ax1.hist(latest_data['OVERALL GOVERNANCE'].dropna(), bins=20, edgecolor='black', alpha=0.7, color='#3498db')
-    ax1.axvline(latest_data['OVERALL GOVERNANCE'].mean(), color='red', linestyle='--', linewidth=2,
-                label=f'Mean: {latest_data["OVERALL GOVERNANCE"].mean():.1f}')
-    ax1.axvline(latest_data['OVERALL GOVERNANCE'].median(), color='green', linestyle='--', linewidth=2,
-                label=f'Median: {latest_data["OVERALL GOVERNANCE"].median():.1f}')
+    ax1.axvline(continental['mean'], color='red', linestyle='--', linewidth=2,
+                label=f'Mean: {continental["mean"]:.1f}')
+    ax1.axvline(continental['median'], color='green', linestyle='--', linewidth=2,
+                label=f'Median: {continental["median"]:.1f}')
     ax1.set_xlabel('Overall Governance Score', fontweight='bold', fontsize=11)
     ax1.set_ylabel('Number of Countries', fontweight='bold', fontsize=11)
     ax1.set_title(f'Distribution of Governance Scores ({latest_year})', fontweight='bold', fontsize=13)
     ax1.legend()
     ax1.grid(True, alpha=0.3)
 
-    regional_stats = latest_data.groupby('Region')['OVERALL GOVERNANCE'].mean().sort_values(ascending=False)
-    regional_stats = regional_stats[regional_stats.index != 'Other']
+    regional_stats = regional_overall['mean'].sort_values(ascending=False)
     region_data = [latest_data[latest_data['Region'] == region]['OVERALL GOVERNANCE'].dropna()
                    for region in regional_stats.index]
 
@@ -240,8 +205,8 @@ comprises multiple subcategories, creating a comprehensive governance assessment
 
     # ========== VISUALIZATION 3: Temporal Trends ==========
     print("Creating temporal trends...")
-    yearly_avg = composite_scores.groupby('Year')['OVERALL GOVERNANCE'].mean()
-    yearly_categories = composite_scores.groupby('Year')[main_categories].mean()
+    yearly_avg = aggregates.over_years('mean', 'OVERALL GOVERNANCE')
+    yearly_categories = aggregates.over_years('mean', main_categories)
 
     fig, ax = plt.subplots(figsize=(14, 7))
 
@@ -309,8 +274,8 @@ comprises multiple subcategories, creating a comprehensive governance assessment
 
     # ========== VISUALIZATION 6: Regional Comparison ==========
     print("Creating regional comparison...")
-    regional_means = latest_data.groupby('Region')[['OVERALL GOVERNANCE'] + main_categories].mean()
-    regional_means = regional_means[regional_means.index != 'Other'].sort_values('OVERALL GOVERNANCE', ascending=False)
+    regional_means = aggregates.frame('mean', latest_year, ['OVERALL GOVERNANCE'] + main_categories)
+    regional_means = regional_means.sort_values('OVERALL GOVERNANCE', ascending=False)
 
     fig, ax = plt.subplots(figsize=(14, 7))
     x = np.arange(len(regional_means))
@@ -338,6 +303,8 @@ comprises multiple subcategories, creating a comprehensive governance assessment
     print("Creating correlation scatter plots...")
     fig, axes = plt.subplots(2, 2, figsize=(14, 12))
     axes = axes.flatten()
+    category_fits = fit_lines(latest_data[main_categories].to_numpy().T, latest_data['OVERALL GOVERNANCE'].to_numpy())
+    correlations = load_correlations('composite')
 
     for idx, cat in enumerate(main_categories):
         ax = axes[idx]
@@ -346,12 +313,11 @@ comprises multiple subcategories, creating a comprehensive governance assessment
         ax.scatter(plot_data[cat], plot_data['OVERALL GOVERNANCE'],
                    alpha=0.6, s=80, edgecolors='black', linewidth=0.5, color='#3498db')
 
-        z = np.polyfit(plot_data[cat], plot_data['OVERALL GOVERNANCE'], 1)
-        p = np.poly1d(z)
-        ax.plot(plot_data[cat].sort_values(), p(plot_data[cat].sort_values()),
+        x_line = plot_data[cat].sort_values()
+        ax.plot(x_line, category_fits[idx, INTERCEPT] + category_fits[idx, SLOPE] * x_line,
                 "r--", linewidth=2.5, alpha=0.8)
 
-        corr = plot_data[cat].corr(plot_data['OVERALL GOVERNANCE'])
+        corr = correlations.pair(cat, 'OVERALL GOVERNANCE', latest_year)
 
         ax.set_xlabel(cat, fontweight='bold', fontsize=10)
         ax.set_ylabel('Overall Governance Score', fontweight='bold', fontsize=10)
@@ -410,12 +376,13 @@ comprises multiple subcategories, creating a comprehensive governance assessment
     decliners = changes_df[changes_df['Change'] < 0]
 
     regional_changes = []
-    for region in regional_groups.keys():
-        region_countries = [c for c in countries_list if get_region(c) == region]
+    for region in REGIONS:
+        region_countries = countries_in_region(region)
         region_change = changes_df[changes_df['Country'].isin(region_countries)]['Change'].mean()
         if not np.isnan(region_change):
             regional_changes.append((region, region_change))
     regional_changes.sort(key=lambda x: x[1], reverse=True)
+    corr_security = correlations.pair('SECURITY & RULE OF LAW', 'OVERALL GOVERNANCE', latest_year)
 
     analysis_text = f"""
 DETAILED ANALYSIS AND INSIGHTS
@@ -423,21 +390,21 @@ DETAILED ANALYSIS AND INSIGHTS
 1. TEMPORAL DYNAMICS ({earliest_year}-{latest_year})
 
    Continental Trend:
-   • Overall governance score changed from {composite_scores[composite_scores['Year']==earliest_year]['OVERALL GOVERNANCE'].mean():.1f} ({earliest_year}) to {latest_data['OVERALL GOVERNANCE'].mean():.1f} ({latest_year})
-   • Net change: {latest_data['OVERALL GOVERNANCE'].mean() - composite_scores[composite_scores['Year']==earliest_year]['OVERALL GOVERNANCE'].mean():.2f} points
+   • Overall governance score changed from {yearly_avg[earliest_year]:.1f} ({earliest_year}) to {yearly_avg[latest_year]:.1f} ({latest_year})
+   • Net change: {yearly_avg[latest_year] - yearly_avg[earliest_year]:.2f} points
    • Countries improving: {len(improvers)} ({len(improvers)/len(changes_df)*100:.1f}%)
    • Countries declining: {len(decliners)} ({len(decliners)/len(changes_df)*100:.1f}%)
 
 2. CATEGORY-SPECIFIC INSIGHTS ({latest_year})
 
    Strongest Category (Continental Average):
-   • {max([(cat, latest_data[cat].mean()) for cat in main_categories], key=lambda x: x[1])[0]}: {max([latest_data[cat].mean() for cat in main_categories]):.1f}
+   • {category_means.idxmax()}: {category_means.max():.1f}
 
    Weakest Category (Continental Average):
-   • {min([(cat, latest_data[cat].mean()) for cat in main_categories], key=lambda x: x[1])[0]}: {min([latest_data[cat].mean() for cat in main_categories]):.1f}
+   • {category_means.idxmin()}: {category_means.min():.1f}
 
    Category Variability (Standard Deviation):
-   {chr(10).join(f"   • {cat}: {latest_data[cat].std():.1f}" for cat in main_categories)}
+   {chr(10).join(f"   • {cat}: {category_stds[cat]:.1f}" for cat in main_categories)}
 
 3. REGIONAL PERFORMANCE DYNAMICS
 
@@ -445,14 +412,13 @@ DETAILED ANALYSIS AND INSIGHTS
    {chr(10).join(f"   {i+1}. {region}: {change:+.2f} points" for i, (region, change) in enumerate(regional_changes[:5]))}
 
    Regional Governance Spread ({latest_year}):
-   • Highest regional variance: {max([(r, latest_data[latest_data['Region']==r]['OVERALL GOVERNANCE'].std()) for r in regional_groups.keys()], key=lambda x: x[1])[0]}
-   • Most homogeneous region: {min([(r, latest_data[latest_data['Region']==r]['OVERALL GOVERNANCE'].std()) for r in regional_groups.keys() if len(latest_data[latest_data['Region']==r]) > 3], key=lambda x: x[1])[0]}
+   • Highest regional variance: {regional_overall['std'].idxmax()}
+   • Most homogeneous region: {regional_overall.loc[regional_overall['count'] > 3, 'std'].idxmin()}
 
 4. NOTABLE PATTERNS AND OBSERVATIONS
 
    • The correlation between 'Security & Rule of Law' and 'Overall Governance' is
-     {latest_data[['SECURITY & RULE OF LAW', 'OVERALL GOVERNANCE']].corr().iloc[0,1]:.3f}, indicating {
-     'strong' if abs(latest_data[['SECURITY & RULE OF LAW', 'OVERALL GOVERNANCE']].corr().iloc[0,1]) > 0.8 else 'moderate'}
+     {corr_security:.3f}, indicating {'strong' if abs(corr_security) > 0.8 else 'moderate'}
      relationship
 
    • {len(latest_data[latest_data['OVERALL GOVERNANCE'] >= 60])} countries ({len(latest_data[latest_data['OVERALL GOVERNANCE'] >= 60])/len(latest_data)*100:.1f}%)
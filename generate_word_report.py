@@ -8,6 +8,14 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+from iiag.aggregates import CONTINENT, load_aggregates
+from iiag.changes import change_table
+from iiag.correlation import load_correlations
+from iiag.data import load_composite_scores
+from iiag.hierarchy import load_tree
+from iiag.peers import load_peer_index
+from iiag.regions import REGIONS, assign_regions, countries_in_region
+from iiag.trends import INTERCEPT, SLOPE, fit_lines
 from datetime import datetime
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
@@ -23,71 +31,32 @@ sns.set_palette("husl")
 
 # Load data
 print("Loading data...")
-data_path = Path('data/csv-files')
-composite_scores = pd.read_csv(data_path / '2024 IIAG_Composite Scores.csv', encoding='utf-8-sig')
-
-# Clean data
-composite_scores = composite_scores.replace('.', np.nan)
-for col in composite_scores.columns[3:]:
-    composite_scores[col] = pd.to_numeric(composite_scores[col], errors='coerce')
-
-# Define categories
-main_categories = [
-    'SECURITY & RULE OF LAW',
-    'PARTICIPATION, RIGHTS & INCLUSION',
-    'FOUNDATIONS FOR ECONOMIC OPPORTUNITY',
-    'HUMAN DEVELOPMENT'
-]
+composite_scores = load_composite_scores()
+
+# Categories and sub-categories from the IIAG indicator hierarchy
+hierarchy = load_tree()
+main_categories = hierarchy.category_names()
+subcategories = hierarchy.subcategory_names()
 
-subcategories = {
-    'SECURITY & RULE OF LAW': ['SECURITY & SAFETY', 'RULE OF LAW & JUSTICE', 'ACCOUNTABILITY & TRANSPARENCY', 'ANTI-CORRUPTION'],
-    'PARTICIPATION, RIGHTS & INCLUSION': ['PARTICIPATION', 'RIGHTS', 'INCLUSION & EQUALITY', "WOMEN'S EQUALITY"],
-    'FOUNDATIONS FOR ECONOMIC OPPORTUNITY': ['PUBLIC ADMINISTRATION', 'BUSINESS & LABOUR ENVIRONMENT', 'INFRASTRUCTURE', 'RURAL ECONOMY'],
-    'HUMAN DEVELOPMENT': ['HEALTH', 'EDUCATION', 'SOCIAL PROTECTION & WELFARE', 'SUSTAINABLE ENVIRONMENT']
-}
-
-# Regional groupings
-regional_groups = {
-    'North Africa': ['Algeria', 'Egypt', 'Libya', 'Morocco', 'Tunisia'],
-    'West Africa': ['Benin', 'Burkina Faso', 'Cape Verde', 'Côte d\'Ivoire', 'Gambia', 'Ghana', 'Guinea',
-                    'Guinea-Bissau', 'Liberia', 'Mali', 'Mauritania', 'Niger', 'Nigeria', 'Senegal',
-                    'Sierra Leone', 'Togo'],
-    'East Africa': ['Burundi', 'Comoros', 'Djibouti', 'Eritrea', 'Ethiopia', 'Kenya', 'Madagascar',
-                    'Mauritius', 'Rwanda', 'Seychelles', 'Somalia', 'South Sudan', 'Sudan', 'Tanzania', 'Uganda'],
-    'Central Africa': ['Cameroon', 'Central African Republic', 'Chad', 'Congo', 'DR Congo', 'Equatorial Guinea',
-                       'Gabon', 'São Tomé and Príncipe'],
-    'Southern Africa': ['Angola', 'Botswana', 'Eswatini', 'Lesotho', 'Malawi', 'Mozambique', 'Namibia',
-                        'South Africa', 'Zambia', 'Zimbabwe']
-}
-
-def get_region(country):
-    for region, countries in regional_groups.items():
-        if country in countries:
-            return region
-    return 'Other'
-
-composite_scores['Region'] = composite_scores['Country'].apply(get_region)
+# Regional groupings (looked up by Country_ISO in the country registry)
+composite_scores['Region'] = assign_regions(composite_scores)
 
 latest_year = composite_scores['Year'].max()
 earliest_year = composite_scores['Year'].min()
 latest_data = composite_scores[composite_scores['Year'] == latest_year].copy()
 
-# Calculate changes
-def calculate_change(df, country, start_year, end_year):
-    start_score = df[(df['Country'] == country) & (df['Year'] == start_year)]['OVERALL GOVERNANCE'].values
-    end_score = df[(df['Country'] == country) & (df['Year'] == end_year)]['OVERALL GOVERNANCE'].values
-    if len(start_score) > 0 and len(end_score) > 0:
-        return end_score[0] - start_score[0]
-    return np.nan
+# Regional and continental statistics, precomputed for every year and series
+aggregates = load_aggregates('Region')
+overall_stats = aggregates.series_frame('OVERALL GOVERNANCE', latest_year, continent=True)
+continental = overall_stats.loc[CONTINENT]
+regional_overall = overall_stats.drop(CONTINENT)
+category_means = aggregates.frame('mean', latest_year, main_categories, continent=True).loc[CONTINENT]
+category_stds = aggregates.frame('std', latest_year, main_categories, continent=True).loc[CONTINENT]
+yearly_avg = aggregates.over_years('mean', 'OVERALL GOVERNANCE')
 
+# Calculate changes
 countries_list = composite_scores['Country'].unique()
-changes = []
-for country in countries_list:
-    change = calculate_change(composite_scores, country, earliest_year, latest_year)
-    if not np.isnan(change):
-        changes.append({'Country': country, 'Change': change})
-
-changes_df = pd.DataFrame(changes).sort_values('Change', ascending=False)
+changes_df = change_table(composite_scores, earliest_year, latest_year)
 
 # Create temporary directory for charts
 temp_dir = Path('temp_charts')
@@ -103,18 +72,17 @@ print("  Creating distribution chart...")
 fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
 
 ax1.hist(latest_data['OVERALL GOVERNANCE'].dropna(), bins=20, edgecolor='black', alpha=0.7, color='#3498db')
-ax1.axvline(latest_data['OVERALL GOVERNANCE'].mean(), color='red', linestyle='--', linewidth=2,
-            label=f'Mean: {latest_data["OVERALL GOVERNANCE"].mean():.1f}')
-ax1.axvline(latest_data['OVERALL GOVERNANCE'].median(), color='green', linestyle='--', linewidth=2,
-            label=f'Median: {latest_data["OVERALL GOVERNANCE"].median():.1f}')
+ax1.axvline(continental['mean'], color='red', linestyle='--', linewidth=2,
+            label=f'Mean: {continental["mean"]:.1f}')
+ax1.axvline(continental['median'], color='green', linestyle='--', linewidth=2,
+            label=f'Median: {continental["median"]:.1f}')
 ax1.set_xlabel('Overall Governance Score', fontweight='bold', fontsize=11)
 ax1.set_ylabel('Number of Countries', fontweight='bold', fontsize=11)
 ax1.set_title(f'Distribution of Governance Scores ({latest_year})', fontweight='bold', fontsize=13)
 ax1.legend()
 ax1.grid(True, alpha=0.3)
 
-regional_stats = latest_data.groupby('Region')['OVERALL GOVERNANCE'].mean().sort_values(ascending=False)
-regional_stats = regional_stats[regional_stats.index != 'Other']
+regional_stats = regional_overall['mean'].sort_values(ascending=False)
 region_data = [latest_data[latest_data['Region'] == region]['OVERALL GOVERNANCE'].dropna()
                for region in regional_stats.index]
 
@@ -167,8 +135,7 @@ chart_files.append(chart2)
 
 # Chart 3: Temporal Trends
 print("  Creating temporal trends chart...")
-yearly_avg = composite_scores.groupby('Year')['OVERALL GOVERNANCE'].mean()
-yearly_categories = composite_scores.groupby('Year')[main_categories].mean()
+yearly_categories = aggregates.over_years('mean', main_categories)
 
 fig, ax = plt.subplots(figsize=(14, 7))
 
@@ -242,8 +209,8 @@ chart_files.append(chart5)
 
 # Chart 6: Regional Comparison
 print("  Creating regional comparison chart...")
-regional_means = latest_data.groupby('Region')[['OVERALL GOVERNANCE'] + main_categories].mean()
-regional_means = regional_means[regional_means.index != 'Other'].sort_values('OVERALL GOVERNANCE', ascending=False)
+regional_means = aggregates.frame('mean', latest_year, ['OVERALL GOVERNANCE'] + main_categories)
+regional_means = regional_means.sort_values('OVERALL GOVERNANCE', ascending=False)
 
 fig, ax = plt.subplots(figsize=(14, 7))
 x = np.arange(len(regional_means))
@@ -273,6 +240,8 @@ chart_files.append(chart6)
 print("  Creating correlation chart...")
 fig, axes = plt.subplots(2, 2, figsize=(14, 12))
 axes = axes.flatten()
+category_fits = fit_lines(latest_data[main_categories].to_numpy().T, latest_data['OVERALL GOVERNANCE'].to_numpy())
+correlations = load_correlations('composite')
 
 for idx, cat in enumerate(main_categories):
     ax = axes[idx]
@@ -281,12 +250,11 @@ for idx, cat in enumerate(main_categories):
     ax.scatter(plot_data[cat], plot_data['OVERALL GOVERNANCE'],
                alpha=0.6, s=80, edgecolors='black', linewidth=0.5, color='#3498db')
 
-    z = np.polyfit(plot_data[cat], plot_data['OVERALL GOVERNANCE'], 1)
-    p = np.poly1d(z)
-    ax.plot(plot_data[cat].sort_values(), p(plot_data[cat].sort_values()),
+    x_line = plot_data[cat].sort_values()
+    ax.plot(x_line, category_fits[idx, INTERCEPT] + category_fits[idx, SLOPE] * x_line,
             "r--", linewidth=2.5, alpha=0.8)
 
-    corr = plot_data[cat].corr(plot_data['OVERALL GOVERNANCE'])
+    corr = correlations.pair(cat, 'OVERALL GOVERNANCE', latest_year)
 
     ax.set_xlabel(cat, fontweight='bold', fontsize=10)
     ax.set_ylabel('Overall Governance Score', fontweight='bold', fontsize=10)
@@ -415,10 +383,10 @@ doc.add_heading('KEY FINDINGS', 1)
 
 doc.add_heading(f'1. Overall Governance Landscape ({latest_year})', 2)
 para = doc.add_paragraph()
-para.add_run(f"• Continental Mean Score: {latest_data['OVERALL GOVERNANCE'].mean():.1f}/100\n")
-para.add_run(f"• Median Score: {latest_data['OVERALL GOVERNANCE'].median():.1f}/100\n")
-para.add_run(f"• Score Range: {latest_data['OVERALL GOVERNANCE'].min():.1f} to {latest_data['OVERALL GOVERNANCE'].max():.1f}\n")
-para.add_run(f"• Standard Deviation: {latest_data['OVERALL GOVERNANCE'].std():.1f}")
+para.add_run(f"• Continental Mean Score: {continental['mean']:.1f}/100\n")
+para.add_run(f"• Median Score: {continental['median']:.1f}/100\n")
+para.add_run(f"• Score Range: {continental['min']:.1f} to {continental['max']:.1f}\n")
+para.add_run(f"• Standard Deviation: {continental['std']:.1f}")
 
 doc.add_heading(f'2. Top Performers ({latest_year})', 2)
 doc.add_paragraph("The top five countries demonstrate exceptional governance:")
@@ -431,15 +399,13 @@ for _, row in changes_df.head(5).iterrows():
     doc.add_paragraph(f"{row['Country']}: +{row['Change']:.1f} points", style='List Bullet')
 
 doc.add_heading('4. Regional Patterns', 2)
-regional_summary = latest_data.groupby('Region')['OVERALL GOVERNANCE'].mean().sort_values(ascending=False)
-for region, score in regional_summary.head(5).items():
-    if region != 'Other':
-        doc.add_paragraph(f"{region}: {score:.1f}", style='List Bullet')
+for region, score in regional_overall['mean'].sort_values(ascending=False).head(5).items():
+    doc.add_paragraph(f"{region}: {score:.1f}", style='List Bullet')
 
 doc.add_heading('5. Category Performance', 2)
 doc.add_paragraph("Average scores across main governance categories:")
 for cat in main_categories:
-    doc.add_paragraph(f"{cat}: {latest_data[cat].mean():.1f}", style='List Bullet')
+    doc.add_paragraph(f"{cat}: {category_means[cat]:.1f}", style='List Bullet')
 
 doc.add_heading('METHODOLOGY', 2)
 doc.add_paragraph(
@@ -457,8 +423,8 @@ doc.add_heading('1. GOVERNANCE DISTRIBUTION AND REGIONAL COMPARISON', 1)
 doc.add_paragraph(
     f"Figure 1 illustrates the distribution of governance scores across all African countries in {latest_year}. "
     f"The histogram reveals the central tendency and spread of governance performance, while the boxplot "
-    f"compares regional variations. The continental mean of {latest_data['OVERALL GOVERNANCE'].mean():.1f} "
-    f"and median of {latest_data['OVERALL GOVERNANCE'].median():.1f} indicate the typical governance level."
+    f"compares regional variations. The continental mean of {continental['mean']:.1f} "
+    f"and median of {continental['median']:.1f} indicate the typical governance level."
 )
 doc.add_picture(str(chart_files[0]), width=Inches(6.5))
 
@@ -480,7 +446,7 @@ doc.add_paragraph(
     f"Figure 3 tracks the evolution of overall governance and its four main categories from {earliest_year} "
     f"to {latest_year}. This temporal analysis reveals long-term trends and patterns in African governance. "
     f"The data shows that overall governance has "
-    f"{'improved' if latest_data['OVERALL GOVERNANCE'].mean() > composite_scores[composite_scores['Year']==earliest_year]['OVERALL GOVERNANCE'].mean() else 'declined'} "
+    f"{'improved' if yearly_avg[latest_year] > yearly_avg[earliest_year] else 'declined'} "
     f"over the analysis period."
 )
 doc.add_picture(str(chart_files[2]), width=Inches(6.5))
@@ -550,17 +516,15 @@ doc.add_heading('DETAILED ANALYSIS AND INSIGHTS', 1)
 
 doc.add_heading(f'1. Temporal Dynamics ({earliest_year}-{latest_year})', 2)
 doc.add_paragraph("Continental Trend:")
-early_mean = composite_scores[composite_scores['Year']==earliest_year]['OVERALL GOVERNANCE'].mean()
 para = doc.add_paragraph()
-para.add_run(f"• Overall governance score changed from {early_mean:.1f} ({earliest_year}) to {latest_data['OVERALL GOVERNANCE'].mean():.1f} ({latest_year})\n")
-para.add_run(f"• Net change: {latest_data['OVERALL GOVERNANCE'].mean() - early_mean:.2f} points\n")
+para.add_run(f"• Overall governance score changed from {yearly_avg[earliest_year]:.1f} ({earliest_year}) to {yearly_avg[latest_year]:.1f} ({latest_year})\n")
+para.add_run(f"• Net change: {yearly_avg[latest_year] - yearly_avg[earliest_year]:.2f} points\n")
 para.add_run(f"• Countries improving: {len(improvers)} ({len(improvers)/len(changes_df)*100:.1f}%)\n")
 para.add_run(f"• Countries declining: {len(decliners)} ({len(decliners)/len(changes_df)*100:.1f}%)")
 
 doc.add_heading(f'2. Category-Specific Insights ({latest_year})', 2)
-cat_means = [(cat, latest_data[cat].mean()) for cat in main_categories]
-strongest = max(cat_means, key=lambda x: x[1])
-weakest = min(cat_means, key=lambda x: x[1])
+strongest = (category_means.idxmax(), category_means.max())
+weakest = (category_means.idxmin(), category_means.min())
 
 para = doc.add_paragraph()
 para.add_run(f"Strongest Category (Continental Average):\n")
@@ -569,12 +533,12 @@ para.add_run(f"Weakest Category (Continental Average):\n")
 para.add_run(f"• {weakest[0]}: {weakest[1]:.1f}\n\n")
 para.add_run(f"Category Variability (Standard Deviation):\n")
 for cat in main_categories:
-    para.add_run(f"• {cat}: {latest_data[cat].std():.1f}\n")
+    para.add_run(f"• {cat}: {category_stds[cat]:.1f}\n")
 
 doc.add_heading('3. Regional Performance Dynamics', 2)
 regional_changes = []
-for region in regional_groups.keys():
-    region_countries = [c for c in countries_list if get_region(c) == region]
+for region in REGIONS:
+    region_countries = countries_in_region(region)
     region_change = changes_df[changes_df['Country'].isin(region_countries)]['Change'].mean()
     if not np.isnan(region_change):
         regional_changes.append((region, region_change))
@@ -585,7 +549,7 @@ for i, (region, change) in enumerate(regional_changes[:5], 1):
     doc.add_paragraph(f"{i}. {region}: {change:+.2f} points", style='List Number')
 
 doc.add_heading('4. Notable Patterns and Observations', 2)
-corr_security = latest_data[['SECURITY & RULE OF LAW', 'OVERALL GOVERNANCE']].corr().iloc[0,1]
+corr_security = correlations.pair('SECURITY & RULE OF LAW', 'OVERALL GOVERNANCE', latest_year)
 high_performers = len(latest_data[latest_data['OVERALL GOVERNANCE'] >= 60])
 low_performers = len(latest_data[latest_data['OVERALL GOVERNANCE'] < 50])
 
@@ -597,7 +561,15 @@ para.add_run(f"• {high_performers} countries ({high_performers/len(latest_data
 para.add_run(f"• {low_performers} countries ({low_performers/len(latest_data)*100:.1f}%) scored below 50/100, "
              f"indicating significant governance challenges")
 
-doc.add_heading('5. Methodology Notes', 2)
+doc.add_heading(f'5. Peer Countries ({latest_year})', 2)
+doc.add_paragraph("The three countries whose overall, category and sub-category scores are closest to each "
+                  "country's (Euclidean distance over the 22 composite scores):")
+peer_index = load_peer_index()
+for country in sorted(latest_data['Country']):
+    peers = peer_index.peers(country, latest_year, k=3)['Country']
+    doc.add_paragraph(f"{country}: {', '.join(peers)}", style='List Bullet')
+
+doc.add_heading('6. Methodology Notes', 2)
 doc.add_paragraph(
     "The Ibrahim Index of African Governance (IIAG) provides a comprehensive assessment framework:\n"
     "• Covers 54 African countries\n"
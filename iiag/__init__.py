@@ -0,0 +1,4 @@
+"""
+IIAG Data Toolkit
+Shared loaders and array engines used by the analysis, dashboard, report and presentation scripts
+"""
@@ -0,0 +1,253 @@
+"""
+Regional Aggregate Cube
+Mean, median, spread, range, count and quantiles of every series for every
+group and year, built in one pass of segment reductions and rolled up to Africa
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import frame_to_array, open_cube
+from iiag.data import CACHE_PATH, DATA_PATH, ID_COLUMNS, load_table
+from iiag.regions import ISO2, REGION_CODES, REGIONS
+
+QUANTILES = [0.1, 0.25, 0.75, 0.9]
+STATISTICS = ['mean', 'median', 'std', 'min', 'max', 'count'] + [f'p{round(q * 100)}' for q in QUANTILES]
+CONTINENT = 'Africa'
+
+
+def _take(ordered, index, count):
+    """ordered[index] per group and position, NaN for empty groups."""
+    index = np.clip(index, 0, len(ordered) - 1)
+    return np.where(count > 0, np.take_along_axis(ordered, index, axis=0), np.nan)
+
+
+def _quantile(ordered, start, count, q):
+    """Linear-interpolated quantile (pandas' default) of each sorted run."""
+    position = q * np.maximum(count - 1, 0)
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, np.maximum(count - 1, 0))
+    low, high = _take(ordered, start + below, count), _take(ordered, start + above, count)
+    return low + (high - low) * (position - below)
+
+
+def segment_stats(values, codes, n_groups):
+    """
+    STATISTICS of `values` (country, ...) for each group of rows, in one pass.
+
+    `codes` gives each country's group (-1 = none) and may vary along the
+    next axes, e.g. (country, year) for groupings that change over time.
+    Rows are sorted once by (group, value) so every group is a contiguous
+    run with its missing values at the end; the moments come from per-group
+    sums and the order statistics are read off each run. Returns
+    (group, ..., statistic) float64; std uses n - 1 like pandas.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.asarray(codes)
+    codes = np.broadcast_to(codes.reshape(codes.shape + (1,) * (values.ndim - codes.ndim)), values.shape)
+    by_value = np.argsort(values, axis=0, kind='stable')
+    by_group = np.argsort(np.take_along_axis(codes, by_value, axis=0), axis=0, kind='stable')
+    order = np.take_along_axis(by_value, by_group, axis=0)
+    ordered = np.take_along_axis(values, order, axis=0)
+    grouped = np.take_along_axis(codes, order, axis=0)
+
+    member = grouped[None] == np.arange(n_groups).reshape((-1,) + (1,) * values.ndim)
+    present = member & ~np.isnan(ordered)[None]
+    size = member.sum(axis=1)
+    start = np.cumsum(size, axis=0) - size + (grouped < 0).sum(axis=0)
+    count = present.sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(present, ordered[None], 0).sum(axis=1) / count
+        squares = np.where(present, (ordered[None] - mean[:, None]) ** 2, 0).sum(axis=1)
+        std = np.where(count > 1, np.sqrt(squares / (count - 1)), np.nan)
+
+    columns = [mean, _quantile(ordered, start, count, 0.5), std, _take(ordered, start, count),
+               _take(ordered, start + count - 1, count), count]
+    columns += [_quantile(ordered, start, count, q) for q in QUANTILES]
+    return np.stack(columns, axis=-1).astype(np.float64)
+
+
+def roll_up(stats):
+    """
+    Combine group statistics into one higher-level group exactly where the
+    moments allow it (count, mean, std, min, max); order statistics cannot be
+    combined and are returned as NaN. `stats` is (group, ..., statistic).
+    """
+    s = {name: stats[..., i] for i, name in enumerate(STATISTICS)}
+    count = s['count'].sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(s['mean'] * s['count'], axis=0) / count
+        within = np.nansum(s['std'] ** 2 * np.maximum(s['count'] - 1, 0), axis=0)
+        between = np.nansum(s['count'] * (s['mean'] - mean) ** 2, axis=0)
+        std = np.where(count > 1, np.sqrt((within + between) / (count - 1)), np.nan)
+    out = np.full(stats.shape[1:], np.nan)
+    for name, value in [('count', count), ('mean', mean), ('std', std),
+                        ('min', np.nanmin(np.where(s['count'] > 0, s['min'], np.inf), axis=0)),
+                        ('max', np.nanmax(np.where(s['count'] > 0, s['max'], -np.inf), axis=0))]:
+        out[..., STATISTICS.index(name)] = value
+    empty = count == 0
+    out[empty] = np.nan
+    out[empty, STATISTICS.index('count')] = 0
+    return out
+
+
+class AggregateCube:
+    """Statistics shaped (group, year, series, statistic); the last group is the Africa roll-up."""
+
+    def __init__(self, data, groups, years, series, grouping):
+        self.data = data
+        self.groups = pd.Index(groups, name=grouping)
+        self.years = pd.Index(years, name='Year')
+        self.series = pd.Index(series, name='Series')
+        self.statistics = pd.Index(STATISTICS, name='Statistic')
+        self.grouping = grouping
+
+    def get(self, statistic, year=None, series=None, group=None):
+        """Slice by label; omitted axes are kept whole."""
+        key = [slice(None), slice(None), slice(None), self.statistics.get_loc(statistic)]
+        if group is not None:
+            key[0] = self.groups.get_loc(group)
+        if year is not None:
+            key[1] = self.years.get_loc(int(year))
+        if series is not None:
+            key[2] = self.series.get_loc(series)
+        return self.data[tuple(key)]
+
+    def continent(self, statistic, year=None, series=None):
+        return self.get(statistic, year, series, CONTINENT)
+
+    def frame(self, statistic, year, series=None, continent=False):
+        """Group x series DataFrame of one statistic for one year (groups only unless `continent`)."""
+        series = list(self.series) if series is None else list(series)
+        groups = self.groups if continent else self.groups[:-1]
+        values = self.data[:len(groups), self.years.get_loc(int(year)), :, self.statistics.get_loc(statistic)]
+        return pd.DataFrame(values[:, [self.series.get_loc(s) for s in series]],
+                            index=groups, columns=series)
+
+    def series_frame(self, series, year, continent=False):
+        """Group x statistic DataFrame for one series and year."""
+        groups = self.groups if continent else self.groups[:-1]
+        values = self.data[:len(groups), self.years.get_loc(int(year)), self.series.get_loc(series)]
+        return pd.DataFrame(values, index=groups, columns=self.statistics)
+
+    def over_years(self, statistic, series, group=CONTINENT):
+        """One statistic of some series across all years (e.g. the continental average trend)."""
+        columns = [series] if isinstance(series, str) else list(series)
+        values = self.data[self.groups.get_loc(group), :, [self.series.get_loc(s) for s in columns],
+                           self.statistics.get_loc(statistic)]
+        frame = pd.DataFrame(values.T, index=self.years, columns=columns)
+        return frame[series] if isinstance(series, str) else frame
+
+
+def _group_codes(grouping, cube):
+    """(codes, group names) for the composite cube's countries; codes may be (country, year)."""
+    if grouping == 'Region':
+        codes = pd.Series(REGION_CODES, index=ISO2).reindex(cube.iso, fill_value=-1).to_numpy()
+        return codes, REGIONS
+    if grouping == 'Peer Group':
+        from iiag.clusters import load_peer_groups
+        groups = load_peer_groups()
+        return groups.labels(5).astype(np.int64), [f'Peer Group {g + 1}' for g in range(5)]
+    raise ValueError(f"unknown grouping {grouping!r}; use 'Region' or 'Peer Group'")
+
+
+def _composite_values(cube, years, data_path, cache_path):
+    """(country, year, series) float64 composite scores for some years."""
+    # The float64 table rather than the float32 cube, so means match pandas on the same data
+    table = load_table('composite', data_path, cache_path)
+    return frame_to_array(table, cube.iso, cube.countries, years,
+                          [c for c in table.columns if c not in ID_COLUMNS], 'float64', np.nan)
+
+
+def _aggregate(values, codes, n_groups):
+    """(group + continent, year, series, statistic) statistics of (country, year, series) values."""
+    stats = segment_stats(values, codes, n_groups)
+
+    # Moments roll up exactly from the groups; order statistics need the data
+    continent = segment_stats(values, np.zeros(len(values), dtype=np.int64), 1)[0]
+    rolled = roll_up(stats)
+    moments = [STATISTICS.index(s) for s in ['mean', 'std', 'min', 'max', 'count']]
+    continent[..., moments] = rolled[..., moments]
+    return np.concatenate([stats, continent[None]])
+
+
+def build_aggregates(grouping='Region', data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """Aggregate the composite cube by `grouping` and roll the groups up to the continent."""
+    cube = open_cube('composite', data_path, cache_path)
+    codes, names = _group_codes(grouping, cube)
+    values = _composite_values(cube, cube.years, data_path, cache_path)
+    return AggregateCube(_aggregate(values, codes, len(names)), list(names) + [CONTINENT],
+                         cube.years, cube.indicators, grouping)
+
+
+def _cache(grouping, cache_path, sha1):
+    """(cache file, key) of one grouping's cube for a given Composite Scores SHA-1."""
+    cache_file = Path(cache_path) / 'cubes' / f"aggregates_{grouping.lower().replace(' ', '_')}.npz"
+    return cache_file, json.dumps({'sha1': sha1, 'statistics': STATISTICS})
+
+
+def _composite_sha1(cache_path):
+    axes = json.loads((Path(cache_path) / 'cubes' / 'composite.json').read_text(encoding='utf-8'))
+    return axes['source']['sha1']
+
+
+def load_aggregates(grouping='Region', data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """Cached AggregateCube, rebuilt when the Composite Scores file (or the grouping) changes."""
+    open_cube('composite', data_path, cache_path)
+    cache_file, key = _cache(grouping, cache_path, _composite_sha1(cache_path))
+
+    if cache_file.exists() and not refresh:
+        with np.load(cache_file, allow_pickle=False) as npz:
+            if str(npz['key']) == key:
+                return AggregateCube(npz['data'], npz['groups'].tolist(), npz['years'], npz['series'].tolist(),
+                                     grouping)
+
+    aggregates = build_aggregates(grouping, data_path, cache_path)
+    _save(cache_file, key, aggregates)
+    return aggregates
+
+
+def _save(cache_file, key, aggregates):
+    np.savez(cache_file, key=np.array(key), data=aggregates.data, groups=np.array(list(aggregates.groups)),
+             years=np.asarray(aggregates.years), series=np.array(list(aggregates.series)))
+
+
+def extend_aggregates(previous_sha1, data_path=DATA_PATH, cache_path=CACHE_PATH, grouping='Region'):
+    """
+    Aggregate only the years appended to the composite cube (see iiag.append)
+    and add them to the cached cube; returns the file or None. Peer groups
+    are re-clustered over the whole range, so only regions are extended.
+    """
+    cache_file, key = _cache(grouping, cache_path, previous_sha1)
+    if grouping != 'Region' or not cache_file.exists():
+        return None
+    with np.load(cache_file, allow_pickle=False) as npz:
+        if str(npz['key']) != key:
+            return None
+        data, groups, years = npz['data'], npz['groups'].tolist(), npz['years'].tolist()
+
+    cube = open_cube('composite', data_path, cache_path)
+    if cube.years[:len(years)].tolist() != years:
+        return None
+    codes, names = _group_codes(grouping, cube)
+    values = _composite_values(cube, cube.years[len(years):], data_path, cache_path)
+    data = np.concatenate([data, _aggregate(values, codes, len(names))], axis=1)
+    cache_file, key = _cache(grouping, cache_path, _composite_sha1(cache_path))
+    _save(cache_file, key, AggregateCube(data, groups, cube.years, cube.indicators, grouping))
+    return cache_file
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    aggregates = load_aggregates(refresh=True)
+    elapsed = time.perf_counter() - start
+    year = int(aggregates.years.max())
+    print(f"Aggregated {len(aggregates.series)} series x {len(aggregates.years)} years for "
+          f"{len(aggregates.groups)} groups in {elapsed:.3f}s")
+    print(aggregates.series_frame('OVERALL GOVERNANCE', year, continent=True).round(1).to_string())
@@ -0,0 +1,65 @@
+"""
+Incremental Year Append
+When a new edition only adds a year, extends the cubes and the caches built
+from them with that year's slice instead of rebuilding everything
+"""
+
+from functools import partial
+
+from iiag.aggregates import extend_aggregates
+from iiag.correlation import extend_correlations
+from iiag.cube import CUBE_SPECS, extend_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.provenance import extend_provenance
+from iiag.rolling import extend_rolling
+from iiag.trends import extend_trends
+
+# Caches that take a new year as one more slice (or, for rolling windows, the
+# few windows ending in it), by the cube they are built from. The rest (peer
+# index, peer groups, fitted normalisation bounds) depend on every year at
+# once; their keys stop matching and they rebuild on next use.
+# Changes, year-on-year matrices and ranks are not cached: they are array
+# differences and sorts over the cubes.
+EXTENDERS = {
+    'composite': [extend_aggregates, partial(extend_correlations, 'composite'), partial(extend_trends, 'composite'),
+                  partial(extend_rolling, 'composite')],
+    'raw': [partial(extend_correlations, 'raw'), partial(extend_trends, 'raw'), partial(extend_rolling, 'raw')],
+    'processed': [partial(extend_correlations, 'processed'), partial(extend_trends, 'processed'),
+                  partial(extend_rolling, 'processed')],
+    'processed_type': [extend_provenance],
+}
+
+
+def append_new_years(data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """
+    Extend every cube whose CSV gained years (and nothing else), then its caches.
+
+    The composite cube goes first since it sets the year axis of every cube.
+    A file that changed in any other way is left alone and rebuilt in full
+    the next time it is opened. Returns {table: (new years, extended cache files)}.
+    """
+    appended = {}
+    for name in CUBE_SPECS:
+        extended = extend_cube(name, data_path, cache_path)
+        if extended is None:
+            continue
+        previous_sha1, years = extended
+        files = [extend(previous_sha1, data_path=data_path, cache_path=cache_path)
+                 for extend in EXTENDERS.get(name, [])]
+        appended[name] = (years, [f for f in files if f is not None])
+    return appended
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    appended = append_new_years()
+    elapsed = time.perf_counter() - start
+    if not appended:
+        print("No table gained new years; nothing to append")
+    for name, (years, files) in appended.items():
+        print(f"  {name:<16} + {', '.join(str(y) for y in years)}  "
+              f"({', '.join(f.name for f in files) or 'no caches to extend'})")
+    if appended:
+        print(f"Appended in {elapsed:.3f}s")
@@ -0,0 +1,122 @@
+"""
+Change-Point Detection
+Finds the strongest single level shift in every country x series trajectory
+of a cube at once, from cumulative sums along the year axis
+"""
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.scores import SCORES_FILE, open_scores_cube
+
+# Years needed on each side of a break
+MIN_SEGMENT = 2
+
+# Share of a trajectory's variance the split must explain. A straight-line
+# trend already gives about 0.75 to its best split, so this keeps steps, not trends.
+MIN_EXPLAINED = 0.8
+
+FIELDS = ['break', 'before', 'after', 'shift', 'explained']
+
+
+def best_split(values, axis=1, min_segment=MIN_SEGMENT):
+    """
+    Best single split of every series along `axis` (years) into two constant levels.
+
+    For each cut, the drop in squared error from fitting two means instead of
+    one is n_left * n_right / n * (mean_right - mean_left)², computed for
+    every cut from cumulative counts and sums (the normalised CUSUM
+    statistic). Missing years are skipped, and the break is always a year
+    with data. Returns float64 shaped like
+    `values` without `axis`, plus a last axis of FIELDS: the position of the
+    first year after the break, the two means, their difference and the
+    share of the series' variance explained. NaN where no cut leaves
+    `min_segment` years on each side.
+    """
+    # Years first, so each cumulative step works on whole contiguous year slices
+    values = np.moveaxis(np.asarray(values, dtype=np.float64), axis, 0)
+    present = ~np.isnan(values)
+    y = np.where(present, values, 0)
+    count, total = np.cumsum(present, axis=0)[:-1], np.cumsum(y, axis=0)[:-1]
+    n, s = present.sum(axis=0), y.sum(axis=0)
+    total_ss = (y * y).sum(axis=0) - s * s / np.maximum(n, 1)
+
+    # Cut k puts years 0..k on the left, so the break year is k + 1. Every cut
+    # through a run of missing years splits the data the same way; only the
+    # last one, just before the next year with data, names the right year.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        left, right = total / count, (s - total) / (n - count)
+        gain = count * (n - count) / n * (right - left) ** 2
+    gain = np.where((count >= min_segment) & (n - count >= min_segment) & present[1:], gain, -np.inf)
+    cut = np.argmax(gain, axis=0)[None]
+    best = np.take_along_axis(gain, cut, axis=0)[0]
+    before, after = np.take_along_axis(left, cut, axis=0)[0], np.take_along_axis(right, cut, axis=0)[0]
+
+    found = np.isfinite(best)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        explained = np.where(total_ss > 0, best / total_ss, np.nan)
+    fields = [cut[0] + 1, before, after, after - before, explained]
+    return np.stack([np.where(found, f, np.nan) for f in fields], axis=-1)
+
+
+def _open_source(source, data_path, cache_path):
+    return (open_scores_cube(SCORES_FILE, data_path, cache_path) if source == 'scores'
+            else open_cube(source, data_path, cache_path))
+
+
+def detect_breaks(source='composite', min_segment=MIN_SEGMENT, min_explained=MIN_EXPLAINED,
+                  data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """
+    Level shifts in every country x series of a cube ('composite', 'processed',
+    'raw' or 'scores'), largest first.
+
+    Series differ in units, so breaks are ranked by Size: the shift in
+    standard deviations of that series across all countries and years.
+    Only splits explaining at least `min_explained` of a trajectory's
+    variance are kept. Year is the first year at the new level.
+    """
+    cube = _open_source(source, data_path, cache_path)
+    values = cube.as_float()
+    splits = best_split(values, axis=1, min_segment=min_segment)
+    scale = np.nanstd(values, axis=(0, 1))
+
+    keep = splits[..., FIELDS.index('explained')] >= min_explained
+    c, s = np.nonzero(keep)
+    kept = splits[c, s]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        size = np.abs(kept[:, FIELDS.index('shift')]) / scale[s]
+    breaks = pd.DataFrame({
+        'Country': cube.countries[c],
+        'Series': cube.indicators[s],
+        'Year': cube.years[kept[:, FIELDS.index('break')].astype(int)],
+        'Before': kept[:, FIELDS.index('before')],
+        'After': kept[:, FIELDS.index('after')],
+        'Shift': kept[:, FIELDS.index('shift')],
+        'Explained': kept[:, FIELDS.index('explained')],
+        'Size': size,
+    })
+    return breaks.sort_values('Size', ascending=False, kind='stable').reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    found = {source: detect_breaks(source) for source in ['composite', 'processed']}
+    elapsed = time.perf_counter() - start
+    print(f"Scanned the composite and processed cubes in {elapsed:.3f}s: "
+          f"{len(found['composite']):,} and {len(found['processed']):,} breaks")
+
+    # A missing year before the new level: the break is the first year observed at it
+    gap = best_split(np.array([[1, 1, np.nan, 5, 5], [1, np.nan, np.nan, 5, 5]]), axis=1, min_segment=1)
+    assert gap[:, FIELDS.index('break')].tolist() == [3, 3], gap
+    print("Breaks across missing years land on the first year observed at the new level")
+
+    pd.set_option('display.width', 160)
+    print("\nLargest composite breaks:")
+    print(found['composite'].head(10).to_string(float_format=lambda v: f'{v:.2f}'))
+    coups = found['processed'][found['processed']['Series'] == 'Absence of Military-Determined Changes of Power']
+    print("\nAbsence of Military-Determined Changes of Power:")
+    print(coups.head(10).to_string(float_format=lambda v: f'{v:.2f}'))
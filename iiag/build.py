@@ -0,0 +1,172 @@
+"""
+Incremental Build
+Re-runs an output script only when the data it reads, its own code or an
+upstream output has changed since the last successful run
+"""
+
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from iiag.append import append_new_years
+from iiag.data import CACHE_PATH, DATA_PATH, IIAG_FILES, file_hash, file_key
+from iiag.hierarchy import HIERARCHY_FILE
+from iiag.scores import SCORES_FILE
+
+COMPOSITE_FILE = DATA_PATH / IIAG_FILES['composite']['file']
+RANKS_FILE = DATA_PATH / IIAG_FILES['ranks']['file']
+CONFIDENCE_FILE = DATA_PATH / IIAG_FILES['confidence']['file']
+
+CHARTS = [f'visualizations/{name}.png' for name in [
+    '01_governance_distribution', '02_top_bottom_countries', '03_temporal_trends',
+    '04_category_heatmap_top20', '05_governance_change_all', '06_regional_comparison',
+    '07_category_correlation', '08_top_bottom_trends', '09_radar_top5', '10_yoy_change_heatmap',
+]]
+
+DASHBOARD_PAGES = [f'dashboard/{name}.html' for name in [
+    'index', 'interactive_map', 'interactive_timeseries', 'interactive_bar_top15', 'interactive_radar',
+    'interactive_heatmap', 'interactive_scatter', 'interactive_regional', 'interactive_boxplot',
+]]
+
+# Each script renders all of its outputs in one pass, so a script is the unit
+# of rebuild. Inputs are data files (or another target's outputs); the code
+# version is the script plus every iiag module it imports.
+TARGETS = {
+    'charts': {
+        'script': 'iiag_analysis.py',
+        'inputs': [COMPOSITE_FILE, RANKS_FILE, CONFIDENCE_FILE, HIERARCHY_FILE, SCORES_FILE],
+        'outputs': CHARTS,
+    },
+    'dashboard': {
+        'script': 'create_dashboard.py',
+        'inputs': [COMPOSITE_FILE, HIERARCHY_FILE],
+        'outputs': DASHBOARD_PAGES,
+    },
+    'pdf_report': {
+        'script': 'generate_report.py',
+        'inputs': [COMPOSITE_FILE, HIERARCHY_FILE],
+        'outputs': ['IIAG_Comprehensive_Report_*.pdf'],
+    },
+    'word_report': {
+        'script': 'generate_word_report.py',
+        'inputs': [COMPOSITE_FILE, HIERARCHY_FILE],
+        'outputs': ['IIAG_Comprehensive_Report_*.docx'],
+    },
+    'deck': {
+        'script': 'create_presentation.py',
+        'inputs': [COMPOSITE_FILE, RANKS_FILE, CONFIDENCE_FILE] + CHARTS[1:7],  # the deck embeds charts 02-07
+        'outputs': ['IIAG_Presentation_2023.pptx'],
+        'after': ['charts'],
+    },
+}
+
+MANIFEST_FILE = CACHE_PATH / 'build.json'
+
+
+def iiag_modules(script, root=Path('.')):
+    """The script plus every iiag module it imports, directly or through other iiag modules."""
+    seen, pending = [], [Path(script)]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.append(path)
+        for node in ast.walk(ast.parse(path.read_text(encoding='utf-8'))):
+            names = [node.module] if isinstance(node, ast.ImportFrom) and node.module else \
+                [a.name for a in node.names] if isinstance(node, ast.Import) else []
+            for name in names:
+                if name == 'iiag' or name.startswith('iiag.'):
+                    module = root / (name.replace('.', '/') + '.py')
+                    pending.append(module if module.exists() else root / name.replace('.', '/') / '__init__.py')
+    return sorted(str(p) for p in seen)
+
+
+def digest(path, previous=None):
+    """Size/mtime key plus SHA-1, reusing the previous SHA-1 while size and mtime are unchanged."""
+    key = file_key(path)
+    if previous and {k: previous.get(k) for k in key} == key:
+        return previous
+    return {**key, 'sha1': file_hash(path)}
+
+
+def _outputs(target):
+    found = [sorted(Path('.').glob(pattern)) for pattern in TARGETS[target]['outputs']]
+    return None if not all(found) else [str(p) for paths in found for p in paths]
+
+
+def fingerprint(target, previous=None):
+    """{path: digest} for every input and code file of a target."""
+    spec = TARGETS[target]
+    previous = previous or {}
+    files = [str(p) for p in spec['inputs']] + iiag_modules(spec['script'])
+    return {f: digest(f, previous.get(f)) for f in files}
+
+
+def _same(a, b):
+    return a.keys() == b.keys() and all(a[f]['sha1'] == b[f]['sha1'] for f in a)
+
+
+def build_order(targets):
+    order = []
+
+    def visit(target):
+        for upstream in TARGETS[target].get('after', []):
+            visit(upstream)
+        if target not in order:
+            order.append(target)
+
+    for target in targets:
+        visit(target)
+    return order
+
+
+def build(targets=None, force=False, dry_run=False, manifest_file=MANIFEST_FILE):
+    """
+    Run the scripts behind `targets` (default: all) whose fingerprint moved or
+    whose outputs are missing. Returns {target: 'built' | 'stale' | 'fresh'}.
+    A data file that only gained a year has its cubes and caches extended
+    first, so the scripts start from warm caches.
+    """
+    manifest_file = Path(manifest_file)
+    manifest = json.loads(manifest_file.read_text(encoding='utf-8')) if manifest_file.exists() else {}
+    status = {}
+    if not dry_run:
+        for name, (years, _) in append_new_years().items():
+            print(f"Appended {', '.join(str(y) for y in years)} to the {name} cube")
+
+    for target in build_order(targets or list(TARGETS)):
+        recorded = manifest.get(target, {})
+        current = fingerprint(target, recorded.get('files'))
+        stale = force or _outputs(target) is None or not _same(current, recorded.get('files', {}))
+        if not stale:
+            status[target] = 'fresh'
+            continue
+        if dry_run:
+            status[target] = 'stale'
+            continue
+
+        print(f"Building {target} ({TARGETS[target]['script']})...")
+        subprocess.run([sys.executable, TARGETS[target]['script']], check=True)
+        # Digest again so inputs rewritten by upstream targets are recorded as built
+        manifest[target] = {'files': fingerprint(target, current), 'outputs': _outputs(target)}
+        manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        manifest_file.write_text(json.dumps(manifest, indent=1), encoding='utf-8')
+        status[target] = 'built'
+    return status
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild IIAG outputs whose inputs or code changed.')
+    parser.add_argument('targets', nargs='*', help=f"any of {', '.join(TARGETS)} (default: all)")
+    parser.add_argument('--force', action='store_true', help='rebuild even if up to date')
+    parser.add_argument('--dry-run', action='store_true', help='only report which targets are stale')
+    args = parser.parse_args()
+    unknown = [t for t in args.targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+
+    for target, state in build(args.targets, args.force, args.dry_run).items():
+        print(f"  {target:<12} {state}")
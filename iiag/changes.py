@@ -0,0 +1,75 @@
+"""
+Start/End Change Engine
+Pivots the composite scores once to a series x country x year array and takes
+score changes for every series and year pair as array differences
+"""
+
+import numpy as np
+import pandas as pd
+
+from iiag.hierarchy import load_tree
+
+
+def series_array(df, series=None):
+    """
+    Pivot a long Country/Year table once into a (series, country, year) float array.
+
+    `series` defaults to every column that is a series of the indicator
+    hierarchy, so id and grouping columns (Region, Peer Group, ...) are never
+    picked up. Countries keep their order of first appearance in `df`, so
+    tables built from the result line up with the scripts'
+    `composite_scores['Country'].unique()`. Returns (array, series, countries, years).
+    """
+    if series is None:
+        tree = load_tree()
+        series = [c for c in df.columns if c in tree]
+    elif isinstance(series, str):
+        series = [series]
+    series = list(series)
+
+    c_codes, countries = pd.factorize(df['Country'])
+    y_codes, years = pd.factorize(df['Year'], sort=True)
+
+    array = np.full((len(series), len(countries), len(years)), np.nan)
+    array[:, c_codes, y_codes] = df[series].to_numpy(dtype=float).T
+    return array, series, pd.Index(countries, name='Country'), pd.Index(years, name='Year')
+
+
+def change_matrix(df, start_year, end_year, series=None):
+    """Country x series DataFrame of end-year minus start-year scores (NaN if either is missing)."""
+    array, series, countries, years = series_array(df, series)
+    start, end = years.get_loc(start_year), years.get_loc(end_year)
+    return pd.DataFrame((array[:, :, end] - array[:, :, start]).T, index=countries, columns=series)
+
+
+def all_pair_changes(df, series=None):
+    """
+    Changes for every (start, end) year pair at once.
+
+    Returns a (series, country, start_year, end_year) array plus its axes;
+    `changes[s, c, i, j]` is the score in years[j] minus the score in years[i].
+    """
+    array, series, countries, years = series_array(df, series)
+    return array[:, :, None, :] - array[:, :, :, None], series, countries, years
+
+
+def change_table(df, start_year, end_year, series='OVERALL GOVERNANCE'):
+    """Country/Change table for one series, largest improvement first, countries without both years dropped."""
+    changes = change_matrix(df, start_year, end_year, [series])[series].dropna()
+    changes_df = pd.DataFrame({'Country': changes.index.to_numpy(), 'Change': changes.to_numpy()})
+    return changes_df.sort_values('Change', ascending=False)
+
+
+def top_movers(df, start_year, end_year, series=None):
+    """Best improver and worst decliner for every series, in one pass over the change matrix."""
+    changes = change_matrix(df, start_year, end_year, series)
+    valid = changes.notna().any()
+    changes = changes.loc[:, valid]
+    return pd.DataFrame({
+        'Top Improver': changes.idxmax(),
+        'Improvement': changes.max(),
+        'Top Decliner': changes.idxmin(),
+        'Decline': changes.min(),
+        'Countries Improved': (changes > 0).sum(),
+        'Countries Declined': (changes < 0).sum(),
+    })
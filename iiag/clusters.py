@@ -0,0 +1,214 @@
+"""
+Governance Peer Groups
+K-means and Ward hierarchical clustering of countries on their 16 sub-category
+scores, for every year and a sweep of cluster counts
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.hierarchy import load_tree
+from iiag.regions import ISO2, country_codes
+
+K_RANGE = range(2, 9)
+
+
+def subcategory_profiles(data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """
+    (year, country, sub-category) scores from the composite cube. A missing
+    score (RURAL ECONOMY is not scored for every country) takes that year's
+    average, so it pulls the country towards no cluster in particular.
+    Returns (profiles, cube).
+    """
+    cube = open_cube('composite', data_path, cache_path)
+    subcategories = [s for group in load_tree().subcategory_names().values() for s in group]
+    profiles = cube.as_float(subcategories).transpose(1, 0, 2).astype(np.float64)
+    year_means = np.nanmean(profiles, axis=1, keepdims=True)
+    return np.where(np.isnan(profiles), year_means, profiles), cube
+
+
+def _squared_distances(x, centroids):
+    return ((x * x).sum(axis=1)[:, None] - 2 * x @ centroids.T + (centroids * centroids).sum(axis=1)[None, :]).clip(0)
+
+
+def _plus_plus(x, k, rng):
+    """k-means++ seeding."""
+    centroids = [x[rng.integers(len(x))]]
+    for _ in range(1, k):
+        nearest = _squared_distances(x, np.array(centroids)).min(axis=1)
+        centroids.append(x[rng.choice(len(x), p=nearest / nearest.sum())])
+    return np.array(centroids)
+
+
+def kmeans(x, k, init=None, max_iter=100, n_init=4, seed=0):
+    """
+    Lloyd's k-means on the rows of `x`. `init` (k, feature) warm-starts from
+    given centroids; otherwise the best of `n_init` k-means++ seedings is kept.
+    Returns (labels, centroids, inertia).
+    """
+    rng = np.random.default_rng(seed)
+    starts = [np.asarray(init, dtype=np.float64)] if init is not None else [_plus_plus(x, k, rng) for _ in range(n_init)]
+    best = None
+    for centroids in starts:
+        labels = None
+        for _ in range(max_iter):
+            distances = _squared_distances(x, centroids)
+            new_labels = distances.argmin(axis=1)
+            if labels is not None and (new_labels == labels).all():
+                break
+            labels = new_labels
+            members = np.eye(k)[labels]
+            counts = members.sum(axis=0)
+            # An emptied cluster keeps its centroid rather than becoming NaN
+            centroids = np.where(counts[:, None] > 0, members.T @ x / np.maximum(counts, 1)[:, None], centroids)
+        else:
+            # Stopped at max_iter: labels and distances still describe the previous centroids
+            distances = _squared_distances(x, centroids)
+            labels = distances.argmin(axis=1)
+        inertia = distances[np.arange(len(x)), labels].sum()
+        if best is None or inertia < best[2]:
+            best = labels, centroids, inertia
+    return best
+
+
+def _order_by_strength(labels, centroids):
+    """Renumber clusters so 0 has the highest average profile."""
+    order = np.argsort(-centroids.mean(axis=1), kind='stable')
+    return np.argsort(order)[labels], centroids[order]
+
+
+def ward_linkage(x):
+    """
+    Ward agglomerative clustering of the rows of `x` in the scipy linkage
+    layout: row i merges clusters a and b at distance d into cluster n + i of
+    the given size. Distances are updated with the Lance-Williams formula.
+    """
+    n = len(x)
+    squared = _squared_distances(x, x)
+    np.fill_diagonal(squared, np.inf)
+    size = np.ones(n)
+    ids = np.arange(n)
+    active = np.ones(n, dtype=bool)
+    linkage = np.zeros((n - 1, 4))
+    for step in range(n - 1):
+        a, b = np.unravel_index(np.argmin(squared), squared.shape)
+        a, b = min(a, b), max(a, b)
+        linkage[step] = [min(ids[a], ids[b]), max(ids[a], ids[b]), np.sqrt(squared[a, b]), size[a] + size[b]]
+
+        total = size[a] + size[b] + size
+        merged = ((size[a] + size) * squared[a] + (size[b] + size) * squared[b] - size * squared[a, b]) / total
+        merged[~active] = np.inf
+        squared[a], squared[:, a] = merged, merged
+        squared[a, a] = np.inf
+        squared[b], squared[:, b] = np.inf, np.inf
+        active[b] = False
+        size[a] += size[b]
+        ids[a] = n + step
+    return linkage
+
+
+def cut_linkage(linkage, k):
+    """Flat labels 0..k-1 from the first n - k merges of a linkage."""
+    n = len(linkage) + 1
+    cluster = np.arange(2 * n - 1)
+    for step in range(n - k - 1, -1, -1):
+        a, b = linkage[step, :2].astype(int)
+        cluster[[a, b]] = cluster[n + step]
+    return pd.factorize(cluster[:n])[0]
+
+
+class PeerGroups:
+    """Cluster assignments shaped (k, country, year), int8, for each method over a sweep of k."""
+
+    def __init__(self, kmeans, ward, inertia, ks, iso, countries, years):
+        self.kmeans = kmeans
+        self.ward = ward
+        self.inertia = inertia
+        self.ks = list(ks)
+        self.iso = pd.Index(iso, name='Country_ISO')
+        self.countries = pd.Index(countries, name='Country')
+        self.years = pd.Index(years, name='Year')
+
+    def labels(self, k, method='kmeans'):
+        """(country, year) labels for one k; groups are numbered by average profile in the first year, strongest first."""
+        return getattr(self, method)[self.ks.index(k)]
+
+
+def cluster_profiles(profiles, ks=K_RANGE, seed=0):
+    """
+    K-means and Ward labels for every year and every k in `ks`.
+
+    K-means for a year starts from the previous year's centroids, so a
+    cluster keeps its number from year to year and only countries near a
+    boundary switch. Returns (kmeans, ward, inertia) with labels shaped
+    (k, country, year) and inertia (k, year).
+    """
+    n_years, n_countries, _ = profiles.shape
+    kmeans_labels = np.zeros((len(ks), n_countries, n_years), dtype=np.int8)
+    ward_labels = np.zeros_like(kmeans_labels)
+    inertia = np.zeros((len(ks), n_years))
+    linkages = [ward_linkage(profiles[y]) for y in range(n_years)]
+
+    for i, k in enumerate(ks):
+        centroids = None
+        for y in range(n_years):
+            labels, centroids, inertia[i, y] = kmeans(profiles[y], k, init=centroids, seed=seed)
+            if y == 0:
+                labels, centroids = _order_by_strength(labels, centroids)
+            kmeans_labels[i, :, y] = labels
+
+            labels = cut_linkage(linkages[y], k)
+            means = np.eye(k)[labels].T @ profiles[y] / np.bincount(labels, minlength=k)[:, None]
+            ward_labels[i, :, y] = _order_by_strength(labels, means)[0]
+    return kmeans_labels, ward_labels, inertia
+
+
+def load_peer_groups(ks=K_RANGE, seed=0, data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """Cached PeerGroups for the composite cube, recomputed when the Composite Scores file changes."""
+    profiles, cube = subcategory_profiles(data_path, cache_path)
+    axes = json.loads((Path(cache_path) / 'cubes' / 'composite.json').read_text(encoding='utf-8'))
+    key = json.dumps({'sha1': axes['source']['sha1'], 'ks': list(ks), 'seed': seed})
+    cache_file = Path(cache_path) / 'cubes' / 'clusters.npz'
+
+    if cache_file.exists() and not refresh:
+        with np.load(cache_file) as npz:
+            if str(npz['key']) == key:
+                return PeerGroups(npz['kmeans'], npz['ward'], npz['inertia'], ks, cube.iso, cube.countries, cube.years)
+
+    kmeans_labels, ward_labels, inertia = cluster_profiles(profiles, ks, seed)
+    np.savez(cache_file, key=np.array(key), kmeans=kmeans_labels, ward=ward_labels, inertia=inertia)
+    return PeerGroups(kmeans_labels, ward_labels, inertia, ks, cube.iso, cube.countries, cube.years)
+
+
+def assign_peer_groups(df, k=5, method='kmeans', groups=None):
+    """
+    Peer group of every row of a Country/Year table as a Categorical
+    ('Peer Group 1' = strongest profile in the first year), usable in place of
+    assign_regions(df).
+    """
+    groups = groups or load_peer_groups()
+    labels = groups.labels(k, method)
+    codes = country_codes(df)
+    rows = np.where(codes >= 0, groups.iso.get_indexer(ISO2[np.maximum(codes, 0)]), -1)
+    cols = groups.years.get_indexer(df['Year'])
+    found = (rows >= 0) & (cols >= 0)
+    codes = np.where(found, labels[rows, cols], -1)
+    return pd.Categorical.from_codes(codes, categories=[f'Peer Group {g + 1}' for g in range(k)])
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    groups = load_peer_groups(refresh=True)
+    elapsed = time.perf_counter() - start
+    print(f"Clustered {groups.kmeans.shape[1] * groups.kmeans.shape[2]} country-years for k = "
+          f"{groups.ks[0]}-{groups.ks[-1]} (k-means and Ward) in {elapsed:.2f}s")
+    latest = groups.labels(5)[:, -1]
+    for g in range(5):
+        print(f"  Peer Group {g + 1}: {', '.join(groups.countries[latest == g])}")
@@ -0,0 +1,177 @@
+"""
+Confidence Intervals Loader
+Parses the two-row-header Confidence Intervals file into a
+(country, year, series, statistic) float32 array
+"""
+
+import csv
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import country_axis
+from iiag.data import CACHE_PATH, DATA_PATH, IIAG_FILES, NA_VALUES, file_hash, file_key, load_table
+
+# The file calls the overall score "OVERALL SCORE"; use the composite file's name
+SERIES_NAMES = {'OVERALL SCORE': 'OVERALL GOVERNANCE'}
+
+STATISTICS = ['Standard Error', '80% Low', '80% High', '85% Low', '85% High',
+              '90% Low', '90% High', '95% Low', '95% High']
+
+# Largest gap allowed between a 95% band's midpoint and the published score
+# when matching rows to countries (scores are published to one decimal)
+MATCH_TOLERANCE = 0.06
+
+
+def _statistic_label(field):
+    if field.strip() == 'Standard Error':
+        return 'Standard Error'
+    level = field.split('%')[0].strip()
+    return f"{level}% {'Low' if field.rstrip().endswith('Low') else 'High'}"
+
+
+class ConfidenceIntervals:
+    """Standard errors and confidence bands indexed by country, year, series and statistic."""
+
+    def __init__(self, data, iso, countries, years, series, statistics):
+        self.data = data
+        self.iso = pd.Index(iso, name='Country_ISO')
+        self.countries = pd.Index(countries, name='Country')
+        self.years = pd.Index(years, name='Year')
+        self.series = pd.Index(series, name='Series')
+        self.statistics = pd.Index(statistics, name='Statistic')
+
+    def select(self, statistic=None, year=None, series=None):
+        """Slice by label; omitted axes are kept whole. `statistic` may be a list, kept as the last axis."""
+        key = [slice(None)] * 3
+        if year is not None:
+            key[1] = self.years.get_loc(int(year))
+        if series is not None:
+            key[2] = self.series.get_loc(series)
+        values = self.data[tuple(key)]
+        if statistic is None:
+            return values
+        # Taken on its own: a list index mixed with scalar ones would move this axis to the front
+        if isinstance(statistic, (list, tuple)):
+            return np.take(values, [self.statistics.get_loc(s) for s in statistic], axis=-1)
+        return values[..., self.statistics.get_loc(statistic)]
+
+    def band(self, level, year=None, series=None):
+        """Low/high bounds of the `level`% interval, e.g. band(90, year=2023)."""
+        return self.select([f'{level}% Low', f'{level}% High'], year, series)
+
+    def standard_errors(self):
+        return self.data[..., self.statistics.get_loc('Standard Error')]
+
+    def to_frame(self):
+        """(Country, Year) rows x (Series, Statistic) columns."""
+        rows = pd.MultiIndex.from_product([self.countries, self.years])
+        columns = pd.MultiIndex.from_product([self.series, self.statistics])
+        values = np.asarray(self.data).reshape(len(rows), len(columns))
+        return pd.DataFrame(values, index=rows, columns=columns)
+
+
+def parse_confidence_intervals(data_path=DATA_PATH):
+    """
+    Read the file as labelled: returns (values, iso, countries, years, series, statistics)
+    with values shaped (row, series, statistic) in file row order.
+    """
+    spec = IIAG_FILES['confidence']
+    with open(Path(data_path) / spec['file'], encoding=spec['encoding'], newline='') as f:
+        reader = csv.reader(f)
+        header, fields = next(reader), next(reader)
+    df = pd.read_csv(Path(data_path) / spec['file'], encoding=spec['encoding'], header=None, skiprows=2,
+                     na_values=NA_VALUES, keep_default_na=False, dtype={0: str, 1: str})
+    df = df.dropna(subset=[1])
+
+    series = list(dict.fromkeys(SERIES_NAMES.get(s, s) for s in header[3:]))
+    statistics = [_statistic_label(f) for f in fields[3:3 + len(STATISTICS)]]
+    values = df.iloc[:, 3:].to_numpy(dtype=np.float32).reshape(len(df), len(series), len(statistics))
+    return values, df[0].tolist(), df[1].tolist(), df[2].astype(int).tolist(), series, statistics
+
+
+def align_rows(values, row_iso, row_years, series, composite):
+    """
+    Match each file row to the country-year whose published scores sit at the
+    centre of its 95% bands.
+
+    The 2024 file labels its rows 2012-2021 and lists six countries' values
+    in a different order from their labels (DR Congo/Djibouti and
+    Tanzania/Togo/Tunisia/Uganda), so labels alone cannot be trusted. Rows are
+    matched in country blocks; blocks that do not match any country within
+    MATCH_TOLERANCE keep their labels. Returns (aligned array on the
+    composite's country/year axes, report dict).
+    """
+    iso = composite['Country_ISO'].drop_duplicates().tolist()
+    years = sorted(composite['Year'].unique().tolist())
+    scores = composite.set_index(['Country_ISO', 'Year'])[series].reindex(
+        pd.MultiIndex.from_product([iso, years])).to_numpy(dtype=np.float32).reshape(len(iso), len(years), len(series))
+
+    lo, hi = STATISTICS.index('95% Low'), STATISTICS.index('95% High')
+    aligned = np.full((len(iso), len(years), len(series), len(STATISTICS)), np.nan, dtype=np.float32)
+    report = {'relabelled': {}, 'year_shift': None, 'unmatched': []}
+
+    row_iso = np.asarray(row_iso)
+    row_years = np.asarray(row_years)
+    for label in dict.fromkeys(row_iso):
+        rows = np.flatnonzero(row_iso == label)
+        rows = rows[np.argsort(row_years[rows])]
+        block = values[rows]
+        midpoints = (block[..., lo] + block[..., hi]) / 2
+        n = min(len(rows), len(years))
+        gaps = np.nanmax(np.abs(scores[:, -n:] - midpoints[None, -n:]), axis=(1, 2))
+        best = int(np.nanargmin(gaps)) if np.isfinite(gaps).any() else -1
+
+        if best >= 0 and gaps[best] <= MATCH_TOLERANCE:
+            target = best
+            report['year_shift'] = int(years[-1] - row_years[rows][-1])
+            if iso[best] != label:
+                report['relabelled'][label] = iso[best]
+        else:
+            target = iso.index(label)
+            report['unmatched'].append(label)
+        aligned[target, -n:] = block[-n:]
+    return aligned, report
+
+
+def _cache_files(cache_path):
+    folder = Path(cache_path) / 'cubes'
+    return folder / 'confidence.npy', folder / 'confidence.json'
+
+
+def build_confidence_intervals(data_path=DATA_PATH, cache_path=CACHE_PATH):
+    values, row_iso, _, row_years, series, statistics = parse_confidence_intervals(data_path)
+    composite = load_table('composite', data_path, cache_path)
+    aligned, report = align_rows(values, row_iso, row_years, series, composite)
+    iso, countries = country_axis(data_path, cache_path)
+    years = sorted(composite['Year'].unique().tolist())
+
+    array_file, axes_file = _cache_files(cache_path)
+    array_file.parent.mkdir(parents=True, exist_ok=True)
+    np.save(array_file, aligned)
+    source = Path(data_path) / IIAG_FILES['confidence']['file']
+    axes = {'iso': iso, 'countries': countries, 'years': [int(y) for y in years], 'series': series,
+            'statistics': statistics, 'alignment': report,
+            'source': {**file_key(source), 'sha1': file_hash(source)}}
+    axes_file.write_text(json.dumps(axes, indent=1), encoding='utf-8')
+
+
+def load_confidence_intervals(data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """Memory-map the cached CI array, rebuilding it if the CSV changed."""
+    array_file, axes_file = _cache_files(cache_path)
+    source = Path(data_path) / IIAG_FILES['confidence']['file']
+
+    stale = refresh or not (array_file.exists() and axes_file.exists())
+    if not stale:
+        cached_key = json.loads(axes_file.read_text(encoding='utf-8'))['source']
+        key = file_key(source)
+        stale = ({k: cached_key.get(k) for k in key} != key
+                 and cached_key.get('sha1') != file_hash(source))
+    if stale:
+        build_confidence_intervals(data_path, cache_path)
+
+    axes = json.loads(axes_file.read_text(encoding='utf-8'))
+    return ConfidenceIntervals(np.load(array_file, mmap_mode='r'), axes['iso'], axes['countries'],
+                               axes['years'], axes['series'], axes['statistics'])
@@ -0,0 +1,141 @@
+"""
+Indicator Correlation Engine
+Pairwise-complete Pearson correlations between every pair of series, for each
+year and pooled across years, computed as masked matrix products
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.scores import SCORES_FILE, open_scores_cube
+
+
+def pairwise_correlation(values, min_periods=1):
+    """
+    Correlation of every pair of columns over the rows where both are present.
+
+    `values` is (..., observation, series) with NaN for missing; any leading
+    axes are batched. Pair sums come from five matrix products of the zeroed
+    data and its mask, so no pair is visited in Python. Matches
+    DataFrame.corr(min_periods=...). Returns (corr, n_obs) shaped (..., series, series).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    mask = ~np.isnan(values)
+    # Centre each column first to keep the sums of squares well conditioned
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centre = np.nansum(values, axis=-2, keepdims=True) / mask.sum(axis=-2, keepdims=True)
+    x = np.where(mask, values - np.nan_to_num(centre), 0)
+    m = mask.astype(np.float64)
+    xt, mt = np.swapaxes(x, -1, -2), np.swapaxes(m, -1, -2)
+
+    n = mt @ m
+    sum_x = xt @ m                       # sum of column i over rows where j is present
+    sum_xx = np.swapaxes(x * x, -1, -2) @ m
+    sum_xy = xt @ x
+    sum_y, sum_yy = np.swapaxes(sum_x, -1, -2), np.swapaxes(sum_xx, -1, -2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_xx - sum_x ** 2 / n
+        var_y = sum_yy - sum_y ** 2 / n
+        corr = np.clip(cov / np.sqrt(var_x * var_y), -1, 1)
+    corr[(n < max(min_periods, 2)) | (var_x <= 0) | (var_y <= 0)] = np.nan
+    return corr.astype(np.float32), n.astype(np.int32)
+
+
+class Correlations:
+    """Series x series correlation matrices per year (`by_year`) and pooled over all country-years."""
+
+    def __init__(self, by_year, n_by_year, pooled, n_pooled, years, series):
+        self.by_year = by_year
+        self.n_by_year = n_by_year
+        self.pooled = pooled
+        self.n_pooled = n_pooled
+        self.years = pd.Index(years, name='Year')
+        self.series = pd.Index(series, name='Series')
+        self._lookup = {' '.join(str(s).split()).casefold(): i for i, s in enumerate(series)}
+
+    def _index(self, series):
+        return self._lookup[' '.join(str(series).split()).casefold()]
+
+    def matrix(self, year=None, series=None):
+        """Correlation matrix as a DataFrame, pooled if `year` is None; optionally only some series."""
+        data = self.pooled if year is None else self.by_year[self.years.get_loc(int(year))]
+        if series is None:
+            return pd.DataFrame(data, index=self.series, columns=self.series)
+        idx = [self._index(s) for s in series]
+        return pd.DataFrame(data[np.ix_(idx, idx)], index=self.series[idx], columns=self.series[idx])
+
+    def pair(self, a, b, year=None):
+        data = self.pooled if year is None else self.by_year[self.years.get_loc(int(year))]
+        return float(data[self._index(a), self._index(b)])
+
+
+def _open_source(source, data_path, cache_path):
+    cube = (open_scores_cube(SCORES_FILE, data_path, cache_path) if source == 'scores'
+            else open_cube(source, data_path, cache_path))
+    axes = json.loads((Path(cache_path) / 'cubes' / f'{source}.json').read_text(encoding='utf-8'))
+    return cube, axes['source']['sha1']
+
+
+def load_correlations(source='scores', min_periods=3, data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """
+    Correlations between all series of a cube ('scores' for the full 492-series
+    set, or 'composite', 'raw', 'processed'), cached in data/cache/cubes and
+    recomputed only when the cube's source file changes.
+    """
+    cube, sha1 = _open_source(source, data_path, cache_path)
+    key = json.dumps({'sha1': sha1, 'min_periods': min_periods})
+    cache_file = Path(cache_path) / 'cubes' / f'correlation_{source}.npz'
+
+    if cache_file.exists() and not refresh:
+        with np.load(cache_file) as npz:
+            if str(npz['key']) == key:
+                return Correlations(npz['by_year'], npz['n_by_year'], npz['pooled'], npz['n_pooled'],
+                                    cube.years, cube.indicators)
+
+    values = cube.as_float()
+    by_year, n_by_year = pairwise_correlation(values.transpose(1, 0, 2), min_periods)
+    pooled, n_pooled = pairwise_correlation(values.reshape(-1, values.shape[2]), min_periods)
+    np.savez(cache_file, key=np.array(key), by_year=by_year, n_by_year=n_by_year, pooled=pooled, n_pooled=n_pooled)
+    return Correlations(by_year, n_by_year, pooled, n_pooled, cube.years, cube.indicators)
+
+
+def extend_correlations(source, previous_sha1, min_periods=3, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """
+    After years are appended to a cube (iiag.append), correlate only the new
+    years and re-pool, instead of recomputing every year. Returns the file or None.
+    """
+    cache_file = Path(cache_path) / 'cubes' / f'correlation_{source}.npz'
+    if not cache_file.exists():
+        return None
+    with np.load(cache_file) as npz:
+        if str(npz['key']) != json.dumps({'sha1': previous_sha1, 'min_periods': min_periods}):
+            return None
+        by_year, n_by_year = npz['by_year'], npz['n_by_year']
+
+    cube, sha1 = _open_source(source, data_path, cache_path)
+    values = cube.as_float()
+    new_by_year, new_n = pairwise_correlation(values[:, len(by_year):].transpose(1, 0, 2), min_periods)
+    # The pooled matrix spans every year, so it is the part that changes
+    pooled, n_pooled = pairwise_correlation(values.reshape(-1, values.shape[2]), min_periods)
+    np.savez(cache_file, key=np.array(json.dumps({'sha1': sha1, 'min_periods': min_periods})),
+             by_year=np.concatenate([by_year, new_by_year]), n_by_year=np.concatenate([n_by_year, new_n]),
+             pooled=pooled, n_pooled=n_pooled)
+    return cache_file
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    correlations = load_correlations(refresh=True)
+    elapsed = time.perf_counter() - start
+    n = len(correlations.series)
+    print(f"Correlated {n} series ({n * (n - 1) // 2:,} pairs) for {len(correlations.years)} years "
+          f"and pooled in {elapsed:.2f}s")
@@ -0,0 +1,242 @@
+"""
+IIAG Country x Year x Indicator Cubes
+Turns the wide indicator tables into dense on-disk NumPy arrays opened through np.memmap
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iiag.data import CACHE_PATH, DATA_PATH, ID_COLUMNS, IIAG_FILES, file_hash, file_key, load_table
+
+CUBE_PATH = CACHE_PATH / 'cubes'
+
+# Storage type and missing-value sentinel per table. Data types are coded 0-4
+# (0 already means "unavailable") and ranks run 1-54, so 0 marks a missing rank.
+CUBE_SPECS = {
+    'composite': {'dtype': 'float32', 'missing': np.nan},
+    'raw': {'dtype': 'float32', 'missing': np.nan},
+    'processed': {'dtype': 'float32', 'missing': np.nan},
+    'processed_type': {'dtype': 'uint8', 'missing': 0},
+    'ranks': {'dtype': 'uint16', 'missing': 0},
+}
+
+
+def _clean_label(label):
+    return ' '.join(str(label).split())
+
+
+class Cube:
+    """
+    Dense country x year x indicator array with label indexes for each axis.
+
+    `data` is usually a read-only np.memmap, so the slicing helpers return
+    views into the file rather than copies.
+    """
+
+    def __init__(self, name, data, iso, countries, years, indicators, missing=np.nan):
+        self.name = name
+        self.data = data
+        self.iso = pd.Index(iso, name='Country_ISO')
+        self.countries = pd.Index(countries, name='Country')
+        self.years = pd.Index(years, name='Year')
+        self.indicators = pd.Index(indicators, name='Indicator')
+        self.missing = missing
+        self._country_lookup = {**{c: i for i, c in enumerate(self.countries)},
+                                **{c: i for i, c in enumerate(self.iso)}}
+        self._indicator_lookup = {_clean_label(s).casefold(): i for i, s in enumerate(self.indicators)}
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def country_index(self, country):
+        """Position of a country on axis 0, by name or ISO2 code."""
+        return self._country_lookup[country]
+
+    def year_index(self, year):
+        return self.years.get_loc(int(year))
+
+    def indicator_index(self, indicator):
+        """Position of an indicator on axis 2 (whitespace and case insensitive)."""
+        return self._indicator_lookup[_clean_label(indicator).casefold()]
+
+    def country(self, country):
+        return self.data[self.country_index(country)]
+
+    def year(self, year):
+        return self.data[:, self.year_index(year)]
+
+    def indicator(self, indicator):
+        return self.data[:, :, self.indicator_index(indicator)]
+
+    def as_float(self, indicators=None):
+        """Copy of the cube (or a subset of indicators) as float32 with NaN for missing values."""
+        data = self.data if indicators is None else self.data[:, :, [self.indicator_index(s) for s in indicators]]
+        values = np.asarray(data, dtype=np.float32)
+        if not np.isnan(self.missing):
+            values[data == self.missing] = np.nan
+        return values
+
+    def to_frame(self, indicators=None):
+        """Long-to-wide DataFrame in the same Country_ISO/Country/Year layout as the CSVs."""
+        names = list(self.indicators) if indicators is None else list(indicators)
+        values = self.as_float(names).reshape(-1, len(names))
+        df = pd.DataFrame(values, columns=names)
+        df.insert(0, 'Country_ISO', np.repeat(self.iso.to_numpy(), len(self.years)))
+        df.insert(1, 'Country', np.repeat(self.countries.to_numpy(), len(self.years)))
+        df.insert(2, 'Year', np.tile(self.years.to_numpy(), len(self.countries)))
+        return df
+
+
+def country_axis(data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """The 54 countries (ISO2 code, name) in composite-file order, shared by every cube."""
+    composite = load_table('composite', data_path, cache_path)
+    pairs = composite[['Country_ISO', 'Country']].drop_duplicates()
+    return pairs['Country_ISO'].tolist(), pairs['Country'].tolist()
+
+
+def frame_to_array(df, iso, countries, years, indicators, dtype, missing):
+    """Scatter a long Country/Year table into a dense (country, year, indicator) array."""
+    name_pos = {c: i for i, c in enumerate(countries)}
+    iso_pos = {c: i for i, c in enumerate(iso)}
+    year_pos = {y: i for i, y in enumerate(years)}
+
+    if 'Country_ISO' in df.columns:
+        c_idx = df['Country_ISO'].map(iso_pos)
+    else:
+        c_idx = df['Country'].map(name_pos)
+    y_idx = df['Year'].map(year_pos)
+    keep = c_idx.notna().to_numpy() & y_idx.notna().to_numpy()
+
+    values = df[indicators].to_numpy(dtype=np.float64)[keep]
+    if not np.isnan(missing):
+        values = np.where(np.isnan(values), missing, values)
+
+    array = np.full((len(countries), len(years), len(indicators)), missing, dtype=dtype)
+    array[c_idx.to_numpy()[keep].astype(int), y_idx.to_numpy()[keep].astype(int)] = values.astype(dtype)
+    return array
+
+
+def _cube_files(name, cube_path):
+    return Path(cube_path) / f'{name}.npy', Path(cube_path) / f'{name}.json'
+
+
+def write_cube(cube, source_key, cube_path=CUBE_PATH):
+    """Store a cube as <name>.npy plus a JSON sidecar holding its axes and source key."""
+    array_file, axes_file = _cube_files(cube.name, cube_path)
+    array_file.parent.mkdir(parents=True, exist_ok=True)
+    np.save(array_file, np.ascontiguousarray(cube.data))
+    axes = {
+        'iso': cube.iso.tolist(),
+        'countries': cube.countries.tolist(),
+        'years': [int(y) for y in cube.years],
+        'indicators': cube.indicators.tolist(),
+        'dtype': str(cube.data.dtype),
+        'missing': None if np.isnan(cube.missing) else cube.missing,
+        'source': source_key,
+    }
+    axes_file.write_text(json.dumps(axes, indent=1), encoding='utf-8')
+
+
+def read_cube(name, cube_path=CUBE_PATH):
+    """Open a stored cube as a read-only memmap. Returns (cube, source_key)."""
+    array_file, axes_file = _cube_files(name, cube_path)
+    axes = json.loads(axes_file.read_text(encoding='utf-8'))
+    data = np.load(array_file, mmap_mode='r')
+    missing = np.nan if axes['missing'] is None else axes['missing']
+    cube = Cube(name, data, axes['iso'], axes['countries'], axes['years'], axes['indicators'], missing)
+    return cube, axes['source']
+
+
+def build_cube(name, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """Build one table's cube from the cached CSV parse and write it to disk."""
+    spec = CUBE_SPECS[name]
+    df = load_table(name, data_path, cache_path)
+    iso, countries = country_axis(data_path, cache_path)
+    years = sorted(load_table('composite', data_path, cache_path)['Year'].unique().tolist())
+    columns = [c for c in df.columns if c not in ID_COLUMNS]
+
+    array = frame_to_array(df, iso, countries, years, columns, spec['dtype'], spec['missing'])
+    cube = Cube(name, array, iso, countries, years, [_clean_label(c) for c in columns], spec['missing'])
+
+    source = Path(data_path) / IIAG_FILES[name]['file']
+    key = {**file_key(source), 'sha1': file_hash(source)}
+    write_cube(cube, key, Path(cache_path) / 'cubes')
+    return cube
+
+
+def open_cube(name, data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """
+    Memory-map one table's cube, rebuilding it first if the source CSV changed.
+
+    Slicing the result (`cube.indicator(...)`, `cube.country(...)`) reads only
+    the requested part of the file.
+    """
+    cube_path = Path(cache_path) / 'cubes'
+    source = Path(data_path) / IIAG_FILES[name]['file']
+    array_file, axes_file = _cube_files(name, cube_path)
+
+    if not refresh and array_file.exists() and axes_file.exists():
+        cube, cached_key = read_cube(name, cube_path)
+        key = file_key(source)
+        if {k: cached_key.get(k) for k in key} == key:
+            return cube
+        key['sha1'] = file_hash(source)
+        if cached_key.get('sha1') == key['sha1']:
+            axes = json.loads(axes_file.read_text(encoding='utf-8'))
+            axes['source'] = key
+            axes_file.write_text(json.dumps(axes, indent=1), encoding='utf-8')
+            return cube
+
+    build_cube(name, data_path, cache_path)
+    return read_cube(name, cube_path)[0]
+
+
+def extend_cube(name, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """
+    Add the years a source CSV has gained to its stored cube, without a rebuild.
+
+    Applies only when the file changed by gaining later years: every year
+    already in the cube must read back unchanged. Returns (the previous
+    source SHA-1, the new years), or None when the cube is missing, current
+    or the file changed in any other way (open_cube then rebuilds it).
+    """
+    cube_path = Path(cache_path) / 'cubes'
+    source = Path(data_path) / IIAG_FILES[name]['file']
+    array_file, axes_file = _cube_files(name, cube_path)
+    if not (array_file.exists() and axes_file.exists()):
+        return None
+    cube, cached_key = read_cube(name, cube_path)
+    key = {**file_key(source), 'sha1': file_hash(source)}
+    if cached_key.get('sha1') == key['sha1']:
+        return None
+
+    spec = CUBE_SPECS[name]
+    df = load_table(name, data_path, cache_path)
+    iso, countries = country_axis(data_path, cache_path)
+    years = sorted(load_table('composite', data_path, cache_path)['Year'].unique().tolist())
+    columns = [c for c in df.columns if c not in ID_COLUMNS]
+    n_old = len(cube.years)
+    if (len(years) == n_old or years[:n_old] != cube.years.tolist() or iso != cube.iso.tolist()
+            or [_clean_label(c) for c in columns] != cube.indicators.tolist()):
+        return None
+
+    array = frame_to_array(df, iso, countries, years, columns, spec['dtype'], spec['missing'])
+    if not np.array_equal(array[:, :n_old], cube.data, equal_nan=bool(np.isnan(spec['missing']))):
+        return None
+    del cube
+    write_cube(Cube(name, array, iso, countries, years, [_clean_label(c) for c in columns], spec['missing']),
+               key, cube_path)
+    return cached_key.get('sha1'), years[n_old:]
+
+
+def build_all_cubes(data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    return {name: open_cube(name, data_path, cache_path, refresh) for name in CUBE_SPECS}
+
+
+if __name__ == '__main__':
+    for name, cube in build_all_cubes(refresh=True).items():
+        print(f"  {name:<16} {str(cube.shape):<16} {cube.data.dtype}")
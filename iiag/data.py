@@ -0,0 +1,223 @@
+"""
+Cached IIAG Data Loader
+Parses each IIAG CSV once and keeps a typed binary copy (.npz) for later runs
+"""
+
+import csv
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DATA_PATH = Path('data/csv-files')
+CACHE_PATH = Path('data/cache')
+
+# Every table shipped in data/csv-files, with its text encoding
+IIAG_FILES = {
+    'composite': {'file': '2024 IIAG_Composite Scores.csv', 'encoding': 'utf-8-sig'},
+    'ranks': {'file': '2024 IIAG_Ranks.csv', 'encoding': 'utf-8-sig'},
+    'raw': {'file': '2024 IIAG_Raw Data.csv', 'encoding': 'cp1252'},
+    'processed': {'file': '2024 IIAG_Processed Data.csv', 'encoding': 'utf-8-sig'},
+    'processed_type': {'file': '2024 IIAG_Processed Data Type.csv', 'encoding': 'utf-8-sig'},
+    'confidence': {'file': '2024 IIAG_Confidence Intervals.csv', 'encoding': 'utf-8-sig', 'header': [0, 1]},
+}
+
+ID_COLUMNS = ['Country_ISO', 'Country', 'Year']
+
+# Header spellings used by the different files for the identifier columns
+# (the Raw Data file heads its year column "Name")
+COLUMN_RENAMES = {'COUNTRY': 'Country', 'YEAR': 'Year', 'Name': 'Year'}
+
+# "." marks a missing value in every file; "NA" is Namibia's ISO code, not a gap
+NA_VALUES = ['.', '']
+
+
+def file_key(path):
+    """Size and modification time of a source file, used as the cheap cache key."""
+    stat = Path(path).stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_hash(path):
+    """SHA-1 of a source file's contents, checked when size or mtime has moved."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _flatten_two_row_header(columns):
+    flat = []
+    for series, field in columns:
+        if series in ID_COLUMNS:
+            flat.append(series)
+        else:
+            field = ' '.join(field.replace(';', '; ').split())
+            flat.append(f'{series} | {field}')
+    return flat
+
+
+def parse_csv(name, data_path=DATA_PATH):
+    """Parse one IIAG CSV straight to typed columns ('.' handled by the parser)."""
+    spec = IIAG_FILES[name]
+    df = pd.read_csv(Path(data_path) / spec['file'], encoding=spec['encoding'],
+                     header=spec.get('header', 0), na_values=NA_VALUES, keep_default_na=False,
+                     dtype={'Country_ISO': str, 'Country': str, 'COUNTRY': str})
+
+    if 'header' in spec:
+        df.columns = _flatten_two_row_header(df.columns)
+    df = df.rename(columns=COLUMN_RENAMES)
+    df = df.dropna(subset=['Country'])
+
+    df['Year'] = df['Year'].astype(int)
+    value_columns = [c for c in df.columns if c not in ID_COLUMNS]
+    df[value_columns] = df[value_columns].astype(float)
+    return df.reset_index(drop=True)
+
+
+def _write_cache(df, cache_file, key):
+    id_columns = [c for c in ID_COLUMNS if c in df.columns]
+    value_columns = [c for c in df.columns if c not in ID_COLUMNS]
+    arrays = {f'id_{c}': df[c].to_numpy(dtype=str if c != 'Year' else np.int64) for c in id_columns}
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_suffix('.tmp.npz')
+    np.savez(tmp_file,
+             key=np.array(json.dumps(key)),
+             id_columns=np.array(id_columns),
+             value_columns=np.array(value_columns),
+             values=df[value_columns].to_numpy(dtype=np.float64),
+             **arrays)
+    tmp_file.replace(cache_file)
+
+
+def _read_cache(cache_file):
+    with np.load(cache_file, allow_pickle=False) as npz:
+        key = json.loads(str(npz['key']))
+        df = pd.DataFrame(npz['values'], columns=npz['value_columns'].tolist())
+        for i, col in enumerate(npz['id_columns'].tolist()):
+            df.insert(i, col, npz[f'id_{col}'])
+    return df, key
+
+
+def load_table(name, data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """
+    Return one IIAG table as a DataFrame, parsing the CSV only when its cache is stale.
+
+    The cache is reused while the source file's size and mtime are unchanged; if
+    either moved, the file is hashed and the cache is still reused when the
+    content is identical (e.g. after a fresh checkout).
+    """
+    source = Path(data_path) / IIAG_FILES[name]['file']
+    cache_file = Path(cache_path) / f'{name}.npz'
+    key = file_key(source)
+
+    if cache_file.exists() and not refresh:
+        df, cached_key = _read_cache(cache_file)
+        if {k: cached_key.get(k) for k in key} == key:
+            return df
+        key['sha1'] = file_hash(source)
+        if cached_key.get('sha1') == key['sha1']:
+            _write_cache(df, cache_file, key)
+            return df
+
+    df = parse_csv(name, data_path)
+    key['sha1'] = key.get('sha1') or file_hash(source)
+    _write_cache(df, cache_file, key)
+    return df
+
+
+def load_composite_scores(data_path=DATA_PATH, cache_path=CACHE_PATH):
+    return load_table('composite', data_path, cache_path)
+
+
+def read_header(name, data_path=DATA_PATH):
+    """First header row of an IIAG CSV, without parsing any data."""
+    spec = IIAG_FILES[name]
+    with open(Path(data_path) / spec['file'], encoding=spec['encoding'], newline='') as f:
+        return next(csv.reader(f))
+
+
+def series_positions(name, series=None, node=None, data_path=DATA_PATH, hierarchy=None):
+    """
+    Column positions (in file order) of the requested series.
+
+    `series` is a list of names matched on whitespace/case-insensitive spelling;
+    `node` is a hierarchy SeriesID or name whose whole subtree is selected. The
+    Ranks file carries every hierarchy series and the Raw/Processed files every
+    variable, in workbook order, so a node is mapped by position there, which
+    also keeps repeated names (e.g. "Absence of Corruption in the Judiciary")
+    apart. `hierarchy` is an iiag.hierarchy.IndicatorTree (loaded if omitted).
+    """
+    from iiag.hierarchy import clean_name, load_tree
+
+    header = read_header(name, data_path)
+    n_ids = sum(COLUMN_RENAMES.get(h.strip(), h.strip()) in ID_COLUMNS for h in header)
+    by_name = {}
+    for pos, label in enumerate(header[n_ids:], start=n_ids):
+        by_name.setdefault(clean_name(label), []).append(pos)
+
+    positions = []
+    for label in [series] if isinstance(series, str) else (series or []):
+        if clean_name(label) not in by_name:
+            raise KeyError(f'{label!r} is not a column of {IIAG_FILES[name]["file"]}')
+        positions.extend(by_name[clean_name(label)])
+
+    if node is not None:
+        tree = load_tree() if hierarchy is None else hierarchy
+        n_series = len(header) - n_ids
+        selected = tree.subtree(node)
+        if n_series == len(tree):
+            positions.extend(range(n_ids + selected.start, n_ids + selected.stop))
+        elif n_series == (~tree.calculated).sum():
+            variables = tree.variables(node)
+            positions.extend(range(n_ids + variables.start, n_ids + variables.stop))
+        else:
+            for label in tree.names[selected]:
+                positions.extend(by_name.get(clean_name(label), []))
+
+    return list(range(n_ids)), sorted(set(int(p) for p in positions))
+
+
+def iter_series(name, series=None, node=None, chunksize=100, data_path=DATA_PATH, hierarchy=None):
+    """
+    Stream only the requested columns of a wide IIAG table, `chunksize` rows at a time.
+
+    Each chunk has the usual Country_ISO/Country/Year columns followed by the
+    selected series as float32, so memory and parse time scale with the
+    number of series asked for rather than the width of the file.
+    """
+    if 'header' in IIAG_FILES[name]:
+        raise ValueError(f'{name} has a two-row header; use load_table instead')
+    spec = IIAG_FILES[name]
+    header = read_header(name, data_path)
+    id_pos, value_pos = series_positions(name, series, node, data_path, hierarchy)
+    labels = {p: COLUMN_RENAMES.get(header[p].strip(), header[p].strip()) for p in id_pos}
+    labels.update({p: ' '.join(header[p].split()) for p in value_pos})
+
+    dtypes = {p: np.float32 for p in value_pos}
+    dtypes.update({p: str for p in id_pos if labels[p] != 'Year'})
+    reader = pd.read_csv(Path(data_path) / spec['file'], encoding=spec['encoding'], header=None,
+                         skiprows=1, usecols=id_pos + value_pos, dtype=dtypes,
+                         na_values=NA_VALUES, keep_default_na=False, chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk[id_pos + value_pos].rename(columns=labels)
+        yield chunk.dropna(subset=['Country'])
+
+
+def read_series(name, series=None, node=None, data_path=DATA_PATH, hierarchy=None):
+    """All rows of the requested columns, streamed and concatenated."""
+    chunks = iter_series(name, series, node, data_path=data_path, hierarchy=hierarchy)
+    return pd.concat(list(chunks), ignore_index=True)
+
+
+def build_cache(data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """Parse (or validate) every IIAG CSV so later runs start from the cache."""
+    return {name: load_table(name, data_path, cache_path, refresh) for name in IIAG_FILES}
+
+
+if __name__ == '__main__':
+    for name, df in build_cache().items():
+        print(f"  {name:<16} {df.shape[0]:>5} rows x {df.shape[1]:>4} columns")
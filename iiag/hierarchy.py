@@ -0,0 +1,192 @@
+"""
+IIAG Indicator Hierarchy
+Reads how series roll up (overall -> category -> sub-category -> indicator -> sub-indicators)
+from the Naming Conventions workbook and caches the tree as flat arrays
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from iiag.data import CACHE_PATH, file_hash, file_key
+
+HIERARCHY_FILE = Path('data/excel-files/2024 IIAG_Naming Conventions.xlsx')
+
+HIERARCHY_COLUMNS = ['SeriesID', 'ParentID', 'Name', 'Level', 'Depth', 'Calculated']
+
+
+def clean_name(name):
+    """Series names differ between files only in stray whitespace and case."""
+    return ' '.join(str(name).split()).casefold()
+
+
+def load_hierarchy(path=HIERARCHY_FILE):
+    """
+    One row per series in workbook order, which is depth-first: every series is
+    followed directly by all of its descendants.
+
+    `Calculated` is 1 for series the IIAG computes from its children and 0 for
+    the variables that appear as columns of the Raw/Processed Data files.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(min_row=2, values_only=True)
+        records = [list(row[:6]) for row in rows if row[0]]
+    finally:
+        wb.close()
+    df = pd.DataFrame(records, columns=HIERARCHY_COLUMNS)
+    df['ParentID'] = df['ParentID'].fillna('')
+    df['Name'] = df['Name'].map(lambda s: ' '.join(str(s).split()))
+    df[['Depth', 'Calculated']] = df[['Depth', 'Calculated']].astype(int)
+    return df
+
+
+class IndicatorTree:
+    """
+    The hierarchy as flat arrays over workbook positions.
+
+    Because rows are depth-first, a node's descendants are the positions
+    (i, stop[i]) and the variables under it are the Raw/Processed Data columns
+    variable_start[i]:variable_stop[i]. Children are stored CSR-style:
+    child_index[child_ptr[i]:child_ptr[i + 1]].
+    """
+
+    ARRAYS = ['ids', 'names', 'levels', 'parent', 'depth', 'calculated', 'stop',
+              'child_ptr', 'child_index', 'variable_start', 'variable_stop']
+
+    def __init__(self, ids, names, levels, parent, depth, calculated, stop,
+                 child_ptr, child_index, variable_start, variable_stop):
+        self.ids = ids
+        self.names = names
+        self.levels = levels
+        self.parent = parent
+        self.depth = depth
+        self.calculated = calculated
+        self.stop = stop
+        self.child_ptr = child_ptr
+        self.child_index = child_index
+        self.variable_start = variable_start
+        self.variable_stop = variable_stop
+        # SeriesIDs are unique; a repeated name resolves to its first occurrence
+        self._lookup = {}
+        for i, name in enumerate(names.tolist()):
+            self._lookup.setdefault(clean_name(name), i)
+        self._lookup.update({s: i for i, s in enumerate(ids.tolist())})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, node):
+        """Whether `node` is a SeriesID or (case-insensitive) name in the hierarchy."""
+        return node in self._lookup or clean_name(node) in self._lookup
+
+    def position(self, node):
+        """Workbook position of a series given its SeriesID or (case-insensitive) name."""
+        if isinstance(node, (int, np.integer)):
+            return int(node)
+        try:
+            return self._lookup[node] if node in self._lookup else self._lookup[clean_name(node)]
+        except KeyError:
+            raise KeyError(f'Unknown IIAG series: {node!r}') from None
+
+    def parent_of(self, node):
+        """Position of the parent series (-1 for the overall score)."""
+        return int(self.parent[self.position(node)])
+
+    def children(self, node):
+        i = self.position(node)
+        return self.child_index[self.child_ptr[i]:self.child_ptr[i + 1]]
+
+    def descendants(self, node):
+        """Positions of every series below `node`, as a slice."""
+        i = self.position(node)
+        return slice(i + 1, int(self.stop[i]))
+
+    def subtree(self, node):
+        """The series itself and all of its descendants, as a slice."""
+        i = self.position(node)
+        return slice(i, int(self.stop[i]))
+
+    def variables(self, node):
+        """Raw/Processed Data column positions (after the id columns) of the variables under `node`."""
+        i = self.position(node)
+        return slice(int(self.variable_start[i]), int(self.variable_stop[i]))
+
+    def names_of(self, positions):
+        return self.names[positions].tolist()
+
+    def category_names(self):
+        return self.names_of(self.children(0))
+
+    def subcategory_names(self):
+        """{category: [sub-categories]} in workbook order."""
+        return {str(self.names[c]): self.names_of(self.children(c)) for c in self.children(0)}
+
+    def to_frame(self):
+        return pd.DataFrame({
+            'SeriesID': self.ids, 'ParentID': np.where(self.parent >= 0, self.ids[self.parent], ''),
+            'Name': self.names, 'Level': self.levels, 'Depth': self.depth,
+            'Calculated': self.calculated.astype(int),
+        })
+
+
+def build_tree(hierarchy):
+    """Derive the tree arrays from a load_hierarchy() frame."""
+    n = len(hierarchy)
+    ids = hierarchy['SeriesID'].to_numpy(dtype=str)
+    depth = hierarchy['Depth'].to_numpy(dtype=np.int8)
+    calculated = hierarchy['Calculated'].to_numpy() == 1
+
+    id_pos = {s: i for i, s in enumerate(ids.tolist())}
+    parent = np.array([id_pos.get(p, -1) for p in hierarchy['ParentID']], dtype=np.int32)
+
+    # A subtree ends at the next row that is no deeper than its root
+    stop = np.full(n, n, dtype=np.int32)
+    open_nodes = []
+    for i, d in enumerate(depth.tolist()):
+        while open_nodes and depth[open_nodes[-1]] >= d:
+            stop[open_nodes.pop()] = i
+        open_nodes.append(i)
+
+    has_parent = parent >= 0
+    child_ptr = np.zeros(n + 1, dtype=np.int32)
+    child_ptr[1:] = np.cumsum(np.bincount(parent[has_parent], minlength=n))
+    child_index = np.flatnonzero(has_parent)[np.argsort(parent[has_parent], kind='stable')].astype(np.int32)
+
+    variables_before = np.concatenate([[0], np.cumsum(~calculated)]).astype(np.int32)
+    return IndicatorTree(ids, hierarchy['Name'].to_numpy(dtype=str), hierarchy['Level'].to_numpy(dtype=str),
+                         parent, depth, calculated, stop, child_ptr, child_index,
+                         variables_before[:n], variables_before[stop])
+
+
+def _write_tree(tree, cache_file, key):
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(cache_file, key=np.array(json.dumps(key)), **{a: getattr(tree, a) for a in IndicatorTree.ARRAYS})
+
+
+def load_tree(path=HIERARCHY_FILE, cache_path=CACHE_PATH, refresh=False):
+    """
+    The indicator tree, read from data/cache/hierarchy.npz unless the workbook
+    changed (same size/mtime-then-SHA-1 check as iiag.data.load_table).
+    """
+    cache_file = Path(cache_path) / 'hierarchy.npz'
+    key = file_key(path)
+
+    if cache_file.exists() and not refresh:
+        with np.load(cache_file, allow_pickle=False) as npz:
+            cached_key = json.loads(str(npz['key']))
+            tree = IndicatorTree(*(npz[a] for a in IndicatorTree.ARRAYS))
+        if {k: cached_key.get(k) for k in key} == key:
+            return tree
+        key['sha1'] = file_hash(path)
+        if cached_key.get('sha1') == key['sha1']:
+            _write_tree(tree, cache_file, key)
+            return tree
+
+    tree = build_tree(load_hierarchy(path))
+    key['sha1'] = key.get('sha1') or file_hash(path)
+    _write_tree(tree, cache_file, key)
+    return tree
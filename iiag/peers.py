@@ -0,0 +1,155 @@
+"""
+Peer-Country Index
+Nearest neighbours of every country-year by its score vector, precomputed from
+one NaN-aware distance matrix and cached with the cubes
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.scores import SCORES_FILE, open_scores_cube
+
+# Neighbours stored per row; larger k falls back to a brute-force query
+STORED_PEERS = 10
+
+# A pair is only compared if both have at least this share of the series
+MIN_SHARED = 0.5
+
+
+def nan_distances(a, b, min_shared=MIN_SHARED):
+    """
+    Euclidean distance between every row of `a` and every row of `b` over the
+    series both have, scaled up to the full series count (as in scikit-learn's
+    nan_euclidean_distances). Computed from three masked matrix products;
+    pairs sharing less than `min_shared` of the series are inf.
+    """
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    mask_a, mask_b = (~np.isnan(a)).astype(np.float64), (~np.isnan(b)).astype(np.float64)
+    a0, b0 = np.nan_to_num(a), np.nan_to_num(b)
+    shared = mask_a @ mask_b.T
+    squared = (a0 * a0) @ mask_b.T + mask_a @ (b0 * b0).T - 2 * a0 @ b0.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        distances = np.sqrt(np.clip(squared, 0, None) * a.shape[1] / shared)
+    distances[shared < min_shared * a.shape[1]] = np.inf
+    return distances
+
+
+def _nearest(distances, k):
+    """Column positions and distances of the k smallest entries in each row, closest first."""
+    k = min(k, distances.shape[1])
+    part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(distances, part, axis=1), axis=1, kind='stable')
+    positions = np.take_along_axis(part, order, axis=1)
+    return positions.astype(np.int32), np.take_along_axis(distances, positions, axis=1).astype(np.float32)
+
+
+class PeerIndex:
+    """
+    Country-year rows (country-major) with their nearest peers, both among
+    other countries in the same year and among all other countries' years.
+    """
+
+    def __init__(self, vectors, iso, countries, years, series, same_year, same_year_distance,
+                 any_year, any_year_distance):
+        self.vectors = vectors
+        self.iso = pd.Index(iso, name='Country_ISO')
+        self.countries = pd.Index(countries, name='Country')
+        self.years = pd.Index(years, name='Year')
+        self.series = pd.Index(series, name='Series')
+        self.same_year, self.same_year_distance = same_year, same_year_distance
+        self.any_year, self.any_year_distance = any_year, any_year_distance
+        self._country = {**{c: i for i, c in enumerate(self.countries)}, **{c: i for i, c in enumerate(self.iso)}}
+
+    def row(self, country, year):
+        return self._country[country] * len(self.years) + self.years.get_loc(int(year))
+
+    def peer_rows(self, country, year, k=5, same_year=True):
+        """(rows, distances) of the k nearest peers; rows index `vectors` (country * n_years + year)."""
+        row = self.row(country, year)
+        rows, distances = ((self.same_year, self.same_year_distance) if same_year
+                           else (self.any_year, self.any_year_distance))
+        if k <= rows.shape[1]:
+            rows, distances = rows[row, :k], distances[row, :k]
+        else:
+            rows, distances = self.query(self.vectors[row], k, year if same_year else None, exclude=country)
+        keep = np.isfinite(distances)
+        return rows[keep], distances[keep]
+
+    def peers(self, country, year, k=5, same_year=True):
+        """The k countries (and years) scoring most like `country` in `year`, closest first."""
+        rows, distances = self.peer_rows(country, year, k, same_year)
+        n_years = len(self.years)
+        return pd.DataFrame({'Country': self.countries[rows // n_years], 'Year': self.years[rows % n_years],
+                             'Distance': distances})
+
+    def query(self, vector, k=5, year=None, exclude=None):
+        """Brute-force nearest rows to any score vector, optionally within one year and without one country."""
+        distances = nan_distances(np.asarray(vector)[None], self.vectors)[0]
+        n_years = len(self.years)
+        if year is not None:
+            distances[np.arange(len(distances)) % n_years != self.years.get_loc(int(year))] = np.inf
+        if exclude is not None:
+            distances[np.arange(len(distances)) // n_years == self._country[exclude]] = np.inf
+        rows, distances = _nearest(distances[None], k)
+        return rows[0], distances[0]
+
+
+def build_peer_index(cube, k=STORED_PEERS):
+    """Precompute the peer lists of every country-year in a cube from one all-pairs distance matrix."""
+    n_countries, n_years, _ = cube.shape
+    vectors = cube.as_float().reshape(n_countries * n_years, -1)
+    distances = nan_distances(vectors, vectors)
+
+    country = np.repeat(np.arange(n_countries), n_years)
+    year = np.tile(np.arange(n_years), n_countries)
+    other_country = country[:, None] != country[None, :]
+    any_year = _nearest(np.where(other_country, distances, np.inf), k)
+    same_year = _nearest(np.where(other_country & (year[:, None] == year[None, :]), distances, np.inf), k)
+    return PeerIndex(vectors, cube.iso, cube.countries, cube.years, cube.indicators, *same_year, *any_year)
+
+
+def load_peer_index(source='composite', data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """
+    Peer index over the composite scores (22 series) or the full score set
+    ('scores', 492 series), cached in data/cache/cubes and rebuilt when the
+    source file changes.
+    """
+    cube = (open_scores_cube(SCORES_FILE, data_path, cache_path) if source == 'scores'
+            else open_cube(source, data_path, cache_path))
+    axes = json.loads((Path(cache_path) / 'cubes' / f'{source}.json').read_text(encoding='utf-8'))
+    key = json.dumps({'sha1': axes['source']['sha1'], 'k': STORED_PEERS, 'min_shared': MIN_SHARED})
+    cache_file = Path(cache_path) / 'cubes' / f'peers_{source}.npz'
+    fields = ['same_year', 'same_year_distance', 'any_year', 'any_year_distance']
+
+    if cache_file.exists() and not refresh:
+        with np.load(cache_file) as npz:
+            if str(npz['key']) == key:
+                vectors = cube.as_float().reshape(-1, cube.shape[2])
+                return PeerIndex(vectors, cube.iso, cube.countries, cube.years, cube.indicators,
+                                 *[npz[f] for f in fields])
+
+    index = build_peer_index(cube)
+    np.savez(cache_file, key=np.array(key), **{f: getattr(index, f) for f in fields})
+    return index
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    index = load_peer_index(refresh=True)
+    built = time.perf_counter() - start
+    year = int(index.years.max())
+    start = time.perf_counter()
+    for _ in range(10000):
+        index.peer_rows('Ghana', year)
+    lookup = (time.perf_counter() - start) / 10000
+    print(f"Indexed {len(index.vectors)} country-years x {len(index.series)} series in {built:.2f}s; "
+          f"lookup {lookup * 1e6:.0f}us")
+    print(f"\nCountries most like Ghana in {year}:")
+    print(index.peers('Ghana', year).to_string(index=False, float_format=lambda v: f'{v:.1f}'))
@@ -0,0 +1,131 @@
+"""
+iiag.online Export Ingest
+Parses the Location x year tables downloaded from the IIAG portal and appends
+them, one series per export, into the 'portal' cube
+"""
+
+import csv
+import re
+from pathlib import Path
+
+import numpy as np
+
+from iiag.cube import Cube, country_axis, read_cube, write_cube
+from iiag.data import CACHE_PATH, DATA_PATH, NA_VALUES, file_hash
+from iiag.hierarchy import load_tree
+from iiag.regions import ISO2, name_codes
+
+# Title line, e.g. "OVERALL GOVERNANCE for Algeria, and 53 others"
+OTHERS = re.compile(r',? and (\d+) others?$')
+
+
+def is_portal_export(path):
+    """True if the file has the portal layout: title + HYPERLINK line, blank line, then a Location header."""
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as f:
+        lines = [row for _, row in zip(range(3), csv.reader(f))]
+    return (len(lines) == 3 and len(lines[0]) > 1 and lines[0][1].startswith('=HYPERLINK')
+            and lines[2][:1] == ['Location'])
+
+
+def parse_title(title):
+    """Split the title line into (series name, countries named in it, number of countries covered)."""
+    series, _, where = title.rpartition(' for ')
+    others = OTHERS.search(where)
+    named = [c for c in re.split(r', | and ', OTHERS.sub('', where)) if c]
+    return series.strip(), named, len(named) + (int(others.group(1)) if others else 0)
+
+
+def parse_export(path):
+    """
+    Read one export. Returns a dict with the series name, the country names
+    and years of the table, and its values as a float32 (country, year) array.
+    The "Change '14-'23" column is derived, so it is not kept.
+    """
+    # is_portal_export only needs the ASCII header, so a file in another encoding gets this far
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.reader(f))
+    except UnicodeDecodeError as error:
+        raise ValueError(f'{path}: not UTF-8 ({error.reason} at byte {error.start}); '
+                         f're-save the export as UTF-8') from None
+    series, named, n_countries = parse_title(rows[0][0])
+    header = rows[2]
+    year_pos = [i for i, h in enumerate(header) if h.strip().isdigit()]
+    body = [row for row in rows[3:] if row and row[0].strip()]
+    if len(body) != n_countries:
+        raise ValueError(f'{path}: title covers {n_countries} countries but the table has {len(body)} rows')
+
+    values = np.array([[np.nan if row[i].strip() in NA_VALUES else float(row[i]) for i in year_pos]
+                       for row in body], dtype=np.float32)
+    return {
+        'series': series,
+        'countries': [row[0].strip() for row in body],
+        'years': [int(header[i]) for i in year_pos],
+        'values': values,
+        'sha1': file_hash(path),
+    }
+
+
+def _series_label(series, tree):
+    """The hierarchy's spelling of a portal series name (portal titles may differ in case)."""
+    try:
+        return str(tree.names[tree.position(series)])
+    except KeyError:
+        return series
+
+
+def append_exports(paths, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """
+    Add a batch of exports to the 'portal' cube in one write.
+
+    A later export of a series overwrites the countries and years it covers;
+    files already ingested (same SHA-1) are skipped. Returns the updated cube.
+    """
+    cube_path = Path(cache_path) / 'cubes'
+    if (cube_path / 'portal.npy').exists():
+        cube, source = read_cube('portal', cube_path)
+        iso, countries = cube.iso.tolist(), cube.countries.tolist()
+        years, series = cube.years.tolist(), cube.indicators.tolist()
+        data, ingested = np.array(cube.data), source['files']
+    else:
+        iso, countries = country_axis(data_path, cache_path)
+        years, series = [], []
+        data, ingested = np.empty((len(iso), 0, 0), dtype=np.float32), {}
+
+    exports = [(p, parse_export(p)) for p in paths]
+    exports = [(p, e) for p, e in exports if e['sha1'] not in ingested.values()]
+    if not exports and series:
+        return cube
+
+    tree = load_tree()
+    for _, export in exports:
+        export['series'] = _series_label(export['series'], tree)
+    new_years = sorted(set(years).union(*(e['years'] for _, e in exports)))
+    new_series = list(dict.fromkeys(series + [e['series'] for _, e in exports]))
+    merged = np.full((len(iso), len(new_years), len(new_series)), np.nan, dtype=np.float32)
+    merged[:, np.searchsorted(new_years, years), :len(series)] = data
+
+    iso_pos = {c: i for i, c in enumerate(iso)}
+    for path, export in exports:
+        codes = name_codes(export['countries'])
+        if (codes < 0).any():
+            unknown = [c for c, code in zip(export['countries'], codes) if code < 0]
+            raise ValueError(f'{path}: countries not in the registry: {unknown}')
+        rows = np.array([iso_pos[c] for c in ISO2[codes]])
+        cols = np.searchsorted(new_years, export['years'])
+        merged[rows[:, None], cols, new_series.index(export['series'])] = export['values']
+        ingested[Path(path).name] = export['sha1']
+
+    cube = Cube('portal', merged, iso, countries, new_years, new_series)
+    write_cube(cube, {'files': ingested}, cube_path)
+    return read_cube('portal', cube_path)[0]
+
+
+def load_export_directory(folder=DATA_PATH, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """Ingest every portal export in `folder` (other CSVs are ignored) in a single batch."""
+    paths = sorted(p for p in Path(folder).glob('*.csv') if is_portal_export(p))
+    return append_exports(paths, data_path, cache_path)
+
+
+def open_portal_cube(cache_path=CACHE_PATH):
+    return read_cube('portal', Path(cache_path) / 'cubes')[0]
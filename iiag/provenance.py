@@ -0,0 +1,120 @@
+"""
+Data Provenance Index
+Per-data-point status codes from "Processed Data Type.csv" with precomputed
+status counts per country, indicator and year
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import open_cube, read_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+
+STATUS_LABELS = ['Unavailable', 'Estimate', 'Raw', 'Trimmed', 'Trimmed estimate']
+UNAVAILABLE, ESTIMATE, RAW, TRIMMED, TRIMMED_ESTIMATE = range(len(STATUS_LABELS))
+ESTIMATED = [ESTIMATE, TRIMMED_ESTIMATE]
+
+
+class ProvenanceIndex:
+    """
+    The processed_type cube (country x year x indicator, uint8 status codes)
+    plus two count tables:
+
+      by_country_year    (country, year, status)
+      by_indicator_year  (indicator, year, status)
+
+    Per-country, per-indicator and per-year counts are sums over these.
+    """
+
+    def __init__(self, cube, by_country_year, by_indicator_year):
+        self.cube = cube
+        self.by_country_year = by_country_year
+        self.by_indicator_year = by_indicator_year
+
+    def status(self, country, year, indicator):
+        return STATUS_LABELS[self.cube.data[self.cube.country_index(country), self.cube.year_index(year),
+                                            self.cube.indicator_index(indicator)]]
+
+    def country_counts(self):
+        return pd.DataFrame(self.by_country_year.sum(axis=1), index=self.cube.countries, columns=STATUS_LABELS)
+
+    def indicator_counts(self):
+        return pd.DataFrame(self.by_indicator_year.sum(axis=1), index=self.cube.indicators, columns=STATUS_LABELS)
+
+    def year_counts(self):
+        return pd.DataFrame(self.by_country_year.sum(axis=0), index=self.cube.years, columns=STATUS_LABELS)
+
+    def estimated_share(self, country=None, year=None):
+        """
+        Share of available data points (status 1-4) that are estimates (1 or 4),
+        e.g. estimated_share('Chad', 2023). Omit both to get a country x year table.
+        """
+        counts = self.by_country_year
+        if country is not None:
+            counts = counts[self.cube.country_index(country)]
+        if year is not None:
+            counts = counts[..., self.cube.year_index(year), :]
+        share = _estimated_share(counts)
+        if country is None and year is None:
+            return pd.DataFrame(share, index=self.cube.countries, columns=self.cube.years)
+        return share
+
+    def indicators_over(self, threshold=0.3, year=None):
+        """Indicators whose share of estimated data points exceeds `threshold`, largest first."""
+        counts = self.by_indicator_year.sum(axis=1) if year is None else \
+            self.by_indicator_year[:, self.cube.year_index(year)]
+        share = pd.Series(_estimated_share(counts), index=self.cube.indicators, name='Estimated share')
+        return share[share > threshold].sort_values(ascending=False)
+
+
+def _estimated_share(counts):
+    available = counts[..., UNAVAILABLE + 1:].sum(axis=-1)
+    estimated = counts[..., ESTIMATED].sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(available > 0, estimated / available, np.nan)
+
+
+def status_counts(codes, axis):
+    """Count every status along `axis` of a uint8 code array (status becomes the last axis)."""
+    one_hot = codes[..., None] == np.arange(len(STATUS_LABELS), dtype=np.uint8)
+    return one_hot.sum(axis=axis, dtype=np.uint16)
+
+
+def load_provenance(data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """Provenance index aligned with the processed-data cube, recounted only when the source changes."""
+    open_cube('processed_type', data_path, cache_path, refresh)
+    cube, source = read_cube('processed_type', Path(cache_path) / 'cubes')
+    cache_file = Path(cache_path) / 'cubes' / 'provenance.npz'
+
+    counts = None
+    if cache_file.exists() and not refresh:
+        with np.load(cache_file) as npz:
+            if str(npz['sha1']) == source['sha1']:
+                counts = npz['by_country_year'], npz['by_indicator_year']
+    if counts is None:
+        codes = np.asarray(cube.data)
+        counts = status_counts(codes, axis=2), status_counts(codes.transpose(2, 1, 0), axis=2)
+        np.savez(cache_file, sha1=np.array(source['sha1']), by_country_year=counts[0], by_indicator_year=counts[1])
+
+    return ProvenanceIndex(cube, counts[0], counts[1])
+
+
+def extend_provenance(previous_sha1, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """Count only the years appended to the data-type cube (iiag.append); returns the file or None."""
+    cache_file = Path(cache_path) / 'cubes' / 'provenance.npz'
+    if not cache_file.exists():
+        return None
+    with np.load(cache_file) as npz:
+        if str(npz['sha1']) != previous_sha1:
+            return None
+        by_country_year, by_indicator_year = npz['by_country_year'], npz['by_indicator_year']
+
+    cube, source = read_cube('processed_type', Path(cache_path) / 'cubes')
+    codes = np.asarray(cube.data[:, by_country_year.shape[1]:])
+    np.savez(cache_file, sha1=np.array(source['sha1']),
+             by_country_year=np.concatenate([by_country_year, status_counts(codes, axis=2)], axis=1),
+             by_indicator_year=np.concatenate([by_indicator_year, status_counts(codes.transpose(2, 1, 0), axis=2)],
+                                              axis=1))
+    return cache_file
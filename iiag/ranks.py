@@ -0,0 +1,79 @@
+"""
+Rank Engine
+Ranks every country in every year and series of a score cube in one call, with
+the Ranks file's tie rule, and checks the result against the published ranks
+"""
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import Cube, open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.scores import SCORES_FILE, open_scores_cube
+
+
+def rank_scores(scores, axis=0, decimals=1):
+    """
+    Rank along `axis` (countries), highest score first.
+
+    As in the Ranks file, scores are compared at their published precision
+    (`decimals`), equal scores share the best rank (1, 2, 2, 4) and missing
+    scores get rank 0. Returns uint16 ranks with the shape of `scores`.
+    """
+    values = np.moveaxis(np.asarray(scores, dtype=np.float32), axis, -1)
+    keys = -np.round(values, decimals)
+    order = np.argsort(keys, axis=-1, kind='stable')
+    ordered = np.take_along_axis(keys, order, axis=-1)
+
+    first = np.ones(ordered.shape, dtype=bool)
+    first[..., 1:] = ordered[..., 1:] != ordered[..., :-1]
+    position = np.arange(values.shape[-1])
+    ranks = np.empty(order.shape, dtype=np.uint16)
+    np.put_along_axis(ranks, order, np.maximum.accumulate(np.where(first, position, 0), axis=-1) + 1, axis=-1)
+    ranks[np.isnan(values)] = 0
+    return np.moveaxis(ranks, -1, axis)
+
+
+def rank_cube(cube, decimals=1):
+    """A 'ranks' Cube for any country x year x series score cube (published, recomputed or reweighted)."""
+    return Cube('ranks', rank_scores(cube.as_float(), 0, decimals), cube.iso, cube.countries,
+                cube.years, cube.indicators, missing=0)
+
+
+def rank_mismatches(data_path=DATA_PATH, cache_path=CACHE_PATH, scores_file=SCORES_FILE):
+    """
+    Re-rank the full score set and compare it with 2024 IIAG_Ranks.csv.
+
+    Returns one row per differing country/year/series with the published and
+    recomputed rank (0 = missing); an empty frame means the files agree.
+    """
+    scores = open_scores_cube(scores_file, data_path, cache_path)
+    published = open_cube('ranks', data_path, cache_path)
+    columns = [scores.indicator_index(s) for s in published.indicators]
+    recomputed = rank_scores(scores.data[:, :, columns])
+
+    c, y, s = np.nonzero(recomputed != np.asarray(published.data))
+    return pd.DataFrame({
+        'Country_ISO': published.iso[c],
+        'Country': published.countries[c],
+        'Year': published.years[y],
+        'Series': published.indicators[s],
+        'Published': np.asarray(published.data)[c, y, s],
+        'Recomputed': recomputed[c, y, s],
+    })
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    mismatches = rank_mismatches()
+    elapsed = time.perf_counter() - start
+    ranks = open_cube('ranks')
+    print(f"Re-ranked {ranks.shape[2]} series x {ranks.shape[1]} years in {elapsed:.3f}s")
+    if mismatches.empty:
+        print("  all ranks match 2024 IIAG_Ranks.csv")
+    else:
+        print(f"  {len(mismatches)} ranks differ from 2024 IIAG_Ranks.csv "
+              f"({mismatches['Series'].nunique()} series):")
+        print(mismatches.head(20).to_string(index=False))
@@ -0,0 +1,178 @@
+"""
+Composite Score Engine
+Normalises the processed variables to 0-100 and averages them up the
+indicator hierarchy to rebuild every IIAG series, including OVERALL GOVERNANCE
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from iiag.cube import Cube, open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.hierarchy import load_tree
+from iiag.provenance import RAW, TRIMMED, TRIMMED_ESTIMATE, UNAVAILABLE
+from iiag.scores import SCORES_FILE, open_scores_cube
+
+
+def aggregation_levels(tree):
+    """
+    Bottom-up list of (parents, membership) pairs, one per depth: `parents` are
+    the calculated series at that depth and membership[k, j] is 1 when series j
+    is a child of parents[k].
+    """
+    levels = []
+    for depth in range(int(tree.depth.max()) - 1, -1, -1):
+        parents = np.flatnonzero((tree.depth == depth) & tree.calculated)
+        membership = np.zeros((len(parents), len(tree)), dtype=np.float32)
+        for k, parent in enumerate(parents):
+            membership[k, tree.children(parent)] = 1
+        levels.append((parents, membership))
+    return levels
+
+
+def aggregate(variable_scores, tree, levels=None):
+    """
+    Scores for every series from the variable scores.
+
+    `variable_scores` has the variables (hierarchy order) on its last axis and
+    any leading shape, e.g. (country, year, variable) or (scenario, country,
+    year, variable). Each calculated series is the mean of its available
+    children, computed one depth at a time as a masked matrix product.
+    Returns the same leading shape with all series on the last axis.
+    """
+    levels = aggregation_levels(tree) if levels is None else levels
+    variable_scores = np.asarray(variable_scores, dtype=np.float32)
+    lead = variable_scores.shape[:-1]
+
+    scores = np.full((int(np.prod(lead)), len(tree)), np.nan, dtype=np.float32)
+    scores[:, ~tree.calculated] = variable_scores.reshape(-1, variable_scores.shape[-1])
+    for parents, membership in levels:
+        available = ~np.isnan(scores)
+        total = np.where(available, scores, 0) @ membership.T
+        count = available.astype(np.float32) @ membership.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores[:, parents] = total / count
+    return scores.reshape(lead + (len(tree),))
+
+
+def normalise(values, zero_at, hundred_at, types=None):
+    """
+    Min-max scale each variable to 0-100, where `zero_at`/`hundred_at` are the
+    values scoring 0 and 100 (zero_at > hundred_at for "higher is worse").
+    Outliers the IIAG trimmed (type codes 3/4) score at the bound they exceed.
+    """
+    scaled = 100 * (np.asarray(values, dtype=np.float32) - zero_at) / (hundred_at - zero_at)
+    if types is not None:
+        trimmed = ((types == TRIMMED) | (types == TRIMMED_ESTIMATE)) & ~np.isnan(scaled)
+        scaled = np.where(trimmed, np.where(scaled >= 50, 100, 0), scaled)
+    return np.clip(scaled, 0, 100)
+
+
+def _line_fit(x, y, use):
+    """Per-variable least-squares slope and intercept over the cells in `use` (NaN if under-determined)."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = use.sum(axis=(0, 1))
+        x_mean = np.where(use, x, 0).sum(axis=(0, 1)) / n
+        y_mean = np.where(use, y, 0).sum(axis=(0, 1)) / n
+        dx = np.where(use, x - x_mean, 0)
+        slope = (dx * np.where(use, y - y_mean, 0)).sum(axis=(0, 1)) / (dx ** 2).sum(axis=(0, 1))
+    return slope, y_mean - slope * x_mean
+
+
+def fit_bounds(processed, variable_scores, types):
+    """
+    Recover each variable's normalisation bounds from published scores.
+
+    The IIAG publishes the variable scores but not the min/max (or trimmed
+    cut-offs) it scaled them with, so they are read off the straight line
+    through the (processed value, published score) pairs of untreated raw
+    data points, for all variables at once by closed-form least squares.
+    Points scoring exactly 0 or 100 may have been clipped and are only used
+    for variables that have nothing in between (e.g. yes/no variables).
+    Returns (zero_at, hundred_at).
+    """
+    x = np.asarray(processed, dtype=np.float64)
+    y = np.asarray(variable_scores, dtype=np.float64)
+    raw = ~np.isnan(x) & ~np.isnan(y) & (np.asarray(types) == RAW)
+    slope, intercept = _line_fit(x, y, raw & (y > 0) & (y < 100))
+    all_slope, all_intercept = _line_fit(x, y, raw)
+    fallback = ~np.isfinite(slope) | (slope == 0)
+    slope = np.where(fallback, all_slope, slope)
+    intercept = np.where(fallback, all_intercept, intercept)
+    return -intercept / slope, (100 - intercept) / slope
+
+
+def _bounds_file(cache_path):
+    return Path(cache_path) / 'cubes' / 'bounds.npz'
+
+
+def load_bounds(data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """Cached (zero_at, hundred_at) per variable, refitted when the processed or scores cube changes."""
+    processed = open_cube('processed', data_path, cache_path)
+    types = open_cube('processed_type', data_path, cache_path)
+    scores = open_scores_cube(SCORES_FILE, data_path, cache_path)
+    key = json.dumps([json.loads((Path(cache_path) / 'cubes' / f'{name}.json').read_text(encoding='utf-8'))
+                      ['source']['sha1'] for name in ['processed', 'processed_type', 'scores']])
+
+    bounds_file = _bounds_file(cache_path)
+    if bounds_file.exists() and not refresh:
+        with np.load(bounds_file) as npz:
+            if str(npz['key']) == key:
+                return npz['zero_at'], npz['hundred_at']
+
+    tree = load_tree()
+    zero_at, hundred_at = fit_bounds(processed.data, scores.data[:, :, ~tree.calculated], types.data)
+    np.savez(bounds_file, key=np.array(key), zero_at=zero_at, hundred_at=hundred_at)
+    return zero_at, hundred_at
+
+
+def variable_scores(data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """
+    0-100 scores of the 322 variables, shaped (country, year, variable).
+
+    Data points with a processed value are normalised from it. The rest keep
+    their published variable score: the shipped Processed Data file stops
+    partway through the country list and leaves some estimated points blank.
+    """
+    tree = load_tree()
+    processed = open_cube('processed', data_path, cache_path)
+    types = open_cube('processed_type', data_path, cache_path)
+    published = open_scores_cube(SCORES_FILE, data_path, cache_path).data[:, :, ~tree.calculated]
+    zero_at, hundred_at = load_bounds(data_path, cache_path)
+
+    scores = normalise(processed.data, zero_at, hundred_at, np.asarray(types.data))
+    scores = np.where(np.isnan(scores), published, scores)
+    return np.where(np.asarray(types.data) == UNAVAILABLE, np.nan, scores).astype(np.float32)
+
+
+def recompute(data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """Every hierarchy series rebuilt from the variables, as (country, year, series) float32."""
+    return aggregate(variable_scores(data_path, cache_path), load_tree())
+
+
+def recompute_composite(data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """The recomputed scores in the layout of the Composite Scores file (same columns)."""
+    composite = open_cube('composite', data_path, cache_path)
+    tree = load_tree()
+    scores = recompute(data_path, cache_path)
+    columns = [tree.position(name) for name in composite.indicators]
+    return Cube('recomputed', scores[:, :, columns], composite.iso, composite.countries,
+                composite.years, composite.indicators).to_frame()
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    recomputed = recompute_composite()
+    elapsed = time.perf_counter() - start
+
+    published = open_cube('composite').to_frame()
+    columns = list(published.columns[3:])
+    gap = (recomputed[columns].round(1) - published[columns]).abs()
+    scored = gap.notna().to_numpy()
+    print(f"Recomputed {len(columns)} series x {len(recomputed)} country-years in {elapsed:.3f}s")
+    print(f"  within 0.1 of the published scores: {(gap.to_numpy()[scored] <= 0.1 + 1e-4).mean():.1%}")
+    print(f"  OVERALL GOVERNANCE largest gap:     {gap['OVERALL GOVERNANCE'].max():.1f}")
@@ -0,0 +1,133 @@
+"""
+Country Registry
+ISO codes, canonical IIAG names and regional groupings keyed on Country_ISO,
+stored as dense integer codes for vectorized lookups
+"""
+
+import numpy as np
+import pandas as pd
+
+REGIONS = ['North Africa', 'West Africa', 'East Africa', 'Central Africa', 'Southern Africa']
+
+# ISO2 (as used in the IIAG Country_ISO column), ISO3, IIAG name, region
+COUNTRIES = [
+    ('DZ', 'DZA', 'Algeria', 'North Africa'),
+    ('AO', 'AGO', 'Angola', 'Southern Africa'),
+    ('BJ', 'BEN', 'Benin', 'West Africa'),
+    ('BW', 'BWA', 'Botswana', 'Southern Africa'),
+    ('BF', 'BFA', 'Burkina Faso', 'West Africa'),
+    ('BI', 'BDI', 'Burundi', 'East Africa'),
+    ('CV', 'CPV', 'Cabo Verde', 'West Africa'),
+    ('CM', 'CMR', 'Cameroon', 'Central Africa'),
+    ('CF', 'CAF', 'Central African Republic', 'Central Africa'),
+    ('TD', 'TCD', 'Chad', 'Central Africa'),
+    ('KM', 'COM', 'Comoros', 'East Africa'),
+    ('CG', 'COG', 'Congo Republic', 'Central Africa'),
+    ('CI', 'CIV', "Côte d'Ivoire", 'West Africa'),
+    ('CD', 'COD', 'DR Congo', 'Central Africa'),
+    ('DJ', 'DJI', 'Djibouti', 'East Africa'),
+    ('EG', 'EGY', 'Egypt', 'North Africa'),
+    ('GQ', 'GNQ', 'Equatorial Guinea', 'Central Africa'),
+    ('ER', 'ERI', 'Eritrea', 'East Africa'),
+    ('SZ', 'SWZ', 'Eswatini', 'Southern Africa'),
+    ('ET', 'ETH', 'Ethiopia', 'East Africa'),
+    ('GA', 'GAB', 'Gabon', 'Central Africa'),
+    ('GM', 'GMB', 'Gambia', 'West Africa'),
+    ('GH', 'GHA', 'Ghana', 'West Africa'),
+    ('GN', 'GIN', 'Guinea', 'West Africa'),
+    ('GW', 'GNB', 'Guinea-Bissau', 'West Africa'),
+    ('KE', 'KEN', 'Kenya', 'East Africa'),
+    ('LS', 'LSO', 'Lesotho', 'Southern Africa'),
+    ('LR', 'LBR', 'Liberia', 'West Africa'),
+    ('LY', 'LBY', 'Libya', 'North Africa'),
+    ('MG', 'MDG', 'Madagascar', 'East Africa'),
+    ('MW', 'MWI', 'Malawi', 'Southern Africa'),
+    ('ML', 'MLI', 'Mali', 'West Africa'),
+    ('MR', 'MRT', 'Mauritania', 'West Africa'),
+    ('MU', 'MUS', 'Mauritius', 'East Africa'),
+    ('MA', 'MAR', 'Morocco', 'North Africa'),
+    ('MZ', 'MOZ', 'Mozambique', 'Southern Africa'),
+    ('NA', 'NAM', 'Namibia', 'Southern Africa'),
+    ('NE', 'NER', 'Niger', 'West Africa'),
+    ('NG', 'NGA', 'Nigeria', 'West Africa'),
+    ('RW', 'RWA', 'Rwanda', 'East Africa'),
+    ('ST', 'STP', 'São Tomé and Príncipe', 'Central Africa'),
+    ('SN', 'SEN', 'Senegal', 'West Africa'),
+    ('SC', 'SYC', 'Seychelles', 'East Africa'),
+    ('SL', 'SLE', 'Sierra Leone', 'West Africa'),
+    ('SO', 'SOM', 'Somalia', 'East Africa'),
+    ('ZA', 'ZAF', 'South Africa', 'Southern Africa'),
+    ('SS', 'SSD', 'South Sudan', 'East Africa'),
+    ('SD', 'SDN', 'Sudan', 'East Africa'),
+    ('TZ', 'TZA', 'Tanzania', 'East Africa'),
+    ('TG', 'TGO', 'Togo', 'West Africa'),
+    ('TN', 'TUN', 'Tunisia', 'North Africa'),
+    ('UG', 'UGA', 'Uganda', 'East Africa'),
+    ('ZM', 'ZMB', 'Zambia', 'Southern Africa'),
+    ('ZW', 'ZWE', 'Zimbabwe', 'Southern Africa'),
+]
+
+# Other spellings seen in IIAG exports and older scripts
+ALIASES = {
+    'Cape Verde': 'CV',
+    'Congo': 'CG',
+    'Republic of Congo': 'CG',
+    'Democratic Republic of the Congo': 'CD',
+    "Cote d'Ivoire": 'CI',
+    'Ivory Coast': 'CI',
+    'Sao Tome and Principe': 'ST',
+    'Swaziland': 'SZ',
+    'The Gambia': 'GM',
+}
+
+ISO2 = pd.Index([c[0] for c in COUNTRIES], name='Country_ISO')
+ISO3 = np.array([c[1] for c in COUNTRIES])
+NAMES = np.array([c[2] for c in COUNTRIES])
+REGION_CODES = np.array([REGIONS.index(c[3]) for c in COUNTRIES], dtype=np.int8)
+
+_NAME_CODES = {**{name: i for i, name in enumerate(NAMES)},
+               **{alias: ISO2.get_loc(iso) for alias, iso in ALIASES.items()}}
+NAME_INDEX = pd.Index(list(_NAME_CODES), name='Country')
+_NAME_TO_CODE = np.array(list(_NAME_CODES.values()), dtype=np.int64)
+
+REGIONAL_GROUPS = {region: NAMES[REGION_CODES == r].tolist() for r, region in enumerate(REGIONS)}
+
+
+def country_codes(df):
+    """
+    Registry position of every row (-1 if unknown), from Country_ISO when the
+    table has it and from the country name otherwise.
+    """
+    if 'Country_ISO' in df.columns:
+        return ISO2.get_indexer(df['Country_ISO'])
+    return name_codes(df['Country'])
+
+
+def name_codes(names):
+    """Registry positions for country names, accepting the aliases above (-1 if unknown)."""
+    positions = NAME_INDEX.get_indexer(pd.Index(names))
+    return np.where(positions >= 0, _NAME_TO_CODE.take(positions), -1)
+
+
+def _take(values, codes, missing):
+    out = values.take(np.where(codes >= 0, codes, 0))
+    return np.where(codes >= 0, out, missing)
+
+
+def assign_regions(df):
+    """Region of every row as a pandas Categorical (NaN for countries outside the registry)."""
+    return pd.Categorical.from_codes(_take(REGION_CODES, country_codes(df), -1), categories=REGIONS)
+
+
+def iso3_codes(df):
+    """ISO3 code for every row, for Plotly choropleths."""
+    return _take(ISO3, country_codes(df), None)
+
+
+def canonical_names(df):
+    """IIAG spelling of every row's country name."""
+    return _take(NAMES, country_codes(df), None)
+
+
+def countries_in_region(region):
+    return REGIONAL_GROUPS[region]
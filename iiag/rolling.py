@@ -0,0 +1,165 @@
+"""
+Rolling Trend Statistics
+3- and 5-year rolling means, slopes and volatility of every country x series
+of a cube, from cumulative sums along the year axis
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.scores import SCORES_FILE, open_scores_cube
+
+WINDOWS = [3, 5]
+STATISTICS = ['mean', 'slope', 'volatility']
+
+
+def _window_sums(values, window):
+    """Sum over each trailing `window` along axis 0 as the difference of two cumulative sums (NaN until the first full window)."""
+    total = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    sums = np.full(values.shape, np.nan)
+    if window <= len(values):
+        sums[window - 1:] = total[window:] - total[:len(values) - window + 1]
+    return sums
+
+
+def rolling_stats(values, window, axis=1, min_periods=None):
+    """
+    Rolling mean, slope (points per year) and volatility (standard deviation
+    of the year-on-year changes) over trailing `window`-year windows along
+    `axis`, for every other position at once.
+
+    Every statistic is a closed-form function of windowed sums of the
+    values, value x year, year, year² and the changes, each the difference
+    of two cumulative sums, so the cost does not grow with the window. A
+    window needs `min_periods` years present (default: all) and is reported
+    at its last year. Returns float64 shaped like `values` plus a last axis
+    of STATISTICS.
+    """
+    # Years first, so each cumulative step works on whole contiguous year slices
+    values = np.moveaxis(np.asarray(values, dtype=np.float64), axis, 0)
+    min_periods = window if min_periods is None else min_periods
+    t = np.arange(len(values), dtype=np.float64).reshape((-1,) + (1,) * (values.ndim - 1))
+    present = ~np.isnan(values)
+    y = np.where(present, values, 0)
+    n = _window_sums(present.astype(np.float64), window)
+    st, stt = _window_sums(np.where(present, t, 0), window), _window_sums(np.where(present, t * t, 0), window)
+    sy, sty = _window_sums(y, window), _window_sums(t * y, window)
+
+    # A window of w years holds the w - 1 changes into its 2nd to last year
+    change = np.diff(values, axis=0, prepend=np.nan)
+    moved = ~np.isnan(change)
+    d = np.where(moved, change, 0)
+    m = _window_sums(moved.astype(np.float64), window - 1)
+    sd, sdd = _window_sums(d, window - 1), _window_sums(d * d, window - 1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sxx = stt - st * st / n
+        mean = sy / n
+        slope = (sty - st * sy / n) / sxx
+        volatility = np.sqrt(np.maximum(sdd - sd * sd / m, 0) / (m - 1))
+    enough = n >= max(min_periods, 1)
+    stats = [np.where(enough, mean, np.nan),
+             np.where(enough & (n >= 2) & (sxx > 0), slope, np.nan),
+             np.where(enough & (m >= 2), volatility, np.nan)]
+    return np.moveaxis(np.stack(stats, axis=-1), 0, axis)
+
+
+class RollingStats:
+    """Statistics shaped (window, country, year, series, statistic); each year holds the window ending in it."""
+
+    def __init__(self, data, windows, iso, countries, years, series):
+        self.data = data
+        self.windows = list(windows)
+        self.iso = pd.Index(iso, name='Country_ISO')
+        self.countries = pd.Index(countries, name='Country')
+        self.years = pd.Index(years, name='Year')
+        self.series = pd.Index(series, name='Series')
+        self._country = {**{c: i for i, c in enumerate(self.countries)}, **{c: i for i, c in enumerate(self.iso)}}
+        self._lookup = {' '.join(str(s).split()).casefold(): i for i, s in enumerate(series)}
+
+    def _index(self, series):
+        return self._lookup[' '.join(str(series).split()).casefold()]
+
+    def get(self, statistic, window=3):
+        """(country, year, series) array of one statistic."""
+        return self.data[self.windows.index(window), :, :, :, STATISTICS.index(statistic)]
+
+    def frame(self, statistic, series, window=3):
+        """Country x year DataFrame of one statistic for one series."""
+        return pd.DataFrame(self.get(statistic, window)[:, :, self._index(series)], index=self.countries,
+                            columns=self.years)
+
+    def country(self, country, series, window=3):
+        """Year x statistic DataFrame for one country (name or ISO2) and series."""
+        values = self.data[self.windows.index(window), self._country[country], :, self._index(series)]
+        return pd.DataFrame(values, index=self.years, columns=STATISTICS)
+
+
+def _open_source(source, data_path, cache_path):
+    cube = (open_scores_cube(SCORES_FILE, data_path, cache_path) if source == 'scores'
+            else open_cube(source, data_path, cache_path))
+    axes = json.loads((Path(cache_path) / 'cubes' / f'{source}.json').read_text(encoding='utf-8'))
+    return cube, json.dumps({'sha1': axes['source']['sha1'], 'windows': WINDOWS})
+
+
+def _rolling(values):
+    return np.stack([rolling_stats(values, w, axis=1) for w in WINDOWS]).astype(np.float32)
+
+
+def load_rolling(source='composite', data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """
+    RollingStats for every WINDOWS length over a cube ('composite', 'scores',
+    'raw', 'processed'), cached in data/cache/cubes and recomputed when the
+    cube's source file changes.
+    """
+    cube, key = _open_source(source, data_path, cache_path)
+    cache_file = Path(cache_path) / 'cubes' / f'rolling_{source}.npz'
+    data = None
+    if cache_file.exists() and not refresh:
+        with np.load(cache_file) as npz:
+            if str(npz['key']) == key:
+                data = npz['data']
+    if data is None:
+        data = _rolling(cube.as_float())
+        np.savez(cache_file, key=np.array(key), years=np.asarray(cube.years), data=data)
+    return RollingStats(data, WINDOWS, cube.iso, cube.countries, cube.years, cube.indicators)
+
+
+def extend_rolling(source, previous_sha1, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """Roll only the windows ending in years appended to a cube (iiag.append); returns the file or None."""
+    cache_file = Path(cache_path) / 'cubes' / f'rolling_{source}.npz'
+    if not cache_file.exists():
+        return None
+    with np.load(cache_file) as npz:
+        if str(npz['key']) != json.dumps({'sha1': previous_sha1, 'windows': WINDOWS}):
+            return None
+        years, data = npz['years'].tolist(), npz['data']
+
+    cube, key = _open_source(source, data_path, cache_path)
+    if cube.years[:len(years)].tolist() != years:
+        return None
+    # The new windows reach back at most max(WINDOWS) - 1 years
+    start = max(len(years) - max(WINDOWS) + 1, 0)
+    new = _rolling(cube.as_float()[:, start:])[:, :, len(years) - start:]
+    np.savez(cache_file, key=np.array(key), years=np.asarray(cube.years), data=np.concatenate([data, new], axis=2))
+    return cache_file
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    rolling = load_rolling('scores', refresh=True)
+    elapsed = time.perf_counter() - start
+    n = rolling.data.shape[1] * rolling.data.shape[3]
+    print(f"Rolled {n:,} country x series trajectories over {', '.join(map(str, WINDOWS))}-year windows "
+          f"in {elapsed:.3f}s")
+    year = int(rolling.years.max())
+    slopes = rolling.frame('slope', 'OVERALL GOVERNANCE', window=5)[year].dropna().sort_values(ascending=False)
+    print(f"\nFastest OVERALL GOVERNANCE gains over {year - 4}-{year} (points per year):")
+    print(slopes.head(5).to_string(float_format=lambda v: f'{v:+.2f}'))
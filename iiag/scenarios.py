@@ -0,0 +1,131 @@
+"""
+What-If Scenarios
+Applies batches of indicator deltas to one year's scores and returns the
+recomputed composite scores, ranks and rank shifts for every scenario at once
+"""
+
+import numpy as np
+
+from iiag.cube import open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.hierarchy import load_tree
+from iiag.ranks import rank_scores
+from iiag.recompute import aggregate, aggregation_levels, variable_scores
+
+
+def variable_weights(base_variables, tree, series, levels=None):
+    """
+    d(series) / d(variable) for every country, shaped (country, series, variable).
+
+    Every calculated series is an average of averages, so while the set of
+    available variables is fixed each series is a fixed linear combination of
+    them. Aggregating one-hot variable vectors (NaN where a country has no
+    data) gives those weights directly.
+    """
+    n_countries, n_variables = base_variables.shape
+    missing = np.where(np.isnan(base_variables), np.nan, 0).astype(np.float32)
+    one_hot = np.repeat(missing[None], n_variables, axis=0)
+    one_hot[np.arange(n_variables), :, np.arange(n_variables)] = np.where(
+        np.isnan(base_variables.T), np.nan, 1)
+    weights = aggregate(one_hot, tree, levels)[:, :, [tree.position(s) for s in series]]
+    return np.nan_to_num(weights).transpose(1, 2, 0)
+
+
+class ScenarioResult:
+    """Scores, ranks and rank shifts shaped (scenario, country, series); shift > 0 means moving up."""
+
+    def __init__(self, scores, ranks, baseline_ranks, shift, countries, series):
+        self.scores = scores
+        self.ranks = ranks
+        self.baseline_ranks = baseline_ranks
+        self.shift = shift
+        self.countries = countries
+        self.series = series
+
+
+class ScenarioEngine:
+    """
+    Baseline: one year of the published composite scores and Ranks file.
+
+    `targets` are the hierarchy series a scenario can move (SeriesIDs or
+    names). A delta on a target shifts every variable beneath it by that many
+    points, clipped to 0-100, so a target with no clipped variables rises by
+    exactly the delta.
+    """
+
+    def __init__(self, targets, year=None, series=('OVERALL GOVERNANCE',), data_path=DATA_PATH, cache_path=CACHE_PATH):
+        tree = load_tree()
+        composite = open_cube('composite', data_path, cache_path)
+        ranks = open_cube('ranks', data_path, cache_path)
+        year = composite.years.max() if year is None else year
+
+        self.countries = composite.countries
+        self.iso = composite.iso
+        self.series = list(series)
+        self.targets = list(targets)
+        self.year = int(year)
+
+        y = composite.year_index(year)
+        self.base_variables = variable_scores(data_path, cache_path)[:, y]
+        self.base_scores = np.stack([composite.data[:, y, composite.indicator_index(s)] for s in self.series], axis=-1)
+        self.base_ranks = np.stack([ranks.data[:, y, ranks.indicator_index(s)] for s in self.series], axis=-1)
+        self.weights = variable_weights(self.base_variables, tree, self.series, aggregation_levels(tree))
+
+        # target -> variables it moves, as a (target, variable) 0/1 matrix
+        self.spread = np.zeros((len(self.targets), self.base_variables.shape[1]), dtype=np.float32)
+        for k, target in enumerate(self.targets):
+            self.spread[k, tree.variables(target)] = 1
+
+        # Variables under no target never move, so run() leaves them out. A
+        # missing variable has zero weight, so it can sit at 0 instead of NaN.
+        moving = self.spread.any(axis=0)
+        self._spread = self.spread[:, moving]
+        self._base = np.nan_to_num(self.base_variables[:, moving])
+        self._weights = np.ascontiguousarray(self.weights[:, :, moving].transpose(0, 2, 1))
+
+    def deltas(self, n_scenarios):
+        """An all-zero (scenario, country, target) batch to fill in."""
+        return np.zeros((n_scenarios, len(self.countries), len(self.targets)), dtype=np.float32)
+
+    def run(self, deltas, chunk_size=4096):
+        """
+        Evaluate a (scenario, country, target) batch of deltas.
+
+        Sparse batches recompute only the (scenario, country) pairs with a
+        non-zero delta; dense ones (a quarter of the pairs or more) recompute
+        whole blocks of about `chunk_size` pairs along the scenario axis,
+        which avoids gathering per-pair weights. A zero delta leaves the
+        published score unchanged either way.
+        """
+        deltas = np.asarray(deltas, dtype=np.float32)
+        n_scenarios, n_countries = deltas.shape[:2]
+        scores = np.broadcast_to(self.base_scores, (n_scenarios,) + self.base_scores.shape).copy()
+
+        active = (deltas != 0).any(axis=2)
+        if active.sum() * 4 >= active.size:
+            step = max(chunk_size // n_countries, 1)
+            for start in range(0, n_scenarios, step):
+                moved = np.clip(self._base + deltas[start:start + step] @ self._spread, 0, 100) - self._base
+                # (scenario, country, 1, variable) @ (country, variable, series), batched over countries
+                scores[start:start + step] += (moved[:, :, None] @ self._weights)[:, :, 0]
+        else:
+            scenario, country = np.nonzero(active)
+            for start in range(0, len(scenario), chunk_size):
+                s, c = scenario[start:start + chunk_size], country[start:start + chunk_size]
+                moved = np.clip(self._base[c] + deltas[s, c] @ self._spread, 0, 100) - self._base[c]
+                scores[s, c] += (moved[:, None] @ self._weights[c])[:, 0]
+
+        ranks = np.empty(scores.shape, dtype=np.uint16)
+        for start in range(0, n_scenarios, chunk_size):
+            ranks[start:start + chunk_size] = rank_scores(scores[start:start + chunk_size], axis=1)
+        shift = self.base_ranks.astype(np.int16) - ranks.astype(np.int16)
+        return ScenarioResult(scores, ranks, self.base_ranks, shift, self.countries, self.series)
+
+    def rank_after(self, country, changes):
+        """Rank of one country after one scenario, e.g. rank_after('Kenya', {'ANTICORR': 10})."""
+        deltas = self.deltas(1)
+        c = self.countries.get_loc(country) if country in self.countries else self.iso.get_loc(country)
+        for target, delta in changes.items():
+            deltas[0, c, self.targets.index(target)] = delta
+        result = self.run(deltas)
+        return {s: int(result.ranks[0, c, k]) for k, s in enumerate(self.series)}
@@ -0,0 +1,118 @@
+"""
+Full IIAG Score Set
+Streams data/excel-files/2024-IIAG-scores.xlsx (every series of the hierarchy,
+not just the composite columns) into the cube cache
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+
+from iiag.cube import Cube, country_axis, read_cube, write_cube
+from iiag.data import CACHE_PATH, DATA_PATH, file_hash, file_key
+from iiag.regions import ISO2, name_codes
+
+SCORES_FILE = Path('data/excel-files/2024-IIAG-scores.xlsx')
+
+# Rows above the data: IsVariable, Depth, Level, SeriesID, Measure name,
+# Data source, then the Country/Year header
+METADATA_ROWS = 6
+SERIES_ID_ROW = 3
+NAME_ROW = 4
+
+
+def _dedupe(labels):
+    """Suffix repeated names ".1", ".2", ... the way pandas does for CSV headers."""
+    seen = {}
+    out = []
+    for label in labels:
+        n = seen.get(label, 0)
+        seen[label] = n + 1
+        out.append(label if n == 0 else f'{label}.{n}')
+    return out
+
+
+def read_scores(path=SCORES_FILE):
+    """
+    Stream the workbook row by row in read-only mode.
+
+    Returns (series_ids, names, countries, years, values) with values a
+    float32 (row, series) array; "." marks a missing score and becomes NaN.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        metadata = [next(rows) for _ in range(METADATA_ROWS)]
+        next(rows)
+        series_ids = [str(s).strip() for s in metadata[SERIES_ID_ROW][2:]]
+        names = [' '.join(str(s).split()) for s in metadata[NAME_ROW][2:]]
+
+        countries, years, values = [], [], []
+        for row in rows:
+            if row[0] is None:
+                continue
+            countries.append(row[0])
+            years.append(int(row[1]))
+            values.append([np.nan if v is None or v == '.' else v for v in row[2:]])
+    finally:
+        wb.close()
+    return series_ids, names, countries, years, np.array(values, dtype=np.float32)
+
+
+def build_scores_cube(path=SCORES_FILE, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """Write the score set as the 'scores' cube: country x year x series, float32 with NaN for missing."""
+    series_ids, names, countries, years, values = read_scores(path)
+    iso, axis_names = country_axis(data_path, cache_path)
+    year_axis = sorted(set(years))
+
+    codes = name_codes(countries)
+    if (codes < 0).any():
+        unknown = sorted({c for c, code in zip(countries, codes) if code < 0})
+        raise ValueError(f'Countries not in the registry: {unknown}')
+    iso_pos = {c: i for i, c in enumerate(iso)}
+    c_idx = np.array([iso_pos[c] for c in ISO2[codes]])
+    y_idx = np.searchsorted(year_axis, years)
+
+    array = np.full((len(iso), len(year_axis), len(names)), np.nan, dtype=np.float32)
+    array[c_idx, y_idx] = values
+    cube = Cube('scores', array, iso, axis_names, year_axis, _dedupe(names))
+
+    key = {**file_key(path), 'sha1': file_hash(path), 'series_ids': series_ids}
+    write_cube(cube, key, Path(cache_path) / 'cubes')
+
+
+def open_scores_cube(path=SCORES_FILE, data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """
+    Memory-map the 'scores' cube, re-reading the xlsx only when its contents change.
+
+    Series are in hierarchy (workbook) order, so iiag.hierarchy positions index
+    the indicator axis directly.
+    """
+    cube_path = Path(cache_path) / 'cubes'
+    if not refresh and (cube_path / 'scores.npy').exists() and (cube_path / 'scores.json').exists():
+        cube, cached_key = read_cube('scores', cube_path)
+        key = file_key(path)
+        if {k: cached_key.get(k) for k in key} == key:
+            return cube
+        key['sha1'] = file_hash(path)
+        if cached_key.get('sha1') == key['sha1']:
+            axes_file = cube_path / 'scores.json'
+            axes = json.loads(axes_file.read_text(encoding='utf-8'))
+            axes['source'].update(key)
+            axes_file.write_text(json.dumps(axes, indent=1), encoding='utf-8')
+            return cube
+
+    build_scores_cube(path, data_path, cache_path)
+    return read_cube('scores', cube_path)[0]
+
+
+def load_scores(series=None, path=SCORES_FILE, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """The score set (or some series of it) in the Country_ISO/Country/Year layout of the composite CSV."""
+    return open_scores_cube(path, data_path, cache_path).to_frame(series)
+
+
+if __name__ == '__main__':
+    cube = open_scores_cube(refresh=True)
+    print(f"  {cube.name:<16} {str(cube.shape):<16} {cube.data.dtype}")
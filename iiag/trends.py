@@ -0,0 +1,184 @@
+"""
+Batch Trend Fits
+Closed-form least-squares lines for whole arrays of series at once: slope,
+intercept, R², slope standard error and point count, skipping missing values
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iiag.cube import open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+from iiag.scores import SCORES_FILE, open_scores_cube
+
+FIELDS = ['slope', 'intercept', 'r2', 'se', 'n']
+SLOPE, INTERCEPT, R2, SE, N = range(len(FIELDS))
+
+# Running regression accumulators: point count, means and centred sums of squares and products
+MOMENTS = ['n', 'x_mean', 'y_mean', 'sxx', 'sxy', 'syy']
+
+
+def line_moments(x, y, axis=-1):
+    """
+    MOMENTS of the (x, y) points along `axis` where both are present.
+
+    Moments of separate slices (e.g. one more year) combine with
+    merge_moments, so a fit can be extended without revisiting old points.
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    use = ~np.isnan(x) & ~np.isnan(y)
+    n = use.sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.where(use, x, 0).sum(axis=axis) / n
+        y_mean = np.where(use, y, 0).sum(axis=axis) / n
+        dx = np.where(use, x - np.expand_dims(x_mean, axis), 0)
+        dy = np.where(use, y - np.expand_dims(y_mean, axis), 0)
+    return np.stack([n, x_mean, y_mean, (dx * dx).sum(axis=axis), (dx * dy).sum(axis=axis),
+                     (dy * dy).sum(axis=axis)], axis=-1)
+
+
+def merge_moments(a, b):
+    """Combine the MOMENTS of two disjoint sets of points (Chan et al.'s pairwise update)."""
+    na, nb = a[..., 0], b[..., 0]
+    n = na + nb
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dx, dy = b[..., 1] - a[..., 1], b[..., 2] - a[..., 2]
+        weight = na * nb / n
+        merged = np.stack([n, a[..., 1] + dx * nb / n, a[..., 2] + dy * nb / n,
+                           a[..., 3] + b[..., 3] + dx * dx * weight, a[..., 4] + b[..., 4] + dx * dy * weight,
+                           a[..., 5] + b[..., 5] + dy * dy * weight], axis=-1)
+    return np.where((nb == 0)[..., None], a, np.where((na == 0)[..., None], b, merged))
+
+
+def fit_moments(moments):
+    """FIELDS (slope, intercept, R², slope SE, n) from line MOMENTS, as in fit_lines."""
+    n, x_mean, y_mean, sxx, sxy, syy = np.moveaxis(np.asarray(moments, dtype=np.float64), -1, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where((n >= 2) & (sxx > 0), sxy / sxx, np.nan)
+        intercept = y_mean - slope * x_mean
+        residual = np.maximum(syy - slope * sxy, 0)
+        r2 = np.where(syy > 0, 1 - residual / syy, np.nan)
+        se = np.where(n >= 3, np.sqrt(residual / (n - 2) / sxx), np.nan)
+    return np.stack([slope, intercept, np.where(np.isnan(slope), np.nan, r2), se, n], axis=-1)
+
+
+def fit_lines(x, y, axis=-1):
+    """
+    OLS fit of y on x along `axis` for every other position at once.
+
+    `x` and `y` broadcast against each other; a point is used only where both
+    are present. Returns float64 shaped like the broadcast inputs without
+    `axis`, plus a last axis of FIELDS. Slope and intercept need two points,
+    the standard error of the slope three; otherwise they are NaN.
+    """
+    return fit_moments(line_moments(x, y, axis))
+
+
+class Trends:
+    """Per-country, per-series trend fits shaped (country, series, field); intercept is the fitted first-year score."""
+
+    def __init__(self, data, countries, series, years):
+        self.data = data
+        self.countries = pd.Index(countries, name='Country')
+        self.series = pd.Index(series, name='Series')
+        self.years = pd.Index(years, name='Year')
+        self._lookup = {' '.join(str(s).split()).casefold(): i for i, s in enumerate(series)}
+
+    def _index(self, series):
+        return self._lookup[' '.join(str(series).split()).casefold()]
+
+    def frame(self, field='slope', series=None):
+        """Country x series DataFrame of one field."""
+        columns = range(len(self.series)) if series is None else [self._index(s) for s in series]
+        columns = list(columns)
+        return pd.DataFrame(self.data[:, columns, FIELDS.index(field)], index=self.countries,
+                            columns=self.series[columns])
+
+    def ranking(self, series, by='slope', ascending=False):
+        """All fields for one series, countries sorted by `by` (fastest improvers first by default)."""
+        fits = self.data[:, self._index(series)]
+        order = np.argsort(fits[:, FIELDS.index(by)] * (1 if ascending else -1), kind='stable')
+        order = order[~np.isnan(fits[order, FIELDS.index(by)])]
+        return pd.DataFrame(fits[order], index=self.countries[order], columns=FIELDS)
+
+
+def compute_trends(source='scores', start=None, end=None, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """
+    Fit score ~ year for every country and series of a cube ('scores' for all
+    492 series, or 'composite') between `start` and `end` (default: all years).
+    """
+    cube = (open_scores_cube(SCORES_FILE, data_path, cache_path) if source == 'scores'
+            else open_cube(source, data_path, cache_path))
+    years = np.asarray(cube.years)
+    keep = (years >= (start or years.min())) & (years <= (end or years.max()))
+    values = cube.as_float()[:, keep]
+    elapsed = (years[keep] - years[keep][0]).reshape(1, -1, 1)
+    return Trends(fit_lines(elapsed, values, axis=1).astype(np.float32), cube.countries, cube.indicators, years[keep])
+
+
+def _moments_file(source, cache_path):
+    return Path(cache_path) / 'cubes' / f'trends_{source}.npz'
+
+
+def _source_sha1(source, data_path, cache_path):
+    cube = (open_scores_cube(SCORES_FILE, data_path, cache_path) if source == 'scores'
+            else open_cube(source, data_path, cache_path))
+    axes = json.loads((Path(cache_path) / 'cubes' / f'{source}.json').read_text(encoding='utf-8'))
+    return cube, axes['source']['sha1']
+
+
+def _year_moments(cube, years):
+    """Line MOMENTS of score ~ years since the cube's first year, over the given years only."""
+    positions = [cube.year_index(y) for y in years]
+    elapsed = (np.asarray(years) - cube.years[0]).reshape(1, -1, 1)
+    return line_moments(elapsed, cube.as_float()[:, positions], axis=1)
+
+
+def load_trends(source='scores', data_path=DATA_PATH, cache_path=CACHE_PATH, refresh=False):
+    """
+    Trends over all years of a cube, from running line moments cached in
+    data/cache/cubes. When a year is appended (iiag.append) the moments are
+    extended with that year alone rather than refitted.
+    """
+    cube, sha1 = _source_sha1(source, data_path, cache_path)
+    cache_file = _moments_file(source, cache_path)
+    moments = None
+    if cache_file.exists() and not refresh:
+        with np.load(cache_file) as npz:
+            if str(npz['sha1']) == sha1:
+                moments = npz['moments']
+    if moments is None:
+        moments = _year_moments(cube, cube.years)
+        np.savez(cache_file, sha1=np.array(sha1), years=np.asarray(cube.years), moments=moments)
+    return Trends(fit_moments(moments).astype(np.float32), cube.countries, cube.indicators, cube.years)
+
+
+def extend_trends(source, previous_sha1, data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """Merge the moments of a cube's newly appended years into its cached moments; returns the file or None."""
+    cache_file = _moments_file(source, cache_path)
+    if not cache_file.exists():
+        return None
+    with np.load(cache_file) as npz:
+        if str(npz['sha1']) != previous_sha1:
+            return None
+        years, moments = npz['years'].tolist(), npz['moments']
+    cube, sha1 = _source_sha1(source, data_path, cache_path)
+    if cube.years[:len(years)].tolist() != years:
+        return None
+    moments = merge_moments(moments, _year_moments(cube, cube.years[len(years):]))
+    np.savez(cache_file, sha1=np.array(sha1), years=np.asarray(cube.years), moments=moments)
+    return cache_file
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    trends = load_trends(refresh=True)
+    elapsed = time.perf_counter() - start
+    print(f"Fitted {trends.data.shape[0] * trends.data.shape[1]:,} country x series trends in {elapsed:.3f}s")
+    print("\nFastest-improving countries in RURAL ECONOMY (points per year):")
+    print(trends.ranking('RURAL ECONOMY').head(10).to_string(float_format=lambda v: f'{v:.2f}'))
@@ -0,0 +1,172 @@
+"""
+Rank Uncertainty
+Monte Carlo rank distributions from the published standard errors: every draw
+perturbs all scores at once and re-ranks all countries in every year and series
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from iiag.confidence import load_confidence_intervals
+from iiag.cube import open_cube
+from iiag.data import CACHE_PATH, DATA_PATH
+
+
+def _rank_counts(scores, se, sizes, seeds):
+    """
+    Histogram of simulated ranks, shaped (year, series, country, rank) with
+    rank 0 counting draws where the country has no score.
+
+    Draws come in chunks of `sizes[i]` draws from the random stream `seeds[i]`.
+    They are rounded to one decimal like the published scores and tied
+    countries share the best rank, as in the Ranks file. Each normal draw is
+    used twice, as +z and -z (antithetic pairs), so chunk sizes should be even.
+    """
+    n_years, n_series, n_countries = scores.shape
+    n_ranks = n_countries + 1
+    groups = n_years * n_series
+    counts = np.zeros(groups * n_countries * n_ranks, dtype=np.int64)
+
+    # Scores become tenths of a point, negated so the best sorts first, and are
+    # packed with the country position into one integer key: a plain sort then
+    # yields both the order and the sorted values. Missing scores sort last.
+    shift = max(int(n_countries - 1).bit_length(), 1)
+    key_type = np.int32 if shift <= 10 else np.int64
+    valid = ~np.isnan(scores)
+    scored = valid.sum(axis=-1, keepdims=True)
+    position = np.arange(n_countries, dtype=key_type)
+    slot = np.arange(n_countries, dtype=np.min_scalar_type(n_countries))
+    index_type = np.int32 if len(counts) < 2 ** 31 else np.int64
+    offset = (np.arange(groups, dtype=index_type) * n_countries * n_ranks).reshape(n_years, n_series, 1)
+    tenths = np.where(valid, -10 * scores, 2 ** 20).astype(np.float32)
+    spread = np.where(valid, 10 * se, 0).astype(np.float32)
+
+    for n_draws, seed in zip(sizes, seeds):
+        z = np.random.default_rng(seed).standard_normal(((n_draws + 1) // 2,) + scores.shape, dtype=np.float32)
+        keys = np.rint(tenths + spread * np.concatenate([z, -z])[:n_draws]).astype(key_type)
+        keys = np.sort((keys << shift) | position, axis=-1)
+        values = keys >> shift
+        first = np.ones(keys.shape, dtype=bool)
+        first[..., 1:] = values[..., 1:] != values[..., :-1]
+        ranks = np.maximum.accumulate(np.where(first, slot, slot.dtype.type(0)), axis=-1) + slot.dtype.type(1)
+        ranks = np.where(position < scored, ranks, slot.dtype.type(0))
+        index = (keys & ((1 << shift) - 1)).astype(index_type) * n_ranks
+        index += ranks
+        index += offset
+        counts += np.bincount(index.ravel(), minlength=len(counts))
+    return counts.reshape(n_years, n_series, n_countries, n_ranks)
+
+
+class RankDistribution:
+    """Simulated rank counts shaped (country, year, series, rank), rank 0 = unscored."""
+
+    def __init__(self, counts, n_draws, iso, countries, years, series, scores, ranks):
+        self.counts = counts
+        self.n_draws = n_draws
+        self.iso = pd.Index(iso, name='Country_ISO')
+        self.countries = pd.Index(countries, name='Country')
+        self.years = pd.Index(years, name='Year')
+        self.series = pd.Index(series, name='Series')
+        self.scores = scores
+        self.ranks = ranks
+
+    def _select(self, values, year=None, series=None):
+        key = [slice(None)] * 3
+        if year is not None:
+            key[1] = self.years.get_loc(int(year))
+        if series is not None:
+            key[2] = self.series.get_loc(series)
+        return values[tuple(key)]
+
+    def probabilities(self, year=None, series=None):
+        """Share of draws at each rank 1-54 (rank 0 dropped)."""
+        return self._select(self.counts[..., 1:], year, series) / self.n_draws
+
+    def p_rank_at_most(self, k, year=None, series=None):
+        """P(rank <= k)."""
+        return self._select(self.counts[..., 1:k + 1].sum(axis=-1), year, series) / self.n_draws
+
+    def p_bottom(self, k, year=None, series=None):
+        """P(rank among the last k of the countries scored in that draw)."""
+        scored = (self.counts[..., 1:] > 0).any(axis=-1).sum(axis=0, keepdims=True)
+        first = np.maximum(scored - k + 1, 1)[..., None]
+        rank = np.arange(1, self.counts.shape[-1])
+        return self._select((self.counts[..., 1:] * (rank >= first)).sum(axis=-1), year, series) / self.n_draws
+
+    def quantile(self, q, year=None, series=None):
+        """Rank at quantile `q` of each country's distribution (0 where never scored)."""
+        cumulative = np.cumsum(self.counts[..., 1:], axis=-1)
+        total = cumulative[..., -1:]
+        rank = (cumulative < q * total).sum(axis=-1) + 1
+        return self._select(np.where(total[..., 0] > 0, rank, 0), year, series)
+
+    def mean_rank(self, year=None, series=None):
+        rank = np.arange(1, self.counts.shape[-1])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (self.counts[..., 1:] * rank).sum(axis=-1) / self.counts[..., 1:].sum(axis=-1)
+        return self._select(mean, year, series)
+
+    def summary(self, year, series='OVERALL GOVERNANCE', k=10, level=90):
+        """Per-country table: published score and rank, median and `level`% rank band, P(top k), P(bottom k)."""
+        tail = (1 - level / 100) / 2
+        return pd.DataFrame({
+            'Score': self._select(self.scores, year, series),
+            'Rank': self._select(self.ranks, year, series),
+            'Median Rank': self.quantile(0.5, year, series),
+            f'{level}% Low': self.quantile(tail, year, series),
+            f'{level}% High': self.quantile(1 - tail, year, series),
+            f'P(Top {k})': self.p_rank_at_most(k, year, series),
+            f'P(Bottom {k})': self.p_bottom(k, year, series),
+        }, index=self.countries)
+
+
+def simulate_ranks(n_draws=10000, seed=0, processes=1, chunk_size=1000,
+                   data_path=DATA_PATH, cache_path=CACHE_PATH):
+    """
+    Draw `n_draws` score sets from N(published score, standard error) for the
+    overall and category scores in every year and re-rank each draw.
+
+    Draws come in chunks of `chunk_size`, each with its own random stream
+    spawned from `seed` by chunk index, so a seed always gives the same result
+    however the chunks are shared out. `processes` > 1 spreads the chunks over
+    a process pool; callers doing so from a script need an
+    ``if __name__ == '__main__':`` guard where processes are spawned.
+    """
+    ci = load_confidence_intervals(data_path, cache_path)
+    composite = open_cube('composite', data_path, cache_path)
+    ranks = open_cube('ranks', data_path, cache_path)
+    scores = composite.as_float(list(ci.series))
+    se = np.asarray(ci.standard_errors(), dtype=np.float32)
+
+    # Workers rank along the last axis: (year, series, country)
+    args = scores.transpose(1, 2, 0).copy(), se.transpose(1, 2, 0).copy()
+    sizes = [min(chunk_size, n_draws - start) for start in range(0, n_draws, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = min(processes, len(sizes))
+    if workers <= 1:
+        counts = _rank_counts(*args, sizes, seeds)
+    else:
+        shares = np.array_split(np.arange(len(sizes)), workers)
+        with ProcessPoolExecutor(workers) as pool:
+            parts = pool.map(_rank_counts, *zip(*[args + ([sizes[i] for i in share], [seeds[i] for i in share])
+                                                  for share in shares]))
+            counts = sum(parts)
+
+    published = np.asarray(ranks.data[:, :, [ranks.indicator_index(s) for s in ci.series]])
+    return RankDistribution(counts.transpose(2, 0, 1, 3), n_draws, composite.iso, composite.countries,
+                            composite.years, list(ci.series), scores, published)
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    distribution = simulate_ranks(100000)
+    elapsed = time.perf_counter() - start
+    year = distribution.years.max()
+    print(f"Simulated 100,000 draws x {len(distribution.years)} years x {len(distribution.series)} series "
+          f"in {elapsed:.1f}s")
+    table = distribution.summary(year).sort_values('Rank').head(10)
+    print(table.to_string(float_format=lambda v: f'{v:.2f}'))
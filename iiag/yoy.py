@@ -0,0 +1,71 @@
+"""
+Year-over-Year Change Matrices
+Array differences along the year axis for every series at once, plus cumulative
+and annualised change since the first year
+"""
+
+import numpy as np
+import pandas as pd
+
+from iiag.changes import series_array
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    return values if values.dtype in (np.float32, np.float64) else values.astype(float)
+
+
+def year_over_year(values, axis=1):
+    """Change from the previous year along `axis`; the first year is NaN."""
+    values = _as_float(values)
+    out = np.full_like(values, np.nan)
+    current = [slice(None)] * values.ndim
+    current[axis] = slice(1, None)
+    out[tuple(current)] = np.diff(values, axis=axis)
+    return out
+
+
+def cumulative_change(values, axis=1):
+    """Change since the first year along `axis` (NaN where the base year is missing)."""
+    values = _as_float(values)
+    return values - np.take(values, [0], axis=axis)
+
+
+def annualised_change(values, years, axis=1):
+    """Cumulative change divided by the years elapsed since the first year (NaN for the base year)."""
+    elapsed = np.asarray(years, dtype=float) - float(years[0])
+    shape = [1] * np.ndim(values)
+    shape[axis] = len(years)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = cumulative_change(values, axis) / np.where(elapsed == 0, np.nan, elapsed).reshape(shape)
+    return out
+
+
+def change_matrices(values, years, axis=1):
+    return {
+        'yoy': year_over_year(values, axis),
+        'cumulative': cumulative_change(values, axis),
+        'annualised': annualised_change(values, years, axis),
+    }
+
+
+def cube_changes(cube):
+    """YoY, cumulative and annualised change for every country x year x indicator of a Cube."""
+    return change_matrices(cube.as_float(), list(cube.years), axis=1)
+
+
+def composite_changes(df, series=None):
+    """
+    The same three matrices for the composite table, shaped (series, country, year).
+
+    Returns (matrices, series, countries, years).
+    """
+    array, series, countries, years = series_array(df, series)
+    return change_matrices(array, list(years), axis=2), series, countries, years
+
+
+def yoy_frame(df, series='OVERALL GOVERNANCE', kind='yoy'):
+    """Country x Year DataFrame of one series' changes, ready for a heatmap."""
+    matrices, _, countries, years = composite_changes(df, [series])
+    frame = pd.DataFrame(matrices[kind][0], index=countries, columns=years)
+    return frame.iloc[:, 1:].sort_index()
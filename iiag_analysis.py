@@ -8,6 +8,19 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
+from iiag.aggregates import load_aggregates
+from iiag.breaks import detect_breaks
+from iiag.changes import change_table, top_movers
+from iiag.clusters import assign_peer_groups
+from iiag.correlation import load_correlations
+from iiag.data import load_composite_scores, load_table
+from iiag.hierarchy import load_tree
+from iiag.regions import assign_regions
+from iiag.rolling import load_rolling
+from iiag.scores import open_scores_cube
+from iiag.trends import INTERCEPT, SLOPE, fit_lines
+from iiag.uncertainty import simulate_ranks
+from iiag.yoy import yoy_frame
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -22,14 +35,8 @@ plt.rcParams['xtick.labelsize'] = 10
 plt.rcParams['ytick.labelsize'] = 10
 
 # Load data
-data_path = Path('data/csv-files')
-composite_scores = pd.read_csv(data_path / '2024 IIAG_Composite Scores.csv', encoding='utf-8-sig')
-ranks = pd.read_csv(data_path / '2024 IIAG_Ranks.csv', encoding='utf-8-sig')
-
-# Clean data - replace '.' with NaN
-composite_scores = composite_scores.replace('.', np.nan)
-for col in composite_scores.columns[3:]:  # Skip Country_ISO, Country, Year
-    composite_scores[col] = pd.to_numeric(composite_scores[col], errors='coerce')
+composite_scores = load_composite_scores()
+ranks = load_table('ranks')
 
 print("="*80)
 print("IBRAHIM INDEX OF AFRICAN GOVERNANCE (IIAG) - EXECUTIVE SUMMARY")
@@ -39,43 +46,19 @@ print(f"  • Countries: {composite_scores['Country'].nunique()}")
 print(f"  • Years: {composite_scores['Year'].min()} - {composite_scores['Year'].max()}")
 print(f"  • Total Records: {len(composite_scores):,}")
 
-# Define categories
-main_categories = [
-    'SECURITY & RULE OF LAW',
-    'PARTICIPATION, RIGHTS & INCLUSION',
-    'FOUNDATIONS FOR ECONOMIC OPPORTUNITY',
-    'HUMAN DEVELOPMENT'
-]
-
-subcategories = {
-    'SECURITY & RULE OF LAW': ['SECURITY & SAFETY', 'RULE OF LAW & JUSTICE', 'ACCOUNTABILITY & TRANSPARENCY', 'ANTI-CORRUPTION'],
-    'PARTICIPATION, RIGHTS & INCLUSION': ['PARTICIPATION', 'RIGHTS', 'INCLUSION & EQUALITY', "WOMEN'S EQUALITY"],
-    'FOUNDATIONS FOR ECONOMIC OPPORTUNITY': ['PUBLIC ADMINISTRATION', 'BUSINESS & LABOUR ENVIRONMENT', 'INFRASTRUCTURE', 'RURAL ECONOMY'],
-    'HUMAN DEVELOPMENT': ['HEALTH', 'EDUCATION', 'SOCIAL PROTECTION & WELFARE', 'SUSTAINABLE ENVIRONMENT']
-}
-
-# Regional groupings
-regional_groups = {
-    'North Africa': ['Algeria', 'Egypt', 'Libya', 'Morocco', 'Tunisia'],
-    'West Africa': ['Benin', 'Burkina Faso', 'Cape Verde', 'Côte d\'Ivoire', 'Gambia', 'Ghana', 'Guinea',
-                    'Guinea-Bissau', 'Liberia', 'Mali', 'Mauritania', 'Niger', 'Nigeria', 'Senegal',
-                    'Sierra Leone', 'Togo'],
-    'East Africa': ['Burundi', 'Comoros', 'Djibouti', 'Eritrea', 'Ethiopia', 'Kenya', 'Madagascar',
-                    'Mauritius', 'Rwanda', 'Seychelles', 'Somalia', 'South Sudan', 'Sudan', 'Tanzania', 'Uganda'],
-    'Central Africa': ['Cameroon', 'Central African Republic', 'Chad', 'Congo', 'DR Congo', 'Equatorial Guinea',
-                       'Gabon', 'São Tomé and Príncipe'],
-    'Southern Africa': ['Angola', 'Botswana', 'Eswatini', 'Lesotho', 'Malawi', 'Mozambique', 'Namibia',
-                        'South Africa', 'Zambia', 'Zimbabwe']
-}
-
-# Add regional classification
-def get_region(country):
-    for region, countries in regional_groups.items():
-        if country in countries:
-            return region
-    return 'Other'
-
-composite_scores['Region'] = composite_scores['Country'].apply(get_region)
+# Categories and sub-categories from the IIAG indicator hierarchy
+hierarchy = load_tree()
+main_categories = hierarchy.category_names()
+subcategories = hierarchy.subcategory_names()
+
+# Regional groupings (looked up by Country_ISO in the country registry)
+composite_scores['Region'] = assign_regions(composite_scores)
+
+# Peer groups from k-means clustering of the 16 sub-category scores. Set
+# GROUP_BY = 'Peer Group' to group the regional tables and charts by
+# governance profile instead of geography.
+composite_scores['Peer Group'] = assign_peer_groups(composite_scores, k=5)
+GROUP_BY = 'Region'
 
 # ============================================================================
 # 1. OVERALL GOVERNANCE LANDSCAPE
@@ -92,15 +75,24 @@ print(f"{'='*80}")
 top_10 = latest_data.nlargest(10, 'OVERALL GOVERNANCE')[['Country', 'OVERALL GOVERNANCE']]
 bottom_10 = latest_data.nsmallest(10, 'OVERALL GOVERNANCE')[['Country', 'OVERALL GOVERNANCE']]
 
+# Rank uncertainty from the published standard errors (10,000 simulated draws)
+rank_uncertainty = simulate_ranks(10000).summary(latest_year, k=10)
+
 print(f"\nTOP 10 PERFORMERS ({latest_year}):")
-print("-" * 40)
+print("-" * 66)
+print(f"  {'':<25} {'Score':>5}   {'90% rank range':<14} {'P(top 10)':>9}")
 for idx, row in top_10.iterrows():
-    print(f"  {row['Country']:<25} {row['OVERALL GOVERNANCE']:.1f}")
+    sim = rank_uncertainty.loc[row['Country']]
+    rank_range = f"{sim['90% Low']:.0f}-{sim['90% High']:.0f}"
+    print(f"  {row['Country']:<25} {row['OVERALL GOVERNANCE']:>5.1f}   {rank_range:<14} {sim['P(Top 10)']:>9.0%}")
 
 print(f"\nBOTTOM 10 PERFORMERS ({latest_year}):")
-print("-" * 40)
+print("-" * 66)
+print(f"  {'':<25} {'Score':>5}   {'90% rank range':<14} {'P(bottom 10)':>12}")
 for idx, row in bottom_10.iterrows():
-    print(f"  {row['Country']:<25} {row['OVERALL GOVERNANCE']:.1f}")
+    sim = rank_uncertainty.loc[row['Country']]
+    rank_range = f"{sim['90% Low']:.0f}-{sim['90% High']:.0f}"
+    print(f"  {row['Country']:<25} {row['OVERALL GOVERNANCE']:>5.1f}   {rank_range:<14} {sim['P(Bottom 10)']:>12.0%}")
 
 # Continental averages
 print(f"\nCONTINENTAL STATISTICS ({latest_year}):")
@@ -119,23 +111,9 @@ print(f"\n{'='*80}")
 print("TEMPORAL TRENDS (2014-2023)")
 print(f"{'='*80}")
 
-# Calculate year-over-year changes for all countries
-def calculate_change(df, country, start_year, end_year):
-    start_score = df[(df['Country'] == country) & (df['Year'] == start_year)]['OVERALL GOVERNANCE'].values
-    end_score = df[(df['Country'] == country) & (df['Year'] == end_year)]['OVERALL GOVERNANCE'].values
-
-    if len(start_score) > 0 and len(end_score) > 0:
-        return end_score[0] - start_score[0]
-    return np.nan
-
-countries_list = composite_scores['Country'].unique()
-changes = []
-for country in countries_list:
-    change = calculate_change(composite_scores, country, 2014, 2023)
-    if not np.isnan(change):
-        changes.append({'Country': country, 'Change': change})
-
-changes_df = pd.DataFrame(changes).sort_values('Change', ascending=False)
+# Calculate 2014-2023 changes for all countries and series in one pass
+changes_df = change_table(composite_scores, 2014, 2023)
+series_movers = top_movers(composite_scores, 2014, 2023)
 
 print(f"\nTOP 10 IMPROVERS (2014-2023):")
 print("-" * 40)
@@ -147,6 +125,14 @@ print("-" * 40)
 for idx, row in changes_df.tail(10).iterrows():
     print(f"  {row['Country']:<25} {row['Change']:.1f} points")
 
+print(f"\nLARGEST MOVERS BY SERIES (2014-2023):")
+print("-" * 100)
+print(f"  {'Series':<38} {'Top Improver':<26} {'Top Decliner':<26} {'Up':>3} {'Down':>4}")
+for series, row in series_movers.iterrows():
+    improver = f"{row['Top Improver']} ({row['Improvement']:+.1f})"
+    decliner = f"{row['Top Decliner']} ({row['Decline']:+.1f})"
+    print(f"  {series:<38} {improver:<26} {decliner:<26} {row['Countries Improved']:>3} {row['Countries Declined']:>4}")
+
 # ============================================================================
 # 3. CATEGORY ANALYSIS
 # ============================================================================
@@ -158,15 +144,40 @@ print(f"{'='*80}")
 category_stats = latest_data[main_categories].describe().loc[['mean', 'std', 'min', 'max']].T
 print(f"\n{category_stats.round(1)}")
 
+# Indicator level, from the full score set (2024-IIAG-scores.xlsx)
+scores = open_scores_cube()
+indicator_pos = np.flatnonzero(hierarchy.depth == 3)
+indicator_means = pd.Series(np.nanmean(scores.year(latest_year)[:, indicator_pos], axis=0),
+                            index=scores.indicators[indicator_pos]).sort_values(ascending=False)
+
+print(f"\nSTRONGEST INDICATORS - AFRICA AVERAGE ({latest_year}):")
+print("-" * 60)
+for indicator, score in indicator_means.head(5).items():
+    print(f"  {indicator:<50} {score:.1f}")
+
+print(f"\nWEAKEST INDICATORS - AFRICA AVERAGE ({latest_year}):")
+print("-" * 60)
+for indicator, score in indicator_means.tail(5).items():
+    print(f"  {indicator:<50} {score:.1f}")
+
 # Regional Analysis
 print(f"\n{'='*80}")
 print(f"REGIONAL ANALYSIS ({latest_year})")
 print(f"{'='*80}")
 
-regional_stats = latest_data.groupby('Region')['OVERALL GOVERNANCE'].agg(['mean', 'std', 'count']).round(1)
-regional_stats = regional_stats.sort_values('mean', ascending=False)
+aggregates = load_aggregates(GROUP_BY)
+regional_stats = aggregates.series_frame('OVERALL GOVERNANCE', latest_year)[['mean', 'std', 'count']].round(1)
+regional_stats = regional_stats.astype({'count': int}).rename_axis(columns=None).sort_values('mean', ascending=False)
 print(f"\n{regional_stats}")
 
+# Abrupt breaks: the strongest single level shift in each country's trajectories
+print(f"\n{'='*80}")
+print("LARGEST GOVERNANCE BREAKS (single level shifts, 2014-2023)")
+print(f"{'='*80}")
+breaks = detect_breaks('composite')
+for _, row in breaks.head(10).iterrows():
+    print(f"  {row['Country']:<25} {row['Series']:<35} {row['Year']}  {row['Before']:5.1f} -> {row['After']:5.1f}")
+
 # ============================================================================
 # VISUALIZATIONS
 # ============================================================================
@@ -193,11 +204,11 @@ ax1.legend()
 ax1.grid(True, alpha=0.3)
 
 # Box plot by region
-region_data = [latest_data[latest_data['Region'] == region]['OVERALL GOVERNANCE'].dropna()
-               for region in regional_stats.index if region != 'Other']
-ax2.boxplot(region_data, labels=[r for r in regional_stats.index if r != 'Other'], patch_artist=True)
+region_data = [latest_data[latest_data[GROUP_BY] == region]['OVERALL GOVERNANCE'].dropna()
+               for region in regional_stats.index]
+ax2.boxplot(region_data, labels=list(regional_stats.index), patch_artist=True)
 ax2.set_ylabel('Overall Governance Score')
-ax2.set_xlabel('Region')
+ax2.set_xlabel(GROUP_BY)
 ax2.set_title(f'Regional Governance Comparison ({latest_year})', fontweight='bold', fontsize=14)
 ax2.tick_params(axis='x', rotation=45)
 ax2.grid(True, alpha=0.3, axis='y')
@@ -235,12 +246,16 @@ print("  [+] Saved: 02_top_bottom_countries.png")
 plt.close()
 
 # 3. Temporal Trends - Continental Average
-yearly_avg = composite_scores.groupby('Year')['OVERALL GOVERNANCE'].mean()
-yearly_categories = composite_scores.groupby('Year')[main_categories].mean()
+yearly_avg = aggregates.over_years('mean', 'OVERALL GOVERNANCE')
+yearly_categories = aggregates.over_years('mean', main_categories)
+rolling = load_rolling('composite')
+rolling_avg = rolling.frame('mean', 'OVERALL GOVERNANCE', window=3).mean().dropna()
 
 fig, ax = plt.subplots(figsize=(14, 8))
 
 ax.plot(yearly_avg.index, yearly_avg.values, marker='o', linewidth=3, markersize=10, label='Overall Governance', color='#2c3e50')
+ax.plot(rolling_avg.index, rolling_avg.values, linestyle='--', linewidth=2, label='Overall Governance (3-year rolling mean)',
+        color='#7f8c8d')
 for cat in main_categories:
     ax.plot(yearly_categories.index, yearly_categories[cat], marker='s', linewidth=2, markersize=6, label=cat, alpha=0.8)
 
@@ -298,8 +313,8 @@ print("  [+] Saved: 05_governance_change_all.png")
 plt.close()
 
 # 6. Regional Performance Comparison
-regional_means = latest_data.groupby('Region')[['OVERALL GOVERNANCE'] + main_categories].mean()
-regional_means = regional_means[regional_means.index != 'Other'].sort_values('OVERALL GOVERNANCE', ascending=False)
+regional_means = aggregates.frame('mean', latest_year, ['OVERALL GOVERNANCE'] + main_categories)
+regional_means = regional_means.sort_values('OVERALL GOVERNANCE', ascending=False)
 
 fig, ax = plt.subplots(figsize=(14, 8))
 x = np.arange(len(regional_means))
@@ -310,7 +325,7 @@ for i, cat in enumerate(['OVERALL GOVERNANCE'] + main_categories):
     offset = width * (i - 2)
     ax.bar(x + offset, regional_means[cat], width, label=cat, color=colors_cat[i] if i < len(colors_cat) else None)
 
-ax.set_xlabel('Region', fontweight='bold')
+ax.set_xlabel(GROUP_BY, fontweight='bold')
 ax.set_ylabel('Average Score', fontweight='bold')
 ax.set_title(f'Regional Performance Across Categories ({latest_year})', fontweight='bold', fontsize=16, pad=20)
 ax.set_xticks(x)
@@ -324,6 +339,8 @@ print("  [+] Saved: 06_regional_comparison.png")
 plt.close()
 
 # 7. Scatter Plot - Category Correlation
+composite_correlations = load_correlations('composite')
+category_fits = fit_lines(latest_data[main_categories].to_numpy().T, latest_data['OVERALL GOVERNANCE'].to_numpy())
 fig, axes = plt.subplots(2, 2, figsize=(16, 14))
 axes = axes.flatten()
 
@@ -335,13 +352,10 @@ for idx, cat in enumerate(main_categories):
 
     ax.scatter(plot_data[cat], plot_data['OVERALL GOVERNANCE'], alpha=0.6, s=100, edgecolors='black', linewidth=0.5)
 
-    # Add correlation line
-    z = np.polyfit(plot_data[cat], plot_data['OVERALL GOVERNANCE'], 1)
-    p = np.poly1d(z)
-    ax.plot(plot_data[cat].sort_values(), p(plot_data[cat].sort_values()), "r--", linewidth=2, alpha=0.8)
-
-    # Calculate correlation
-    corr = plot_data[cat].corr(plot_data['OVERALL GOVERNANCE'])
+    # Least-squares line and correlation, both computed for all categories up front
+    x_line = plot_data[cat].sort_values()
+    ax.plot(x_line, category_fits[idx, INTERCEPT] + category_fits[idx, SLOPE] * x_line, "r--", linewidth=2, alpha=0.8)
+    corr = composite_correlations.pair(cat, 'OVERALL GOVERNANCE', latest_year)
 
     ax.set_xlabel(cat, fontweight='bold')
     ax.set_ylabel('Overall Governance Score', fontweight='bold')
@@ -363,7 +377,9 @@ fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(18, 6))
 # Top 5
 for country in top5:
     country_data = composite_scores[composite_scores['Country'] == country]
-    ax1.plot(country_data['Year'], country_data['OVERALL GOVERNANCE'], marker='o', linewidth=2, label=country, markersize=6)
+    slope = rolling.country(country, 'OVERALL GOVERNANCE', window=5).loc[latest_year, 'slope']
+    ax1.plot(country_data['Year'], country_data['OVERALL GOVERNANCE'], marker='o', linewidth=2,
+             label=f'{country} ({slope:+.2f}/yr, last 5 years)', markersize=6)
 
 ax1.set_xlabel('Year', fontweight='bold')
 ax1.set_ylabel('Overall Governance Score', fontweight='bold')
@@ -374,7 +390,9 @@ ax1.grid(True, alpha=0.3)
 # Bottom 5
 for country in bottom5:
     country_data = composite_scores[composite_scores['Country'] == country]
-    ax2.plot(country_data['Year'], country_data['OVERALL GOVERNANCE'], marker='s', linewidth=2, label=country, markersize=6)
+    slope = rolling.country(country, 'OVERALL GOVERNANCE', window=5).loc[latest_year, 'slope']
+    ax2.plot(country_data['Year'], country_data['OVERALL GOVERNANCE'], marker='s', linewidth=2,
+             label=f'{country} ({slope:+.2f}/yr, last 5 years)', markersize=6)
 
 ax2.set_xlabel('Year', fontweight='bold')
 ax2.set_ylabel('Overall Governance Score', fontweight='bold')
@@ -433,20 +451,7 @@ print("  [+] Saved: 09_radar_top5.png")
 plt.close()
 
 # 10. Year-over-Year Change Heatmap
-yoy_changes = []
-for year in range(2015, 2024):
-    for country in countries_list:
-        prev_score = composite_scores[(composite_scores['Country'] == country) &
-                                     (composite_scores['Year'] == year-1)]['OVERALL GOVERNANCE'].values
-        curr_score = composite_scores[(composite_scores['Country'] == country) &
-                                     (composite_scores['Year'] == year)]['OVERALL GOVERNANCE'].values
-
-        if len(prev_score) > 0 and len(curr_score) > 0:
-            change = curr_score[0] - prev_score[0]
-            yoy_changes.append({'Country': country, 'Year': year, 'Change': change})
-
-yoy_df = pd.DataFrame(yoy_changes)
-yoy_pivot = yoy_df.pivot(index='Country', columns='Year', values='Change')
+yoy_pivot = yoy_frame(composite_scores, 'OVERALL GOVERNANCE')
 
 # Select top 25 countries by latest score for readability
 top25_countries = latest_data.nlargest(25, 'OVERALL GOVERNANCE')['Country'].values
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from iiag.confidence import load_confidence_intervals
+
+
+@pytest.fixture(scope='module')
+def ci(tmp_path_factory):
+    return load_confidence_intervals(cache_path=tmp_path_factory.mktemp('cache'))
+
+
+def test_band_keeps_statistic_axis_last(ci):
+    year = int(ci.years.max())
+    full = ci.band(90)
+    assert full.shape == (len(ci.countries), len(ci.years), len(ci.series), 2)
+    assert ci.band(90, year=year).shape == (len(ci.countries), len(ci.series), 2)
+    assert ci.band(90, year=year, series='OVERALL GOVERNANCE').shape == (len(ci.countries), 2)
+    np.testing.assert_array_equal(ci.band(90, year=year), full[:, ci.years.get_loc(year)])
+
+
+def test_select_single_statistic_drops_axis(ci):
+    year = int(ci.years.max())
+    se = ci.select('Standard Error', year=year)
+    assert se.shape == (len(ci.countries), len(ci.series))
+    np.testing.assert_array_equal(se, ci.standard_errors()[:, ci.years.get_loc(year)])